@@ -0,0 +1,57 @@
+import argparse
+import json
+import sys
+
+# Metric -> whether a larger value is better; speed and memory are noisy, partition quality is deterministic
+PERFORMANCE_METRICS = {"edges_per_sec": True, "peak_rss_mb": False}
+QUALITY_METRICS = {"replication_factor": False, "edge_balance": False, "vertex_balance": False}
+TOLERANCE = 0.1
+QUALITY_TOLERANCE = 0.01
+
+def result_key(result):
+    return (result["graph"], result["algorithm"], result["num_partitions"], result["mode"], result.get("degree_threshold"))
+
+def compare_results(results, baseline, tolerance=TOLERANCE, quality_tolerance=QUALITY_TOLERANCE):
+    # One row per metric of every run that is also in the baseline: (key, metric, baseline, current, relative change,
+    # regressed), where regressed means worse by more than the metric's tolerance
+    baseline_results = {result_key(result): result for result in baseline["results"]}
+    rows = []
+    for result in results["results"]:
+        old = baseline_results.get(result_key(result))
+        if old is None:
+            continue
+        for metrics, allowed in ((PERFORMANCE_METRICS, tolerance), (QUALITY_METRICS, quality_tolerance)):
+            for metric, higher_is_better in metrics.items():
+                if metric not in old or metric not in result:
+                    continue
+                change = (result[metric] - old[metric]) / old[metric] if old[metric] else 0.0
+                worse = -change if higher_is_better else change
+                rows.append((result_key(result), metric, old[metric], result[metric], change, worse > allowed))
+    return rows
+
+def print_comparison(rows):
+    # Print the regressions, then a summary line; returns the number of regressions
+    regressions = [row for row in rows if row[5]]
+    for key, metric, old, new, change, _ in regressions:
+        graph, algorithm, num_partitions, mode, degree_threshold = key
+        threshold = f" t={degree_threshold}" if degree_threshold is not None else ""
+        print(f"REGRESSION {graph} {algorithm} {num_partitions}part {mode}{threshold}: {metric} {old:.4g} -> {new:.4g} ({change:+.1%})")
+    print(f"{len(regressions)} regressions in {len(rows)} compared metrics")
+    return len(regressions)
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare benchmark results against a stored baseline")
+    parser.add_argument("results", type=str)
+    parser.add_argument("baseline", type=str)
+    parser.add_argument("-tol", "--tolerance", type=float, help="Allowed slowdown or memory growth", default=TOLERANCE)
+    parser.add_argument("-qtol", "--quality_tolerance", type=float, help="Allowed growth of replication factor and imbalance", default=QUALITY_TOLERANCE)
+    args = parser.parse_args()
+    rows = compare_results(load_results(args.results), load_results(args.baseline), args.tolerance, args.quality_tolerance)
+    sys.exit(1 if print_comparison(rows) else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import argparse
+import os
+import numpy as np
+
+from utils import save_graph_batches, BATCH_SIZE
+
+# Graph500 R-MAT quadrant probabilities (a, b, c); d = 1 - a - b - c
+RMAT_PROBABILITIES = (0.57, 0.19, 0.19)
+GENERATORS = ("rmat", "grid", "uniform")
+
+def _batch_rng(seed, batch_num):
+    # Every batch has its own stream seeded by its number; a graph is reproducible for the same seed and batch size
+    return np.random.default_rng([seed, batch_num])
+
+def _batch_sizes(num_edges, batch_size):
+    for batch_num, start in enumerate(range(0, num_edges, batch_size)):
+        yield batch_num, min(batch_size, num_edges - start)
+
+def iter_rmat_batches(scale, edge_factor=16, probabilities=RMAT_PROBABILITIES, permute=True, seed=0, batch_size=BATCH_SIZE):
+    # Power-law graph with 2^scale vertices and edge_factor * 2^scale edges: each edge picks one quadrant of the
+    # adjacency matrix per bit of its endpoints. Vertex labels are shuffled so degree does not follow the ID
+    a, b, c = probabilities
+    num_vertices = 1 << scale
+    labels = np.random.default_rng(seed).permutation(num_vertices).astype(np.int32) if permute else None
+    for batch_num, size in _batch_sizes(edge_factor * num_vertices, batch_size):
+        rng = _batch_rng(seed, batch_num)
+        src = np.zeros(size, dtype=np.int64)
+        dst = np.zeros(size, dtype=np.int64)
+        for bit in range(scale):
+            r = rng.random(size)
+            src_bit = r >= a + b
+            dst_bit = ((r >= a) & (r < a + b)) | (r >= a + b + c)
+            src |= src_bit.astype(np.int64) << bit
+            dst |= dst_bit.astype(np.int64) << bit
+        batch = np.column_stack((src, dst)).astype(np.int32)
+        yield labels[batch] if labels is not None else batch
+
+def iter_grid_batches(width, height=None, drop=0.0, seed=0, batch_size=BATCH_SIZE):
+    # Road-like planar graph: a width x height lattice, row by row, with each undirected road listed in both directions
+    # as in roadNet. A fraction drop of the roads is removed to break up the regularity
+    height = height or width
+    rows_per_batch = max(batch_size // (4 * width), 1)
+    for batch_num, first_row in enumerate(range(0, height, rows_per_batch)):
+        rng = _batch_rng(seed, batch_num)
+        rows = np.arange(first_row, min(first_row + rows_per_batch, height))
+        vertices = (rows[:, None] * width + np.arange(width)).astype(np.int32)
+        right = np.column_stack((vertices[:, :-1].ravel(), vertices[:, 1:].ravel()))
+        down = vertices[rows < height - 1]
+        down = np.column_stack((down.ravel(), down.ravel() + width))
+        roads = np.concatenate((right, down))
+        if drop:
+            roads = roads[rng.random(len(roads)) >= drop]
+        # Keep edges near their row in the file, like a road network ordered by location
+        roads = roads[np.argsort(roads[:, 0], kind="stable")]
+        batch = np.empty((2 * len(roads), 2), dtype=np.int32)
+        batch[0::2] = roads
+        batch[1::2] = roads[:, ::-1]
+        yield batch
+
+def iter_uniform_batches(num_vertices, num_edges, seed=0, batch_size=BATCH_SIZE):
+    # Erdos-Renyi style graph: both endpoints of every edge uniform over the vertices
+    for batch_num, size in _batch_sizes(num_edges, batch_size):
+        yield _batch_rng(seed, batch_num).integers(0, num_vertices, size=(size, 2), dtype=np.int32)
+
+def graph_file_name(generator, scale, edge_factor=16, seed=0):
+    # Parameters are part of the name, so a generated file is reused only for the same graph
+    if generator == "grid":
+        return f"grid_s{scale}_seed{seed}.graph"
+    return f"{generator}_s{scale}_e{edge_factor}_seed{seed}.graph"
+
+def generate_graph(generator, scale, data_dir, edge_factor=16, seed=0):
+    # Write the graph of a generator at a scale of about 2^scale vertices and edge_factor edges per vertex (grid graphs
+    # have their own degree of at most 4) unless it exists already; returns its path
+    path = os.path.join(data_dir, graph_file_name(generator, scale, edge_factor, seed))
+    if os.path.exists(path):
+        return path
+    os.makedirs(data_dir, exist_ok=True)
+    if generator == "rmat":
+        batches = iter_rmat_batches(scale, edge_factor, seed=seed)
+    elif generator == "grid":
+        batches = iter_grid_batches(1 << (scale // 2), 1 << (scale - scale // 2), drop=0.1, seed=seed)
+    elif generator == "uniform":
+        batches = iter_uniform_batches(1 << scale, edge_factor << scale, seed=seed)
+    else:
+        raise ValueError(f"unknown generator {generator}")
+    num_edges = save_graph_batches(batches, path)
+    print(f"Generated {num_edges} edges to {path}")
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate benchmark graphs in the binary edge format")
+    parser.add_argument("-g", "--generators", nargs="+", choices=GENERATORS, default=list(GENERATORS))
+    parser.add_argument("-s", "--scales", type=int, nargs="+", help="log2 of the number of vertices", default=[16])
+    parser.add_argument("-e", "--edge_factor", type=int, help="Edges per vertex of rmat and uniform graphs", default=16)
+    parser.add_argument("-sd", "--seed", type=int, default=0)
+    parser.add_argument("-dir", "--data_dir", type=str, default="bench_data")
+    args = parser.parse_args()
+    for generator in args.generators:
+        for scale in args.scales:
+            generate_graph(generator, scale, args.data_dir, args.edge_factor, args.seed)
+
+if __name__ == "__main__":
+    main()
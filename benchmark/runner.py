@@ -0,0 +1,111 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+import numpy as np
+
+from partitioning import ALGORITHMS, HYBRID_ALGORITHMS, partition
+from benchmark.generators import GENERATORS, generate_graph
+from benchmark.compare import compare_results, print_comparison, load_results, TOLERANCE, QUALITY_TOLERANCE
+
+MODES = ("memory", "huge")
+
+def peak_rss_mb():
+    # High-water resident set of this process and of its finished worker processes; ru_maxrss is in KB on Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / 1024
+
+def run_partitioner(path, algorithm, num_partitions, mode, degree_threshold, workers):
+    # One timed run. Memory mode reads the whole graph into an array and keeps the per-edge assignment, like the scripts'
+    # in-memory mode; huge mode streams the mmap-ed file. The vertex index is built cold in both
+    start_time = time.time()
+    if mode == "memory":
+        edges = np.fromfile(path, dtype=np.int32).reshape(-1, 2)
+        result = partition(edges, algorithm, num_partitions, degree_threshold)
+    else:
+        result = partition(path, algorithm, num_partitions, degree_threshold, workers=workers, keep_assignment=False, use_cache=False)
+    seconds = time.time() - start_time
+    stats = result.stats()
+    return {
+        "seconds": seconds,
+        "edges_per_sec": stats["num_edges"] / seconds if seconds else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+        "num_vertices": stats["num_vertices"],
+        "num_edges": stats["num_edges"],
+        "replication_factor": stats["replication_factor"],
+        "edge_balance": stats["edge_balance"],
+        "vertex_balance": stats["vertex_balance"],
+    }
+
+def run_isolated(*args):
+    # Each run gets a fresh process, so its peak RSS is its own and no run warms the page cache of another's arrays
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(run_partitioner, args)
+
+def run_benchmarks(graphs, algorithms, partition_counts, modes, degree_threshold=100, workers=1, repeat=1):
+    # graphs maps a name to a graph file; each configuration keeps its fastest of repeat runs
+    results = []
+    for graph, path in graphs.items():
+        for algorithm in algorithms:
+            for num_partitions in partition_counts:
+                for mode in modes:
+                    runs = [run_isolated(path, algorithm, num_partitions, mode, degree_threshold, workers) for _ in range(repeat)]
+                    best = min(runs, key=lambda run: run["seconds"])
+                    best["peak_rss_mb"] = max(run["peak_rss_mb"] for run in runs)
+                    result = {"graph": graph, "algorithm": algorithm, "num_partitions": num_partitions, "mode": mode,
+                              "degree_threshold": degree_threshold if algorithm in HYBRID_ALGORITHMS else None, **best}
+                    print(f"{graph} {algorithm} {num_partitions}part {mode}: {result['edges_per_sec']:.0f} edges/s, "
+                          f"{result['peak_rss_mb']:.0f} MB, replication factor {result['replication_factor']:.3f}")
+                    results.append(result)
+    return results
+
+def environment():
+    return {"python": platform.python_version(), "numpy": np.__version__, "platform": platform.platform(),
+            "cpus": os.cpu_count(), "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark every partitioner on generated graphs")
+    parser.add_argument("-g", "--generators", nargs="+", choices=GENERATORS, default=list(GENERATORS))
+    parser.add_argument("-s", "--scales", type=int, nargs="+", help="log2 of the number of vertices", default=[16])
+    parser.add_argument("-e", "--edge_factor", type=int, help="Edges per vertex of rmat and uniform graphs", default=16)
+    parser.add_argument("-sd", "--seed", type=int, default=0)
+    parser.add_argument("-i", "--input_files", type=str, nargs="+", help="Benchmark these graph files as well", default=[])
+    parser.add_argument("-a", "--algorithms", nargs="+", choices=ALGORITHMS, default=list(ALGORITHMS))
+    parser.add_argument("-ns", "--partition_counts", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("-md", "--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("-t", "--degree_threshold", type=int, help="Threshold of the hybrid and ginger vertex-cuts", default=100)
+    parser.add_argument("-w", "--workers", type=int, help="Processes of huge mode runs", default=1)
+    parser.add_argument("-r", "--repeat", type=int, help="Runs per configuration, the fastest is kept", default=1)
+    parser.add_argument("-dir", "--data_dir", type=str, default="bench_data")
+    parser.add_argument("-o", "--output_file", type=str, default="bench_results.json")
+    parser.add_argument("-bl", "--baseline", type=str, help="Flag regressions against these stored results")
+    parser.add_argument("-tol", "--tolerance", type=float, help="Allowed slowdown or memory growth", default=TOLERANCE)
+    parser.add_argument("-qtol", "--quality_tolerance", type=float, help="Allowed growth of replication factor and imbalance", default=QUALITY_TOLERANCE)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    graphs = {}
+    for generator in args.generators:
+        for scale in args.scales:
+            path = generate_graph(generator, scale, args.data_dir, args.edge_factor, args.seed)
+            graphs[os.path.basename(path)[:-len(".graph")]] = path
+    for path in args.input_files:
+        graphs[os.path.splitext(os.path.basename(path))[0]] = path
+
+    results = {"environment": environment(),
+               "results": run_benchmarks(graphs, args.algorithms, args.partition_counts, args.modes, args.degree_threshold, args.workers, args.repeat)}
+    with open(args.output_file, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {args.output_file}")
+    if args.baseline:
+        rows = compare_results(results, load_results(args.baseline), args.tolerance, args.quality_tolerance)
+        sys.exit(1 if print_comparison(rows) else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import os
+import tempfile
+import time
+import numpy as np
+
+from utils import count_edges, edge_array, iter_edge_batches, graph_cache_dir, load_cached_arrays, save_cached_arrays, BATCH_SIZE
+
+MEMORY_BUDGET = 1 << 30  # bytes for sort chunks and merge blocks
+SORT_BYTES_PER_EDGE = 40  # key, position, argsort result and temporaries of one edge while sorting
+SIGN_BIT = 0x80000000
+
+def pack_edges(batch):
+    # (src, dst) pairs as uint64 keys that sort like the signed pairs
+    biased = batch.view(np.uint32) ^ np.uint32(SIGN_BIT)
+    return (biased[:, 0].astype(np.uint64) << np.uint64(32)) | biased[:, 1]
+
+def unpack_keys(keys):
+    edges = np.empty((len(keys), 2), dtype=np.uint32)
+    edges[:, 0] = keys >> np.uint64(32)
+    edges[:, 1] = keys & np.uint64(0xFFFFFFFF)
+    edges ^= np.uint32(SIGN_BIT)
+    return edges.view(np.int32)
+
+def unique_edges(edges):
+    # In-memory dedup keeping the first occurrence of each edge, in input order
+    edges = np.asarray(edges, dtype=np.int32).reshape(-1, 2)
+    _, first = np.unique(pack_edges(edges), return_index=True)
+    return edges[np.sort(first)]
+
+def _sorted_unique(keys, positions, unique=True):
+    # Stable sort keeps the earliest position first among equal keys
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    positions = positions[order]
+    if not unique:
+        return keys, positions
+    first = np.ones(len(keys), dtype=bool)
+    first[1:] = keys[1:] != keys[:-1]
+    return keys[first], positions[first]
+
+def _write_runs(source, tmp_dir, chunk_edges, unique):
+    # Sort chunks of the file that fit the budget (deduped if unique), spilling each as a run of (key, position) arrays
+    runs = []
+    edge_num = 0
+    for batch in iter_edge_batches(source, chunk_edges):
+        keys, positions = _sorted_unique(pack_edges(batch), np.arange(edge_num, edge_num + len(batch), dtype=np.int64), unique)
+        run_file = os.path.join(tmp_dir, f"run{len(runs)}")
+        np.save(f"{run_file}.keys.npy", keys)
+        np.save(f"{run_file}.positions.npy", positions)
+        runs.append(run_file)
+        edge_num += len(batch)
+    return runs
+
+def _merge_runs(runs, block_edges, unique):
+    # k-way merge of sorted runs, block by block: every key up to the smallest last key of the runs' blocks is final
+    keys = [np.load(f"{run_file}.keys.npy", mmap_mode="r") for run_file in runs]
+    positions = [np.load(f"{run_file}.positions.npy", mmap_mode="r") for run_file in runs]
+    cursors = [0] * len(runs)
+    while True:
+        active = [run for run in range(len(runs)) if cursors[run] < len(keys[run])]
+        if not active:
+            return
+        bound = None
+        for run in active:
+            stop = cursors[run] + block_edges
+            if stop < len(keys[run]):
+                last = keys[run][stop - 1]
+                bound = last if bound is None else min(bound, last)
+        block_keys, block_positions = [], []
+        for run in active:
+            stop = min(cursors[run] + block_edges, len(keys[run]))
+            if bound is not None:
+                stop = cursors[run] + int(np.searchsorted(keys[run][cursors[run]:stop], bound, side="right"))
+            block_keys.append(keys[run][cursors[run]:stop])
+            block_positions.append(positions[run][cursors[run]:stop])
+            cursors[run] = stop
+        # Runs are in file order, so equal keys keep the earliest position
+        yield _sorted_unique(np.concatenate(block_keys), np.concatenate(block_positions), unique)
+
+def iter_sorted_edges(source, memory_budget=MEMORY_BUDGET, tmp_dir=None, unique=False):
+    # Yield (keys, positions) blocks of the edges in key order with their positions in the file; with unique=True only
+    # the first occurrence of each distinct edge is kept
+    chunk_edges = max(memory_budget // SORT_BYTES_PER_EDGE, 1 << 16)
+    if count_edges(source) <= chunk_edges:
+        batch = edge_array(source)
+        if len(batch):
+            yield _sorted_unique(pack_edges(batch), np.arange(len(batch), dtype=np.int64), unique)
+        return
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as run_dir:
+        runs = _write_runs(source, run_dir, chunk_edges, unique)
+        yield from _merge_runs(runs, max(chunk_edges // len(runs), 1 << 12), unique)
+
+def iter_sorted_unique(source, memory_budget=MEMORY_BUDGET, tmp_dir=None):
+    return iter_sorted_edges(source, memory_budget, tmp_dir, unique=True)
+
+def unique_edge_mask(source, output_file, memory_budget=MEMORY_BUDGET, tmp_dir=None):
+    # On-disk flag per edge, set for the first occurrence of each distinct edge
+    keep = np.lib.format.open_memmap(output_file, mode="w+", dtype=bool, shape=(count_edges(source),))
+    for _, positions in iter_sorted_unique(source, memory_budget, tmp_dir):
+        keep[np.sort(positions)] = True
+    return keep
+
+def iter_unique_edge_batches(source, memory_budget=MEMORY_BUDGET, tmp_dir=None, batch_size=BATCH_SIZE):
+    # Batches of the file with repeated edges dropped, in file order; feeds a partitioner without writing a new file
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as mask_dir:
+        keep = unique_edge_mask(source, os.path.join(mask_dir, "keep.npy"), memory_budget, mask_dir)
+        edge_num = 0
+        for batch in iter_edge_batches(source, batch_size):
+            yield batch[keep[edge_num:edge_num + len(batch)]]
+            edge_num += len(batch)
+        del keep
+
+def dedup_edge_file(source, output_file, sort=False, memory_budget=MEMORY_BUDGET, tmp_dir=None):
+    # Write the distinct edges to output_file, in order of first occurrence or sorted by (src, dst); returns their number
+    num_edges = 0
+    with open(output_file, "wb") as f:
+        if sort:
+            for keys, _ in iter_sorted_unique(source, memory_budget, tmp_dir):
+                f.write(unpack_keys(keys).tobytes())
+                num_edges += len(keys)
+        else:
+            for batch in iter_unique_edge_batches(source, memory_budget, tmp_dir):
+                f.write(batch.tobytes())
+                num_edges += len(batch)
+    return num_edges
+
+def unique_edge_file(path, memory_budget=MEMORY_BUDGET, tmp_dir=None):
+    # Deduplicated copy of the graph in its cache directory, in order of first occurrence; rebuilt when the graph changes
+    output_file = os.path.join(graph_cache_dir(path), "unique.graph")
+    cached = load_cached_arrays(path, [])
+    if cached is not None and "unique_edges" in cached[1] and os.path.exists(output_file):
+        return output_file
+
+    start_time = time.time()
+    os.makedirs(graph_cache_dir(path), exist_ok=True)
+    tmp_file = f"{output_file}.tmp"
+    num_edges = dedup_edge_file(path, tmp_file, memory_budget=memory_budget, tmp_dir=tmp_dir or graph_cache_dir(path))
+    os.replace(tmp_file, output_file)
+    save_cached_arrays(path, {}, {"unique_edges": num_edges})
+    print(f"Removed {count_edges(path) - num_edges} duplicate edges in {time.time() - start_time} seconds")
+    return output_file
@@ -0,0 +1,289 @@
+from collections import deque
+import gzip
+import multiprocessing
+import os
+import warnings
+import zlib
+import numpy as np
+
+VGRAPH_MAGIC = b"VGRAPH01"
+VGRAPH_FOOTER = np.dtype([("index_offset", "<u8"), ("num_blocks", "<u8"), ("num_edges", "<u8"), ("block_edges", "<u8"), ("magic", "S8")])
+BLOCK_EDGES = 1 << 16  # edges per independently decodable block of a vgraph file
+READ_BYTES = 1 << 26  # bytes read, decompressed or parsed at a time
+TEXT_SUFFIXES = (".txt", ".tsv", ".csv", ".el", ".edges", ".edgelist", ".snap")
+COMPRESSION_SUFFIXES = {".gz": "gzip", ".zz": "zlib", ".zlib": "zlib"}
+COMMENT_PREFIXES = (b"#", b"%")
+
+def edge_file_format(file_path):
+    # (format, compression) of an edge file by its suffixes: format is "graph" for native <int32 src, int32 dst> pairs,
+    # "text" for an edge list of whitespace or comma separated IDs, or "vgraph"; compression is None, "gzip" or "zlib"
+    root, suffix = os.path.splitext(os.fspath(file_path).lower())
+    compression = COMPRESSION_SUFFIXES.get(suffix)
+    if compression is not None:
+        root, suffix = os.path.splitext(root)
+    if suffix == ".vgraph":
+        if compression is not None:
+            raise ValueError(f"{file_path}: vgraph files are compressed already")
+        return "vgraph", None
+    return ("text" if suffix in TEXT_SUFFIXES else "graph"), compression
+
+def is_native_edge_file(file_path):
+    return edge_file_format(file_path) == ("graph", None)
+
+def _iter_decompressed(file_path, compression, read_bytes=READ_BYTES):
+    # Raw bytes of a file in pieces, gzip and zlib streams decompressed on the way
+    decompressor = zlib.decompressobj() if compression == "zlib" else None
+    with (gzip.open(file_path, "rb") if compression == "gzip" else open(file_path, "rb")) as f:
+        while True:
+            data = f.read(read_bytes)
+            if not data:
+                break
+            yield decompressor.decompress(data) if decompressor is not None else data
+    if decompressor is not None:
+        yield decompressor.flush()
+
+def _iter_line_chunks(pieces):
+    # Pieces of text regrouped to end at line breaks
+    rest = b""
+    for data in pieces:
+        data = rest + data
+        cut = data.rfind(b"\n") + 1
+        rest = data[cut:]
+        if cut:
+            yield data[:cut]
+    if rest.strip():
+        yield rest
+
+def _iter_binary_batches(pieces):
+    # Pieces of a native edge stream as (n, 2) int32 arrays, a partial edge carried into the next piece
+    rest = b""
+    for data in pieces:
+        data = rest + data
+        cut = len(data) - len(data) % 8
+        rest = data[cut:]
+        if cut:
+            yield np.frombuffer(data, dtype=np.int32, count=cut // 4).reshape(-1, 2)
+    if rest:
+        raise ValueError(f"edge stream ends with a partial edge of {len(rest)} bytes")
+
+def parse_edge_text(data):
+    # (n, 2) int32 edges of whole lines of text. Comment lines (# or %) are skipped, and columns past the second, such as
+    # weights, dropped; the number of columns is taken from the first edge
+    if b"#" in data or b"%" in data:
+        data = b"\n".join(line for line in data.split(b"\n") if not line.lstrip().startswith(COMMENT_PREFIXES))
+    if b"," in data:
+        data = data.replace(b",", b" ")
+    first_line = data.lstrip().split(b"\n", 1)[0]
+    columns = len(first_line.split())
+    if columns == 0:
+        return np.empty((0, 2), dtype=np.int32)
+    if columns < 2:
+        raise ValueError(f"edge list line {first_line[:80]!r} has fewer than two columns")
+    with warnings.catch_warnings():
+        # Text that is not all numbers stops the parse with a warning, which has to fail the chunk instead
+        warnings.simplefilter("error")
+        try:
+            # Extra columns may be fractional weights; IDs are exact in a float64 anyway
+            values = np.fromstring(data, dtype=np.int64 if columns == 2 else np.float64, sep=" ")
+        except (ValueError, DeprecationWarning) as e:
+            raise ValueError(f"malformed edge list: {e}") from None
+    if len(values) % columns:
+        raise ValueError(f"edge list lines do not all have {columns} columns")
+    return values.reshape(-1, columns)[:, :2].astype(np.int32)
+
+def _parse_chunks(chunks, workers):
+    # Parse chunks in worker processes, in order, with at most two chunks per worker in flight so a long stream is
+    # never read far ahead of the parsers
+    if workers <= 1:
+        for chunk in chunks:
+            yield parse_edge_text(chunk)
+        return
+    with multiprocessing.Pool(workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(parse_edge_text, (chunk,)))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+def _zigzag(values):
+    return ((values << 1) ^ (values >> 63)).view(np.uint64)
+
+def _unzigzag(values):
+    return (values >> np.uint64(1)).view(np.int64) ^ -(values & np.uint64(1)).view(np.int64)
+
+def encode_varints(values):
+    # LEB128 bytes of unsigned values: 7 bits per byte, low bits first, the high bit set on all but a value's last byte
+    values = np.asarray(values, dtype=np.uint64)
+    lengths = np.ones(len(values), dtype=np.int64)
+    for shift in range(7, 64, 7):
+        lengths += values >= np.uint64(1 << shift)
+    starts = np.cumsum(lengths) - lengths
+    encoded = np.empty(int(lengths.sum()), dtype=np.uint8)
+    for k in range(int(lengths.max()) if len(values) else 0):
+        has = lengths > k
+        group = (values[has] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        more = (lengths[has] > k + 1).astype(np.uint64) << np.uint64(7)
+        encoded[starts[has] + k] = group | more
+    return encoded
+
+def decode_varints(data):
+    data = np.frombuffer(data, dtype=np.uint8)
+    ends = np.flatnonzero(data < 0x80)
+    if len(data) and (not len(ends) or ends[-1] != len(data) - 1):
+        raise ValueError("varint data ends inside a value")
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    lengths = ends - starts + 1
+    values = np.zeros(len(ends), dtype=np.uint64)
+    for k in range(int(lengths.max()) if len(ends) else 0):
+        has = lengths > k
+        values[has] |= (data[starts[has] + k] & 0x7F).astype(np.uint64) << np.uint64(7 * k)
+    return values
+
+def encode_block(edges):
+    # Varints of edges sorted by (src, dst): the first source zigzagged, then the gap to each next source; a destination
+    # is the gap to the previous one under the same source, else zigzagged whole. No block depends on another
+    src = edges[:, 0].astype(np.int64)
+    dst = edges[:, 1].astype(np.int64)
+    values = np.empty((len(edges), 2), dtype=np.uint64)
+    src_gaps = np.diff(src)
+    same_src = np.concatenate(([False], src_gaps == 0))
+    dst_gaps = np.concatenate(([0], np.diff(dst)))
+    if (src_gaps < 0).any() or (dst_gaps[same_src] < 0).any():
+        raise ValueError("vgraph blocks need edges sorted by (src, dst)")
+    values[:1, 0] = _zigzag(src[:1])
+    values[1:, 0] = src_gaps.view(np.uint64)
+    values[:, 1] = np.where(same_src, dst_gaps.view(np.uint64), _zigzag(dst))
+    return encode_varints(values.ravel()).tobytes()
+
+def decode_block(data, num_edges):
+    values = decode_varints(data)
+    if len(values) != 2 * num_edges:
+        raise ValueError(f"vgraph block holds {len(values) // 2} edges instead of {num_edges}")
+    values = values.reshape(-1, 2)
+    src_steps = values[:, 0].view(np.int64).copy()
+    src_steps[:1] = _unzigzag(values[:1, 0])
+    src = np.cumsum(src_steps)
+    # Destinations restart from a whole value at every new source, so the running sum is rebased per source
+    new_src = np.concatenate(([True], values[1:, 0] != 0))
+    whole = _unzigzag(values[:, 1])
+    steps = np.where(new_src, whole, values[:, 1].view(np.int64))
+    total = np.cumsum(steps)
+    rebase = (total - whole)[new_src]
+    dst = total - rebase[np.cumsum(new_src) - 1]
+    return np.column_stack((src, dst)).astype(np.int32)
+
+def _iter_blocks(batches, block_edges):
+    # Batches regrouped into blocks of exactly block_edges edges, the last one shorter
+    pending, size = [], 0
+    for batch in batches:
+        pending.append(batch)
+        size += len(batch)
+        if size >= block_edges:
+            edges = np.concatenate(pending)
+            stop = len(edges) - len(edges) % block_edges
+            for start in range(0, stop, block_edges):
+                yield edges[start:start + block_edges]
+            pending, size = [edges[stop:]], len(edges) - stop
+    if size:
+        yield np.concatenate(pending)
+
+def save_vgraph(sorted_batches, file_path, block_edges=BLOCK_EDGES):
+    # Write batches of edges sorted by (src, dst) as a vgraph file: the magic, blocks of block_edges edges as encoded by
+    # encode_block, the block index (byte offset and first edge of every block, and of the end) and a footer locating
+    # the index. Written through a temporary file; returns the number of edges
+    offsets, edge_starts = [], []
+    num_edges = 0
+    tmp_file = f"{file_path}.tmp"
+    with open(tmp_file, "wb") as f:
+        f.write(VGRAPH_MAGIC)
+        for block in _iter_blocks(sorted_batches, block_edges):
+            offsets.append(f.tell())
+            edge_starts.append(num_edges)
+            f.write(encode_block(block))
+            num_edges += len(block)
+        index_offset = f.tell()
+        offsets.append(index_offset)
+        edge_starts.append(num_edges)
+        np.array(offsets, dtype="<u8").tofile(f)
+        np.array(edge_starts, dtype="<u8").tofile(f)
+        footer = np.zeros(1, dtype=VGRAPH_FOOTER)
+        footer[0] = (index_offset, len(offsets) - 1, num_edges, block_edges, VGRAPH_MAGIC)
+        footer.tofile(f)
+    os.replace(tmp_file, file_path)
+    return num_edges
+
+def read_vgraph_index(file_path):
+    # (offsets, edge_starts) of the blocks of a vgraph file, each with one more entry for the end; block b holds edges
+    # edge_starts[b] to edge_starts[b + 1] in bytes offsets[b] to offsets[b + 1], so a reader can seek to any edge
+    with open(file_path, "rb") as f:
+        if f.read(len(VGRAPH_MAGIC)) != VGRAPH_MAGIC:
+            raise ValueError(f"{file_path}: not a vgraph file")
+        f.seek(-VGRAPH_FOOTER.itemsize, os.SEEK_END)
+        footer = np.frombuffer(f.read(VGRAPH_FOOTER.itemsize), dtype=VGRAPH_FOOTER)[0]
+        if footer["magic"] != VGRAPH_MAGIC:
+            raise ValueError(f"{file_path}: vgraph file is truncated")
+        f.seek(int(footer["index_offset"]))
+        num_entries = int(footer["num_blocks"]) + 1
+        offsets = np.fromfile(f, dtype="<u8", count=num_entries).astype(np.int64)
+        edge_starts = np.fromfile(f, dtype="<u8", count=num_entries).astype(np.int64)
+    return offsets, edge_starts
+
+def count_vgraph_edges(file_path):
+    return int(read_vgraph_index(file_path)[1][-1])
+
+def iter_vgraph_batches(file_path, first_block=0, stop_block=None):
+    # Decoded blocks first_block to stop_block of a vgraph file as (n, 2) int32 arrays
+    offsets, edge_starts = read_vgraph_index(file_path)
+    stop_block = len(offsets) - 1 if stop_block is None else stop_block
+    with open(file_path, "rb") as f:
+        f.seek(offsets[first_block])
+        for block in range(first_block, stop_block):
+            data = f.read(offsets[block + 1] - offsets[block])
+            yield decode_block(data, edge_starts[block + 1] - edge_starts[block])
+
+def _decode_vgraph_range(file_path, output_file, first_block, stop_block):
+    # One worker's blocks, written at their own edge offset of the preallocated output
+    _, edge_starts = read_vgraph_index(file_path)
+    with open(output_file, "r+b") as f:
+        f.seek(int(edge_starts[first_block]) * 8)
+        for batch in iter_vgraph_batches(file_path, first_block, stop_block):
+            batch.tofile(f)
+
+def decode_vgraph_file(file_path, output_file, workers=1):
+    # Native copy of a vgraph file, its blocks split over workers processes; returns the number of edges
+    offsets, edge_starts = read_vgraph_index(file_path)
+    num_blocks = len(offsets) - 1
+    with open(output_file, "wb") as f:
+        f.truncate(int(edge_starts[-1]) * 8)
+    bounds = [num_blocks * i // max(workers, 1) for i in range(max(workers, 1) + 1)]
+    ranges = [(file_path, output_file, start, stop) for start, stop in zip(bounds, bounds[1:]) if stop > start]
+    if len(ranges) > 1:
+        with multiprocessing.Pool(len(ranges)) as pool:
+            pool.starmap(_decode_vgraph_range, ranges)
+    else:
+        for args in ranges:
+            _decode_vgraph_range(*args)
+    return int(edge_starts[-1])
+
+def iter_edge_file_batches(file_path, workers=1):
+    # Edges of a file in any supported format as (n, 2) int32 arrays in file order; text is parsed by workers processes
+    file_format, compression = edge_file_format(file_path)
+    if file_format == "vgraph":
+        yield from iter_vgraph_batches(file_path)
+    elif file_format == "text":
+        yield from _parse_chunks(_iter_line_chunks(_iter_decompressed(file_path, compression)), workers)
+    else:
+        yield from _iter_binary_batches(_iter_decompressed(file_path, compression))
+
+def decode_edge_file(file_path, output_file, workers=1):
+    # Native <int32, int32> copy of a text, compressed or vgraph edge file; returns the number of edges
+    if edge_file_format(file_path)[0] == "vgraph":
+        return decode_vgraph_file(file_path, output_file, workers)
+    num_edges = 0
+    with open(output_file, "wb") as f:
+        for batch in iter_edge_file_batches(file_path, workers):
+            np.ascontiguousarray(batch, dtype=np.int32).tofile(f)
+            num_edges += len(batch)
+    return num_edges
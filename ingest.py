@@ -0,0 +1,44 @@
+import argparse
+import os
+import tempfile
+import time
+
+from utils import save_graph_batches
+from edge_formats import edge_file_format, is_native_edge_file, iter_edge_file_batches, save_vgraph, BLOCK_EDGES
+from dedup import iter_sorted_edges, unpack_keys, MEMORY_BUDGET
+
+def convert_graph(input_file, output_file, workers=1, memory_budget=MEMORY_BUDGET, block_edges=BLOCK_EDGES, dedup=False):
+    # One-time conversion of a text, gzip, zlib, vgraph or native edge file to a native .graph file, in input order, or to
+    # a .vgraph file, sorted by (src, dst) out of core within memory_budget bytes; dedup=True also drops repeated edges
+    # of a vgraph. Returns the number of edges written
+    start_time = time.time()
+    output_format, compression = edge_file_format(output_file)
+    if output_format == "text" or compression is not None:
+        raise ValueError(f"{output_file}: output must be a native graph or a vgraph file")
+    if output_format == "graph":
+        num_edges = save_graph_batches(iter_edge_file_batches(input_file, workers), output_file)
+    else:
+        with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(output_file))) as tmp_dir:
+            native_file = input_file
+            if not is_native_edge_file(input_file):
+                native_file = os.path.join(tmp_dir, "edges.graph")
+                save_graph_batches(iter_edge_file_batches(input_file, workers), native_file)
+            sorted_batches = (unpack_keys(keys) for keys, _ in iter_sorted_edges(native_file, memory_budget, tmp_dir, unique=dedup))
+            num_edges = save_vgraph(sorted_batches, output_file, block_edges)
+    print(f"Converted {num_edges} edges of {input_file} to {output_file} ({os.path.getsize(output_file)} bytes) "
+          f"in {time.time() - start_time} seconds")
+    return num_edges
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert text, gzip and zlib edge lists to the native binary or vgraph format")
+    parser.add_argument("-i", "--input_file", type=str, required=True)
+    parser.add_argument("-o", "--output_file", type=str, required=True, help="A .graph file for native output, a .vgraph file for compact output")
+    parser.add_argument("-w", "--workers", type=int, help="Processes parsing text", default=os.cpu_count() or 1)
+    parser.add_argument("-mb", "--memory_budget", type=int, help="Memory in MB for sorting edges out of core", default=MEMORY_BUDGET >> 20)
+    parser.add_argument("-be", "--block_edges", type=int, help="Edges per vgraph block", default=BLOCK_EDGES)
+    parser.add_argument("-dd", "--dedup", action="store_true", help="Drop repeated edges of a vgraph")
+    args = parser.parse_args()
+    convert_graph(args.input_file, args.output_file, args.workers, args.memory_budget << 20, args.block_edges, args.dedup)
+
+if __name__ == "__main__":
+    main()
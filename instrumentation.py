@@ -0,0 +1,175 @@
+import collections
+import contextlib
+import json
+import os
+import resource
+import signal
+import sys
+import time
+
+PROGRESS_SECONDS = 10  # minimum seconds between progress lines
+SAMPLE_INTERVAL = 0.01  # CPU seconds between profiler samples
+PROFILE_TOP = 30  # functions listed in the report
+
+def current_rss_mb():
+    # Resident set size now, from /proc where there is one, else the peak so far
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1 << 20)
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+def peak_rss_mb():
+    # ru_maxrss is KB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+class Metrics:
+    # Phase timings, progress samples and partition results of one run. Phases are always timed, which costs two clock
+    # reads per phase; samples and results are only kept once enabled
+    def __init__(self):
+        self.enabled = False
+        self.start_time = time.time()
+        self.phases = {}
+        self.samples = []
+        self.results = []
+        self.profiler = None
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start_time)
+
+    def add_time(self, name, seconds):
+        # Time measured elsewhere, such as the stalls of a read-ahead thread, counted as one call of the named phase
+        entry = self.phases.setdefault(name, {"seconds": 0.0, "calls": 0})
+        entry["seconds"] += seconds
+        entry["calls"] += 1
+        if self.enabled:
+            entry["rss_mb"] = current_rss_mb()
+
+    def sample(self, label, edges, seconds, rss_mb):
+        if self.enabled:
+            self.samples.append({"label": label, "edges": edges, "seconds": seconds, "rss_mb": rss_mb})
+
+    def record_result(self, result):
+        # Quality metrics are taken from the PartitionResult when the report is written
+        if self.enabled:
+            self.results.append(result)
+
+    def report(self, extra=None):
+        report = {
+            "command": sys.argv,
+            "wall_seconds": time.time() - self.start_time,
+            "peak_rss_mb": peak_rss_mb(),
+            "phases": self.phases,
+            "progress": self.samples,
+            "quality": [_quality(result) for result in self.results],
+        }
+        if self.profiler is not None:
+            report["profile"] = self.profiler.top()
+        report.update(extra or {})
+        return report
+
+def _quality(result):
+    stats = result.stats()
+    quality = {name: stats[name] for name in ("algorithm", "num_partitions", "num_vertices", "num_edges", "replication_factor",
+                                              "edge_balance", "vertex_balance", "partition_edges", "partition_vertices")}
+    quality["cut_edges"] = stats.get("cut_edges", 0)
+    return quality
+
+METRICS = Metrics()
+
+def phase(name):
+    # with phase("placement"): ... adds the block's wall time to the named phase
+    return METRICS.phase(name)
+
+def record_result(result):
+    METRICS.record_result(result)
+
+def enable_metrics(profile=False):
+    METRICS.enabled = True
+    if profile:
+        METRICS.profiler = SamplingProfiler()
+        METRICS.profiler.start()
+
+def write_report(output_file, extra=None):
+    # JSON report of the run: phases, throughput samples, peak memory, quality of every partition result and the profile
+    if METRICS.profiler is not None:
+        METRICS.profiler.stop()
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    with open(output_file, "w") as f:
+        json.dump(METRICS.report(extra), f, indent=2)
+    print(f"Metrics saved to {output_file}")
+
+class ProgressReporter:
+    # Progress of a pass over total_edges edges, printed at most once every interval seconds with the throughput, the time
+    # left at that rate and the resident memory
+    def __init__(self, total_edges, label="Processed", interval=PROGRESS_SECONDS):
+        self.total_edges = total_edges
+        self.label = label
+        self.interval = interval
+        self.start_time = time.perf_counter()
+        self.next_time = self.start_time + interval
+
+    def update(self, edges):
+        now = time.perf_counter()
+        if now < self.next_time:
+            return
+        self.next_time = now + self.interval
+        elapsed = now - self.start_time
+        rate = edges / elapsed if elapsed else 0.0
+        eta = (self.total_edges - edges) / rate if rate else 0.0
+        rss_mb = current_rss_mb()
+        print(f"{self.label} {edges}/{self.total_edges} edges ({100 * edges / max(self.total_edges, 1):.1f}%) in {elapsed:.1f} seconds, "
+              f"{rate:.0f} edges/s, ETA {eta:.0f} seconds, RSS {rss_mb:.0f} MB")
+        METRICS.sample(self.label, edges, elapsed, rss_mb)
+
+class SamplingProfiler:
+    # Statistical profiler on SIGPROF: every interval seconds of CPU time the running Python stack is recorded, each
+    # function counting once as inclusive and the innermost line as self. Only the main thread is sampled, and where
+    # setitimer is missing (Windows) the profiler does nothing
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = 0
+        self.inclusive = collections.Counter()
+        self.self_lines = collections.Counter()
+        self.previous_handler = None
+        self.running = False
+
+    def _sample(self, signum, frame):
+        self.samples += 1
+        if frame is None:
+            return
+        code = frame.f_code
+        self.self_lines[f"{code.co_filename}:{frame.f_lineno} ({code.co_name})"] += 1
+        seen = set()
+        while frame is not None:
+            code = frame.f_code
+            name = f"{code.co_filename}:{code.co_firstlineno} ({code.co_name})"
+            if name not in seen:
+                seen.add(name)
+                self.inclusive[name] += 1
+            frame = frame.f_back
+
+    def start(self):
+        if not hasattr(signal, "setitimer"):
+            return
+        self.previous_handler = signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        self.running = True
+
+    def stop(self):
+        if not self.running:
+            return
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, self.previous_handler)
+        self.running = False
+
+    def top(self, n=PROFILE_TOP):
+        def ranked(counter):
+            return [{"location": name, "samples": count, "fraction": count / self.samples} for name, count in counter.most_common(n)]
+        return {"interval": self.interval, "samples": self.samples, "inclusive": ranked(self.inclusive), "self": ranked(self.self_lines)}
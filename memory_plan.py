@@ -0,0 +1,122 @@
+import os
+import tempfile
+import numpy as np
+
+from utils import count_edges, edge_array, graph_cache_dir, load_cached_arrays, partition_dtype, BATCH_SIZE
+
+REPRESENTATIONS = ["memory", "mmap", "disk"]
+SAMPLE_EDGES = 1 << 16  # random edges sampled to estimate the number of vertices
+IN_MEMORY_BYTES_PER_EDGE = 400  # edge tuples, the edge array and detailed partitions of the in-memory mode (measured ~320-380)
+BATCH_BYTES_PER_EDGE = 64  # the batch, its dense endpoints, partitions and temporaries of a streamed batch
+BATCH_SHARE = 4  # streamed batches take at most 1 / BATCH_SHARE of the budget
+MIN_BATCH_SIZE = 1 << 16
+# Per-vertex bytes beyond the index and replica store: degree counters and cached degrees, HDRF's partial degrees, the
+# vertex placement of the edge-cuts and of ginger
+ALGORITHM_VERTEX_BYTES = {"edge_cut": 8, "random_vertex_cut": 0, "heuristic_vertex_cut": 0, "hybrid_vertex_cut": 28, "ldg_edge_cut": 18,
+                          "fennel_edge_cut": 18, "hdrf_vertex_cut": 4, "dbh_vertex_cut": 28, "ginger_vertex_cut": 46}
+
+class StateAllocator:
+    # Arrays of per-vertex (or per-edge) state, kept in RAM while their total fits budget bytes and, past it, in
+    # memory-mapped scratch files in spill_dir whose pages the kernel writes back and drops under memory pressure.
+    # Scratch files are unlinked once mapped, so they go away with the arrays. An array that is dropped before the run
+    # ends gives its bytes back with release(). Without spill_dir everything is in RAM and nothing is counted, so the
+    # allocator carries no state from one run to the next
+    def __init__(self, budget=0, spill_dir=None):
+        self.budget = budget
+        self.spill_dir = spill_dir
+        self.used = 0
+        self.spilled = 0
+
+    def full(self, shape, fill_value, dtype):
+        dtype = np.dtype(dtype)
+        if self.spill_dir is None:
+            return np.full(shape, fill_value, dtype=dtype)
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        if nbytes == 0 or self.used + nbytes <= self.budget:
+            self.used += nbytes
+            return np.full(shape, fill_value, dtype=dtype)
+        os.makedirs(self.spill_dir, exist_ok=True)
+        fd, scratch_file = tempfile.mkstemp(suffix=".state", dir=self.spill_dir)
+        os.close(fd)
+        # A new file reads as zeros, so only other fill values are written
+        array = np.memmap(scratch_file, dtype=dtype, mode="w+", shape=shape)
+        os.unlink(scratch_file)
+        if fill_value:
+            array.fill(fill_value)
+        self.spilled += nbytes
+        return array
+
+    def zeros(self, shape, dtype):
+        return self.full(shape, 0, dtype)
+
+    def release(self, array):
+        # Return the bytes of an array the caller no longer uses; a spilled one is unmapped with its last reference
+        if self.spill_dir is None or array is None:
+            return
+        if isinstance(array, np.memmap):
+            self.spilled = max(self.spilled - array.nbytes, 0)
+        else:
+            self.used = max(self.used - array.nbytes, 0)
+
+IN_MEMORY = StateAllocator()
+
+def estimate_vertices(source, sample_edges=SAMPLE_EDGES, seed=0):
+    # (number of vertices, ID span) of a graph: exact from the cached index or a small graph, otherwise estimated from the
+    # endpoints of random edges with the GEE estimator (Charikar et al.), sqrt(N / r) * f1 + sum of f_j for j >= 2, where
+    # f_j counts the IDs seen j times among r sampled of N endpoints
+    if isinstance(source, (str, os.PathLike)):
+        cached = load_cached_arrays(source, ["vertex_ids"])
+        if cached is not None:
+            ids = cached[0]["vertex_ids"]
+            return len(ids), int(ids[-1]) - int(ids[0]) + 1 if len(ids) else 0
+    edges = edge_array(source)
+    if len(edges) <= sample_edges:
+        ids = np.unique(edges)
+        return len(ids), int(ids[-1]) - int(ids[0]) + 1 if len(ids) else 0
+    # Sorted positions read the mmap front to back
+    positions = np.sort(np.random.default_rng(seed).choice(len(edges), sample_edges, replace=False))
+    endpoints = edges[positions].ravel()
+    frequencies = np.bincount(np.unique(endpoints, return_counts=True)[1])
+    estimate = np.sqrt(2 * len(edges) / len(endpoints)) * frequencies[1] + frequencies[2:].sum()
+    return int(min(estimate, 2 * len(edges))), int(endpoints.max()) - int(endpoints.min()) + 1
+
+def plan_memory(path, algorithm, num_partitions, memory_budget):
+    # Footprint of a run in each representation, from the file size and the estimated number of vertices, and the
+    # representation to use within memory_budget bytes: "memory" loads every edge as in the default mode, "mmap" streams
+    # the mmap-ed file with per-vertex state in RAM, and "disk" also spills per-vertex state past the budget to scratch
+    # files. The file's own pages are page cache, which the kernel reclaims, so they do not count
+    num_edges = count_edges(path)
+    num_vertices, span = estimate_vertices(path)
+    index_bytes = 4 * num_vertices + (4 * span if num_vertices >= 0.25 * span else 0)
+    # Replica mask of the smallest type with a bit per partition, and the master
+    store_bytes = next(size for size in (1, 2, 4, 8) if num_partitions <= 8 * size) + np.dtype(partition_dtype(num_partitions)).itemsize
+    vertex_bytes = index_bytes + num_vertices * (store_bytes + ALGORITHM_VERTEX_BYTES[algorithm])
+    batch_size = int(min(BATCH_SIZE, max(memory_budget // (BATCH_SHARE * BATCH_BYTES_PER_EDGE), MIN_BATCH_SIZE)))
+    memory_bytes = vertex_bytes + num_edges * IN_MEMORY_BYTES_PER_EDGE
+    mmap_bytes = vertex_bytes + batch_size * BATCH_BYTES_PER_EDGE
+    if memory_bytes <= memory_budget:
+        representation = "memory"
+    elif mmap_bytes <= memory_budget:
+        representation = "mmap"
+    else:
+        representation = "disk"
+    return {"representation": representation, "num_edges": num_edges, "num_vertices": num_vertices, "memory_bytes": memory_bytes,
+            "mmap_bytes": mmap_bytes, "batch_size": batch_size}
+
+def choose_representation(args, algorithm):
+    # Representation of a script run: -rp auto plans it within -mb, -rp names one, and without -rp it is mmap for -hu and
+    # memory otherwise. Returns it with the options it adds to partition()
+    if args.representation is None:
+        return ("mmap" if args.huge_graph else "memory"), {}
+    options = {}
+    representation = args.representation
+    if representation == "auto":
+        plan = plan_memory(args.input_file, algorithm, args.num_partitions, args.memory_budget << 20)
+        representation = plan["representation"]
+        print(f"Estimated {plan['num_vertices']} vertices and {plan['num_edges']} edges: {plan['memory_bytes'] >> 20} MB in memory, "
+              f"{plan['mmap_bytes'] >> 20} MB streamed, within {args.memory_budget} MB using {representation}")
+        if representation != "memory":
+            options["batch_size"] = plan["batch_size"]
+    if representation == "disk":
+        options["spill_dir"] = os.path.join(graph_cache_dir(args.input_file), "scratch")
+    return representation, options
@@ -0,0 +1,59 @@
+import time
+import os
+
+from utils import load_graph, save_vertex_cut_partitions, parse_args, get_output_file_name, get_mermaid_file_name, get_partition_file_name, save_huge_vertex_cut_partitions, save_detailed_vertex_cut_partitions, draw_mermaid_graph, build_partition_options, partition_delta_from_args
+from partitioning import partition
+from instrumentation import phase, enable_metrics, write_report
+
+def hdrf_vertex_cut_partition(edges, num_partitions, **options):
+    return partition(edges, "hdrf_vertex_cut", num_partitions, **options).to_detailed_partitions()
+
+def hdrf_vertex_cut_partition_huge(path, num_partitions, **options):
+    return partition(path, "hdrf_vertex_cut", num_partitions, keep_assignment=False, progress=True, **options).to_partitions()
+
+def main():
+    args = parse_args()
+    start = time.time()
+    input_file = args.input_file
+    method = "hdrf_vertex_cut"
+    output_file = os.path.join(args.output_dir, get_output_file_name(method, args.input_file, args.num_partitions))
+    output_file_detailed = os.path.join(args.output_dir, get_output_file_name(method, args.input_file, args.num_partitions, detailed=True))
+    mermaid_file = os.path.join(args.output_dir, get_mermaid_file_name(method, args.input_file, args.num_partitions))
+    metrics_file = os.path.join(args.output_dir, get_partition_file_name(method, args.input_file, args.num_partitions, ".metrics.json"))
+    if args.metrics or args.profile:
+        enable_metrics(args.profile)
+    representation, options = build_partition_options(args, method)
+    options["hdrf_lambda"] = args.hdrf_lambda
+    if args.delta:
+        result = partition_delta_from_args(args, method, options)
+        print(f"Partitioned in {time.time() - start} seconds")
+        with phase("save"):
+            save_huge_vertex_cut_partitions(result.to_partitions(), output_file)
+    elif representation != "memory":
+        partitions = hdrf_vertex_cut_partition_huge(input_file, args.num_partitions, **options)
+        print(f"Partitioned in {time.time() - start} seconds")
+        with phase("save"):
+            save_huge_vertex_cut_partitions(partitions, output_file)
+    else:
+        with phase("load"):
+            edges = load_graph(input_file)
+        partitions = hdrf_vertex_cut_partition(edges, args.num_partitions, **options)
+        print(f"Partitioned in {time.time() - start} seconds")
+        with phase("save"):
+            if args.print_detail:
+                save_detailed_vertex_cut_partitions(partitions, output_file_detailed)
+            elif args.print_both:
+                save_vertex_cut_partitions(partitions, output_file)
+                save_detailed_vertex_cut_partitions(partitions, output_file_detailed)
+            else:
+                save_vertex_cut_partitions(partitions, output_file)
+            if args.draw_mermaid:
+                draw_mermaid_graph(partitions, mermaid_file)
+    if args.write_shards:
+        with phase("shards"):
+            options["shards"].close()
+    if args.metrics or args.profile:
+        write_report(metrics_file)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -1,129 +1,24 @@
-from collections import defaultdict
-import mmap
-import struct
 import time
 import os
-from utils import load_graph, save_vertex_cut_partitions, save_huge_vertex_cut_partitions, parse_args, get_output_file_name, get_mermaid_file_name, save_detailed_vertex_cut_partitions, draw_mermaid_graph
+from utils import load_graph, save_vertex_cut_partitions, save_huge_vertex_cut_partitions, parse_args, get_output_file_name, get_mermaid_file_name, get_partition_file_name, save_detailed_vertex_cut_partitions, draw_mermaid_graph, count_edges, build_partition_options, partition_delta_from_args
+from partitioning import partition, SYNC_INTERVAL
+from instrumentation import phase, enable_metrics, write_report
+from dedup import unique_edge_file, MEMORY_BUDGET
 
-def heuristic_vertex_cut_partition(edges, num_partitions):
-    partitions = defaultdict(lambda: {"master_vertices": set(), "vertices": set(), "edges": []})
-    vertex_to_machines = defaultdict(set)  # Track which machines each vertex is assigned to
-    vertex_to_master = {}
-    partition_load = [0] * num_partitions  # Track edge load per partition
+def heuristic_vertex_cut_partition(edges, num_partitions, **options):
+    return partition(edges, "heuristic_vertex_cut", num_partitions, **options).to_detailed_partitions()
 
-    mean_edge_load = len(edges) / num_partitions
-
-    for src, dst in edges:
-        machines_u = vertex_to_machines[src]
-        machines_v = vertex_to_machines[dst]
-
-        if machines_u and machines_v:
-            # Case 1: If A(u) and A(v) intersect, assign to a machine in the intersection
-            intersection = machines_u & machines_v
-            if intersection:
-                chosen_partition = min(intersection, key=lambda x: partition_load[x])
-            else:
-                # Case 2: No intersection; assign to machine of vertex with more unassigned edges
-                chosen_partition = min(machines_u | machines_v,
-                                       key=lambda x: partition_load[x])
-        elif machines_u or machines_v:
-            # Case 3: One vertex is assigned; choose a machine from the assigned vertex
-            assigned_machines = machines_u or machines_v
-            chosen_partition = min(assigned_machines, key=lambda x: partition_load[x])
-        else:
-            # Case 4: Neither vertex is assigned; assign to the least loaded machine
-            chosen_partition = partition_load.index(min(partition_load))
-
-        # Assign edge to the chosen partition
-        partitions[chosen_partition]["edges"].append((src, dst))
-        partitions[chosen_partition]["vertices"].update([src, dst])
-        partition_load[chosen_partition] += 1  # Update load for chosen partition
-
-        # Update master and machine assignment
-        if src not in vertex_to_master:
-            partitions[chosen_partition]["master_vertices"].add(src)
-            vertex_to_master[src] = chosen_partition
-        vertex_to_machines[src].add(chosen_partition)
-        
-        if dst not in vertex_to_master:
-            partitions[chosen_partition]["master_vertices"].add(dst)
-            vertex_to_master[dst] = chosen_partition
-        vertex_to_machines[dst].add(chosen_partition)
-        
-        if len(partitions[chosen_partition]["edges"]) >= mean_edge_load:
-            # If the partition is full, remove it from the candidate list
-            for vertex in partitions[chosen_partition]["vertices"]:
-                vertex_to_machines[vertex].remove(chosen_partition)
-                
-    return partitions
-
-def heuristic_vertex_cut_partition_huge(path, num_partitions):
+def heuristic_vertex_cut_partition_huge(path, num_partitions, workers=1, sync_interval=SYNC_INTERVAL, dedup=False, memory_budget=MEMORY_BUDGET, **options):
     start_time = time.time()
-    with open(path, "r") as f:
-        # Read the file using mmap
-        mmapped_file = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
-        
-        partitions = defaultdict(lambda: {"master_vertices": set(), "vertices": set(), "edges": 0})
-        vertex_to_master = {}
-        vertex_to_machines = defaultdict(set)  # Track which machines each vertex is assigned to
-        partition_load = [0] * num_partitions  # Track edge load per partition
-
-        mean_edge_load = len(mmapped_file) / num_partitions / 8
-        print("mean_edge_load: ", mean_edge_load)
-
-        edge_num = 0
-        while True:
-            edge_num += 1
-            if edge_num % 100000000 == 0:
-                print(f"Processed {edge_num} edges in {time.time() - start_time} seconds")
-            data = mmapped_file.read(8)
-            if not data:
-                break
-            src, dst = struct.unpack("ii", data)
-            
-            machines_u = vertex_to_machines[src]
-            machines_v = vertex_to_machines[dst]
-
-            if machines_u and machines_v:
-                # Case 1: If A(u) and A(v) intersect, assign to a machine in the intersection
-                intersection = machines_u & machines_v
-                if intersection:
-                    chosen_partition = min(intersection, key=lambda x: partition_load[x])
-                else:
-                    # Case 2: No intersection; assign to machine of vertex with more unassigned edges
-                    chosen_partition = min(machines_u | machines_v,
-                                        key=lambda x: partition_load[x])
-            elif machines_u or machines_v:
-                # Case 3: One vertex is assigned; choose a machine from the assigned vertex
-                assigned_machines = machines_u or machines_v
-                chosen_partition = min(assigned_machines, key=lambda x: partition_load[x])
-            else:
-                # Case 4: Neither vertex is assigned; assign to the least loaded machine
-                chosen_partition = partition_load.index(min(partition_load))
-
-            # Assign edge to the chosen partition
-            partitions[chosen_partition]["vertices"].update([src, dst])
-            partition_load[chosen_partition] += 1  # Update load for chosen partition
-
-            # Update master and machine assignment
-            if src not in vertex_to_master:
-                partitions[chosen_partition]["master_vertices"].add(src)
-                vertex_to_master[src] = chosen_partition
-            vertex_to_machines[src].add(chosen_partition)
-            
-            if dst not in vertex_to_master:
-                partitions[chosen_partition]["master_vertices"].add(dst)
-                vertex_to_master[dst] = chosen_partition
-            vertex_to_machines[dst].add(chosen_partition)
-            
-            if partition_load[chosen_partition] >= mean_edge_load:
-                # If the partition is full, remove it from the candidate list
-                for vertex in partitions[chosen_partition]["vertices"]:
-                    vertex_to_machines[vertex].remove(chosen_partition)
-                    
-        for partition in partitions:
-            partitions[partition]["edges"] = partition_load[partition]
-    return partitions
+    if dedup:
+        path = unique_edge_file(path, memory_budget)
+    print("mean_edge_load: ", count_edges(path) / num_partitions)
+    result = partition(path, "heuristic_vertex_cut", num_partitions, workers=workers, sync_interval=sync_interval, keep_assignment=False, progress=True, memory_budget=memory_budget, **options)
+    if workers > 1:
+        print(f"Replication factor {result.stats()['replication_factor']:.4f} with {workers} workers and sync interval {sync_interval} in {time.time() - start_time} seconds")
+    else:
+        print(f"Replication factor {result.stats()['replication_factor']:.4f} in {time.time() - start_time} seconds")
+    return result.to_partitions()
 
 def main():
     args = parse_args()
@@ -134,23 +29,40 @@ def main():
     print(output_file)
     output_file_detailed = os.path.join(args.output_dir, get_output_file_name(method, args.input_file, args.num_partitions, detailed=True))
     mermaid_file = os.path.join(args.output_dir, get_mermaid_file_name(method, args.input_file, args.num_partitions))
-    if args.huge_graph:
-        partitions = heuristic_vertex_cut_partition_huge(input_file, args.num_partitions)
+    metrics_file = os.path.join(args.output_dir, get_partition_file_name(method, args.input_file, args.num_partitions, ".metrics.json"))
+    if args.metrics or args.profile:
+        enable_metrics(args.profile)
+    representation, options = build_partition_options(args, method)
+    if args.delta:
+        result = partition_delta_from_args(args, method, options)
+        print(f"Partitioned in {time.time() - start} seconds")
+        with phase("save"):
+            save_huge_vertex_cut_partitions(result.to_partitions(), output_file)
+    elif representation != "memory":
+        partitions = heuristic_vertex_cut_partition_huge(input_file, args.num_partitions, args.workers, args.sync_interval, **options)
         print(f"Partitioned in {time.time() - start} seconds")
-        save_huge_vertex_cut_partitions(partitions, output_file)
+        with phase("save"):
+            save_huge_vertex_cut_partitions(partitions, output_file)
     else:
-        edges = load_graph(input_file)
-        partitions = heuristic_vertex_cut_partition(edges, args.num_partitions)
+        with phase("load"):
+            edges = load_graph(input_file)
+        partitions = heuristic_vertex_cut_partition(edges, args.num_partitions, **options)
         print(f"Partitioned in {time.time() - start} seconds")
-        if args.print_detail:
-            save_detailed_vertex_cut_partitions(partitions, output_file_detailed)
-        elif args.print_both:
-            save_vertex_cut_partitions(partitions, output_file)
-            save_detailed_vertex_cut_partitions(partitions, output_file_detailed)
-        else:
-            save_vertex_cut_partitions(partitions, output_file)
-        if args.draw_mermaid:
-            draw_mermaid_graph(partitions, mermaid_file)
+        with phase("save"):
+            if args.print_detail:
+                save_detailed_vertex_cut_partitions(partitions, output_file_detailed)
+            elif args.print_both:
+                save_vertex_cut_partitions(partitions, output_file)
+                save_detailed_vertex_cut_partitions(partitions, output_file_detailed)
+            else:
+                save_vertex_cut_partitions(partitions, output_file)
+            if args.draw_mermaid:
+                draw_mermaid_graph(partitions, mermaid_file)
+    if args.write_shards:
+        with phase("shards"):
+            options["shards"].close()
+    if args.metrics or args.profile:
+        write_report(metrics_file)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,131 +1,114 @@
-from collections import defaultdict
-import mmap
-import struct
+from functools import partial
 import time
 import os
 
-from utils import load_graph, save_vertex_cut_partitions, save_huge_vertex_cut_partitions, parse_args, get_output_file_name, get_mermaid_file_name, save_detailed_vertex_cut_partitions, draw_mermaid_graph
+from utils import load_graph, save_vertex_cut_partitions, save_huge_vertex_cut_partitions, parse_args, get_output_file_name, get_mermaid_file_name, get_partition_file_name, save_detailed_vertex_cut_partitions, draw_mermaid_graph, get_summary_file_name, replication_factor, build_partition_options, partition_delta_from_args
+from vertex_index import load_vertex_index, load_degrees
+from parallel_placement import place_edges_multi
+from partitioning import partition, hybrid_parts, ginger_parts, PartitionResult
+from instrumentation import phase, enable_metrics, write_report
+from dedup import unique_edge_file
+from vertex_partitioning import ginger_vertex_partition
 
-def hybrid_cut_partition(edges, num_partitions, degree_threshold):
-    partitions = defaultdict(lambda: {"master_vertices": set(), "vertices": set(), "edges": []})
-    vertex_degrees = defaultdict(int)
-    vertex_to_master = {}
-    
-    # Count in-degrees of vertices to determine low/high degree status
-    for src, dst in edges:
-        vertex_degrees[src] += 1
-        vertex_degrees[dst] += 1
+def hybrid_cut_partition(edges, num_partitions, degree_threshold, method="hybrid_vertex_cut", **options):
+    return partition(edges, method, num_partitions, degree_threshold, **options).to_detailed_partitions()
 
-    for src, dst in edges:
-        # Determine if destination vertex is high-degree
-        is_high_degree = vertex_degrees[dst] > degree_threshold
-
-        if is_high_degree:
-            # High-degree vertex: assign edge based on the source vertex
-            chosen_partition = (src - 1) % num_partitions
-        else:
-            # Low-degree vertex: assign edge based on the destination vertex
-            chosen_partition = (dst - 1) % num_partitions
-
-        # Assign the edge and track vertices in the chosen partition
-        partitions[chosen_partition]["edges"].append((src, dst))
-        partitions[chosen_partition]["vertices"].update([src, dst])
-        
-        # Assign master vertices if not already assigned
-        if src not in vertex_to_master:
-            vertex_to_master[src] = chosen_partition
-            partitions[chosen_partition]["master_vertices"].add(src)
-
-        if dst not in vertex_to_master:
-            vertex_to_master[dst] = chosen_partition
-            partitions[chosen_partition]["master_vertices"].add(dst)
-
-    return partitions
-
-def hybrid_cut_partition_huge(path, num_partitions, degree_threshold):
+def hybrid_cut_partition_sweep(path, configs, workers=1, ginger=False, read_ahead=0):
+    # Evaluate every (num_partitions, degree_threshold) configuration in a single placement pass; with ginger, the
+    # low-degree vertices of each configuration are placed first, one pass over the in-edge file each
     start_time = time.time()
-    with open(path, "r") as f:
-        # Read the file using mmap
-        mmapped_file = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
-        
-        partitions = defaultdict(lambda: {"master_vertices": set(), "vertices": set(), "edges": 0})
-        vertex_degrees = defaultdict(int)
-        vertex_to_master = {}
-    
-        # Count in-degrees of vertices to determine low/high degree status
-        while True:
-            data = mmapped_file.read(8)
-            if not data:
-                break
-            src, dst = struct.unpack("ii", data)
-            vertex_degrees[src] += 1
-            vertex_degrees[dst] += 1
-
-        print(f"Loaded {len(vertex_degrees)} vertices in {time.time() - start_time} seconds")
-        start_time = time.time()
-        mmapped_file.seek(0)
-
-        edge_num = 0
-        while True:
-            edge_num += 1
-            if edge_num % 100000000 == 0:
-                print(f"Processed {edge_num} edges in {time.time() - start_time} seconds")
-            data = mmapped_file.read(8)
-            if not data:
-                break
-            src, dst = struct.unpack("ii", data)
+    index = load_vertex_index(path)
 
-            # Determine if destination vertex is high-degree
-            is_high_degree = vertex_degrees[dst] > degree_threshold
+    # Degrees of vertices determine low/high degree status
+    vertex_degrees = load_degrees(path, index, workers)["degree"]
 
-            if is_high_degree:
-                # High-degree vertex: assign edge based on the source vertex
-                chosen_partition = (src - 1) % num_partitions
-            else:
-                # Low-degree vertex: assign edge based on the destination vertex
-                chosen_partition = (dst - 1) % num_partitions
-
-            # Assign the edge and track vertices in the chosen partition
-            partitions[chosen_partition]["edges"] += 1
-            partitions[chosen_partition]["vertices"].update([src, dst])
-            
-            # Assign master vertices if not already assigned
-            if src not in vertex_to_master:
-                vertex_to_master[src] = chosen_partition
-                partitions[chosen_partition]["master_vertices"].add(src)
+    print(f"Loaded {len(vertex_degrees)} vertices in {time.time() - start_time} seconds")
 
-            if dst not in vertex_to_master:
-                vertex_to_master[dst] = chosen_partition
-                partitions[chosen_partition]["master_vertices"].add(dst)
-
-    return partitions
+    if ginger:
+        placements = [(num_partitions, partial(ginger_parts, num_partitions=num_partitions, vertex_degrees=vertex_degrees, degree_threshold=degree_threshold,
+                                               vertex_parts=ginger_vertex_partition(path, index, num_partitions, vertex_degrees, degree_threshold)))
+                      for num_partitions, degree_threshold in configs]
+    else:
+        placements = [(num_partitions, partial(hybrid_parts, num_partitions=num_partitions, vertex_degrees=vertex_degrees, degree_threshold=degree_threshold))
+                      for num_partitions, degree_threshold in configs]
+    stores = place_edges_multi(path, index, placements, workers, read_ahead=read_ahead)
+    return [PartitionResult("ginger_vertex_cut" if ginger else "hybrid_vertex_cut", store, index) for store in stores]
+
+def hybrid_cut_partition_huge(path, num_partitions, degree_threshold, workers=1, method="hybrid_vertex_cut", **options):
+    return partition(path, method, num_partitions, degree_threshold, workers, keep_assignment=False, progress=True, **options).to_partitions()
+
+def sweep_summary(configs, results):
+    lines = [f"{'partitions':>10} {'threshold':>10} {'replication':>12} {'edge_balance':>12} {'vertex_balance':>14}"]
+    for (num_partitions, degree_threshold), result in zip(configs, results):
+        stats = result.stats()
+        lines.append(f"{num_partitions:>10} {degree_threshold:>10} {stats['replication_factor']:>12.4f} {stats['edge_balance']:>12.4f} {stats['vertex_balance']:>14.4f}")
+    return "\n".join(lines) + "\n"
+
+def sweep_main(args):
+    start = time.time()
+    method = "ginger_vertex_cut" if args.ginger else "hybrid_vertex_cut"
+    configs = [(num_partitions, degree_threshold) for num_partitions in (args.partition_counts or [args.num_partitions])
+               for degree_threshold in (args.thresholds or [args.degree_threshold])]
+    input_file = unique_edge_file(args.input_file, args.memory_budget << 20) if args.dedup else args.input_file
+    results = hybrid_cut_partition_sweep(input_file, configs, args.workers, args.ginger, args.read_ahead)
+    print(f"Partitioned {len(configs)} configurations in {time.time() - start} seconds")
+    for (num_partitions, degree_threshold), result in zip(configs, results):
+        output_file = os.path.join(args.output_dir, get_output_file_name(method, args.input_file, num_partitions, detailed=False, threshold=degree_threshold))
+        save_huge_vertex_cut_partitions(result.to_partitions(), output_file)
+    summary = sweep_summary(configs, results)
+    print(summary, end="")
+    with open(os.path.join(args.output_dir, get_summary_file_name(method, args.input_file, "sweep")), "w") as f:
+        f.write(summary)
 
 def main():
     args = parse_args()
+    if args.thresholds or args.partition_counts:
+        sweep_main(args)
+        return
     start = time.time()
     input_file = args.input_file
-    method = "hybrid_vertex_cut"
+    # Ginger writes to its own output folder, so its replication factor can be compared with the hash placement's
+    method = "ginger_vertex_cut" if args.ginger else "hybrid_vertex_cut"
     output_file = os.path.join(args.output_dir, get_output_file_name(method, args.input_file, args.num_partitions, detailed=False, threshold=args.degree_threshold))
     print("Output file:", output_file)
     output_file_detailed = os.path.join(args.output_dir, get_output_file_name(method, args.input_file, args.num_partitions, detailed=True, threshold=args.degree_threshold))
     mermaid_file = os.path.join(args.output_dir, get_mermaid_file_name(method, args.input_file, args.num_partitions, threshold=args.degree_threshold))
-    if args.huge_graph:
-        partitions = hybrid_cut_partition_huge(input_file, args.num_partitions, args.degree_threshold)
+    metrics_file = os.path.join(args.output_dir, get_partition_file_name(method, args.input_file, args.num_partitions, ".metrics.json", threshold=args.degree_threshold))
+    if args.metrics or args.profile:
+        enable_metrics(args.profile)
+    representation, options = build_partition_options(args, method, threshold=args.degree_threshold)
+    if args.delta:
+        result = partition_delta_from_args(args, method, options, threshold=args.degree_threshold)
+        print(f"Partitioned in {time.time() - start} seconds")
+        with phase("save"):
+            save_huge_vertex_cut_partitions(result.to_partitions(), output_file)
+    elif representation != "memory":
+        partitions = hybrid_cut_partition_huge(input_file, args.num_partitions, args.degree_threshold, args.workers, method=method, **options)
         print(f"Partitioned in {time.time() - start} seconds")
-        save_huge_vertex_cut_partitions(partitions, output_file)
+        print(f"Replication factor {replication_factor(partitions):.4f}")
+        with phase("save"):
+            save_huge_vertex_cut_partitions(partitions, output_file)
     else:
-        edges = load_graph(input_file)
-        partitions = hybrid_cut_partition(edges, args.num_partitions, args.degree_threshold)
+        with phase("load"):
+            edges = load_graph(input_file)
+        partitions = hybrid_cut_partition(edges, args.num_partitions, args.degree_threshold, method=method, **options)
         print(f"Partitioned in {time.time() - start} seconds")
-        if args.print_detail:
-            save_detailed_vertex_cut_partitions(partitions, output_file_detailed)
-        elif args.print_both:
-            save_vertex_cut_partitions(partitions, output_file)
-            save_detailed_vertex_cut_partitions(partitions, output_file_detailed)
-        else:
-            save_vertex_cut_partitions(partitions, output_file)
-        if args.draw_mermaid:
-            draw_mermaid_graph(partitions, mermaid_file)
+        print(f"Replication factor {replication_factor(partitions):.4f}")
+        with phase("save"):
+            if args.print_detail:
+                save_detailed_vertex_cut_partitions(partitions, output_file_detailed)
+            elif args.print_both:
+                save_vertex_cut_partitions(partitions, output_file)
+                save_detailed_vertex_cut_partitions(partitions, output_file_detailed)
+            else:
+                save_vertex_cut_partitions(partitions, output_file)
+            if args.draw_mermaid:
+                draw_mermaid_graph(partitions, mermaid_file)
+    if args.write_shards:
+        with phase("shards"):
+            options["shards"].close()
+    if args.metrics or args.profile:
+        write_report(metrics_file)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,66 @@
+import multiprocessing
+
+from utils import split_edge_ranges, EDGE_BYTES, BATCH_SIZE
+from replica_store import ReplicaStore
+from prefetch import prefetch_edge_batches
+from memory_plan import IN_MEMORY
+
+_worker_state = {}
+
+def _init_worker(state):
+    _worker_state.update(state)
+
+def _run_task_args(args):
+    task, path, offset, length = args
+    return task(path, offset, length, **_worker_state)
+
+def map_edge_ranges(path, task, workers=1, **state):
+    # Run task(path, offset, length, **state) over contiguous byte ranges of the edge file, one per worker; yields results in file order
+    ranges = split_edge_ranges(path, max(workers, 1))
+    if workers <= 1:
+        for offset, length in ranges:
+            yield task(path, offset, length, **state)
+        return
+    # Workers inherit state on fork and map the file themselves, sharing its page cache
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(state,)) as pool:
+        yield from pool.imap(_run_task_args, [(task, path, offset, length) for offset, length in ranges])
+
+class PlacementStream:
+    # Stateless placement of batches of edges, place_batch(batch, src, dst, first_edge) -> partition per edge
+    def __init__(self, num_vertices, num_partitions, place_batch, first_edge=0, allocator=IN_MEMORY):
+        self.store = ReplicaStore(num_vertices, num_partitions, allocator)
+        self.store.num_edges = first_edge
+        self.place_batch = place_batch
+
+    def consume(self, batch, src, dst):
+        parts = self.place_batch(batch, src, dst, self.store.num_edges).astype(self.store.masters.dtype, copy=False)
+        self.store.place_edges(src, dst, parts)
+        return parts
+
+    def partitions(self):
+        return self.store.to_partitions()
+
+def _place_range(path, offset, length, index, placements, batch_size, read_ahead):
+    streams = [PlacementStream(len(index), num_partitions, place_batch, offset // EDGE_BYTES) for num_partitions, place_batch in placements]
+    for batch in prefetch_edge_batches(path, batch_size, offset, length, read_ahead, progress=offset == 0):
+        src = index.lookup(batch[:, 0])
+        dst = index.lookup(batch[:, 1])
+        for stream in streams:
+            stream.consume(batch, src, dst)
+    return [stream.store for stream in streams]
+
+def place_edges_multi(path, index, placements, workers=1, batch_size=BATCH_SIZE, read_ahead=0):
+    # Place every edge under each (num_partitions, place_batch) configuration in one pass over the file, where
+    # place_batch(batch, src, dst, first_edge) -> partitions is stateless. Per-range stores are merged in file order
+    # so the result matches a single-process run. read_ahead > 0 has each worker read that many batches ahead of its placement
+    stores = None
+    for partials in map_edge_ranges(path, _place_range, workers, index=index, placements=placements, batch_size=batch_size, read_ahead=read_ahead):
+        if stores is None:
+            stores = partials
+        else:
+            for store, partial in zip(stores, partials):
+                store.merge(partial)
+    return stores if stores is not None else [ReplicaStore(len(index), num_partitions) for num_partitions, _ in placements]
+
+def place_edges_sharded(path, index, num_partitions, place_batch, workers=1, batch_size=BATCH_SIZE, read_ahead=0):
+    return place_edges_multi(path, index, [(num_partitions, place_batch)], workers, batch_size, read_ahead)[0]
@@ -0,0 +1,692 @@
+from collections import deque
+from functools import cached_property, partial
+from multiprocessing import shared_memory
+import multiprocessing
+import os
+import numpy as np
+
+from utils import edge_array, iter_edge_batches, sorted_unique, EDGE_BYTES, BATCH_SIZE
+from vertex_index import load_vertex_index, load_degrees, build_vertex_index, merge_vertex_index
+from replica_store import ReplicaStore, mask_dtype
+from parallel_placement import PlacementStream, map_edge_ranges, place_edges_sharded
+from dedup import unique_edges, unique_edge_file, MEMORY_BUDGET
+from routing_table import save_routing_table
+from placement_state import save_state, load_state, extend_store, Checkpointer
+from instrumentation import phase, record_result
+from vertex_partitioning import vertex_partition, ginger_vertex_partition
+from prefetch import prefetch_edge_batches
+from memory_plan import StateAllocator, IN_MEMORY
+
+ALGORITHMS = ["edge_cut", "random_vertex_cut", "heuristic_vertex_cut", "hybrid_vertex_cut", "ldg_edge_cut", "fennel_edge_cut",
+              "hdrf_vertex_cut", "dbh_vertex_cut", "ginger_vertex_cut"]
+# Algorithms that place vertices and cut edges, with output in the edge-cut format, and the streaming vertex partitioner
+# of those that do not hash
+EDGE_CUT_ALGORITHMS = ["edge_cut", "ldg_edge_cut", "fennel_edge_cut"]
+VERTEX_PARTITIONER_OF = {"ldg_edge_cut": "ldg", "fennel_edge_cut": "fennel"}
+# Vertex-cut algorithms that need the degree of every vertex up front, and those whose placement of a batch is stateless,
+# which a sharded pass can run in worker processes (heuristic has its own coordinated parallel greedy)
+DEGREE_ALGORITHMS = ["hybrid_vertex_cut", "dbh_vertex_cut", "ginger_vertex_cut"]
+SHARDED_ALGORITHMS = ["random_vertex_cut", "heuristic_vertex_cut", "hybrid_vertex_cut", "dbh_vertex_cut", "ginger_vertex_cut"]
+# Hybrid-cut algorithms, which take a degree threshold
+HYBRID_ALGORITHMS = ["hybrid_vertex_cut", "ginger_vertex_cut"]
+# Algorithms whose saved state partition_delta() can continue
+DELTA_ALGORITHMS = ["random_vertex_cut", "heuristic_vertex_cut", "hybrid_vertex_cut", "hdrf_vertex_cut", "dbh_vertex_cut"]
+HDRF_LAMBDA = 1.0  # weight of the balance term of HDRF
+HDRF_EPSILON = 1.0
+SYNC_INTERVAL = 1000000  # edges each worker places between state exchanges
+MIN_SYNC_LOG = 1 << 16  # smallest ring of replica records the parallel greedy workers exchange through
+
+class EdgeCutStream:
+    # Edge-cut over batches of edges; without vertex_masters, dense vertices are dealt round-robin (hash edge-cut), same as
+    # iterating the set of vertex IDs. store.edges counts the edges kept inside a partition, replicated_counts the cut
+    # edges copied to it
+    def __init__(self, num_vertices, num_partitions, vertex_masters=None, allocator=IN_MEMORY):
+        self.num_partitions = num_partitions
+        self.store = ReplicaStore(num_vertices, num_partitions, allocator)
+        self.store.masters[:] = np.arange(num_vertices) % num_partitions if vertex_masters is None else vertex_masters
+        self.replicated_counts = np.zeros(num_partitions, dtype=np.int64)
+
+    def consume(self, batch, src, dst):
+        # Returns the partition of each edge's source, which owns the edge
+        vertex_to_partition = self.store.masters
+        src_part = vertex_to_partition[src]
+        dst_part = vertex_to_partition[dst]
+
+        # Add edges to appropriate partitions, replicating those across partitions
+        same = src_part == dst_part
+        self.store.edges += np.bincount(src_part[same], minlength=self.num_partitions)
+        cross = ~same
+        self.replicated_counts += np.bincount(src_part[cross], minlength=self.num_partitions)
+        self.replicated_counts += np.bincount(dst_part[cross], minlength=self.num_partitions)
+
+        # Update vertices info
+        self.store.add_replicas(np.concatenate((src, dst, src, dst)), np.concatenate((src_part, src_part, dst_part, dst_part)))
+        return src_part
+
+    def partitions(self):
+        partitions = self.store.to_partitions(range(min(self.num_partitions, self.store.num_vertices)))
+        for part_id, data in partitions.items():
+            data["replicated_edges"] = int(self.replicated_counts[part_id])
+        return partitions
+
+def round_robin_parts(batch, src, dst, first_edge, num_partitions):
+    # Round-robin assignment to partitions by global edge index
+    return (first_edge + np.arange(len(batch))) % num_partitions
+
+def hybrid_parts(batch, src, dst, first_edge, num_partitions, vertex_degrees, degree_threshold):
+    # High-degree destination: assign edge based on the source vertex, otherwise on the destination vertex
+    is_high_degree = vertex_degrees[dst] > degree_threshold
+    return np.where(is_high_degree, (batch[:, 0] - 1) % num_partitions, (batch[:, 1] - 1) % num_partitions)
+
+def ginger_parts(batch, src, dst, first_edge, num_partitions, vertex_degrees, degree_threshold, vertex_parts):
+    # Hybrid-cut with Ginger's placement of low-degree vertices: a low-degree destination takes the edge to its partition,
+    # a high-degree one leaves it to the source's, which is the hash of a high-degree source
+    is_high_degree = vertex_degrees[dst] > degree_threshold
+    return np.where(is_high_degree, vertex_parts[src], vertex_parts[dst])
+
+def dbh_parts(batch, src, dst, first_edge, num_partitions, vertex_degrees):
+    # Degree-Based Hashing: hash the endpoint of lower degree, so high-degree vertices are the ones replicated; ties hash the source
+    hash_dst = vertex_degrees[dst] < vertex_degrees[src]
+    return np.where(hash_dst, (batch[:, 1] - 1) % num_partitions, (batch[:, 0] - 1) % num_partitions)
+
+def greedy_vertex_cut(edge_pairs, store, num_edges):
+    # Greedy placement of dense (src, dst) pairs, yielding the chosen partition of each edge.
+    # A(v) is v's replica bitmask restricted to the open partitions; a partition closes once it reaches the mean edge load
+    num_partitions = store.num_partitions
+    replica_masks = memoryview(store.masks)
+    vertex_to_master = memoryview(store.masters)
+    bits = [1 << part_id for part_id in range(num_partitions)]
+    all_partitions = (1 << num_partitions) - 1
+    partition_load = store.edges.tolist()  # Track edge load per partition
+    load_of = partition_load.__getitem__
+    candidates = {}  # Candidate mask -> its partitions, filled on first use
+
+    mean_edge_load = num_edges / num_partitions
+    open_partitions = all_partitions
+    for part_id in range(num_partitions):
+        if partition_load[part_id] >= mean_edge_load:
+            open_partitions &= ~bits[part_id]
+
+    edge_num = store.num_edges
+    for src, dst in edge_pairs:
+        machines_u = replica_masks[src] & open_partitions
+        machines_v = replica_masks[dst] & open_partitions
+
+        # Case 1: A(u) and A(v) intersect, use the intersection
+        # Case 2: no intersection, use the union
+        # Case 3: one vertex is assigned, use its machines
+        # Case 4: neither vertex is assigned, use every machine
+        assigned_machines = (machines_u & machines_v) or (machines_u | machines_v) or all_partitions
+        members = candidates.get(assigned_machines)
+        if members is None:
+            members = candidates[assigned_machines] = tuple(part_id for part_id in range(num_partitions) if assigned_machines & bits[part_id])
+        # Least loaded candidate, lowest partition ID on ties
+        chosen_partition = min(members, key=load_of)
+
+        # Assign edge to the chosen partition
+        bit = bits[chosen_partition]
+        replica_masks[src] |= bit
+        replica_masks[dst] |= bit
+        if partition_load[chosen_partition] == 0:
+            store.first_edge[chosen_partition] = edge_num
+        partition_load[chosen_partition] += 1
+        edge_num += 1
+
+        # Update master assignment
+        if vertex_to_master[src] < 0:
+            vertex_to_master[src] = chosen_partition
+        if vertex_to_master[dst] < 0:
+            vertex_to_master[dst] = chosen_partition
+
+        if partition_load[chosen_partition] >= mean_edge_load:
+            # If the partition is full, remove it from the candidate list
+            open_partitions &= ~bit
+
+        yield chosen_partition
+
+    store.edges[:] = partition_load
+    store.num_edges = edge_num
+
+class GreedyStream:
+    # Sequential greedy placement fed with batches of edges
+    def __init__(self, num_vertices, num_partitions, num_edges, allocator=IN_MEMORY):
+        self.store = ReplicaStore(num_vertices, num_partitions, allocator)
+        self.num_edges = num_edges
+
+    def consume(self, batch, src, dst):
+        # The generator has to run to its end to write the loads back to the store
+        return np.fromiter(greedy_vertex_cut(zip(memoryview(src), memoryview(dst)), self.store, self.num_edges), dtype=self.store.masters.dtype)
+
+    def partitions(self):
+        return self.store.to_partitions()
+
+def hdrf_vertex_cut(edge_pairs, store, partial_degrees, balance=HDRF_LAMBDA, epsilon=HDRF_EPSILON):
+    # High-Degree Replicated First over dense (src, dst) pairs, yielding the chosen partition of each edge. An edge goes
+    # to the partition p maximizing g(u, p) + g(v, p) + balance * (max_load - load[p]) / (epsilon + max_load - min_load),
+    # where g(v, p) = 2 - theta(v) if p holds a replica of v, theta(v) = d(v) / (d(u) + d(v)) with the partial degrees
+    # seen so far. Replicating the higher-degree endpoint scores better, so hubs are cut first
+    num_partitions = store.num_partitions
+    replica_masks = memoryview(store.masks)
+    vertex_to_master = memoryview(store.masters)
+    degree = memoryview(partial_degrees)
+    bits = [1 << part_id for part_id in range(num_partitions)]
+    partition_load = store.edges.tolist()  # Track edge load per partition
+    candidates = {}  # Replica mask -> its partitions, filled on first use
+
+    edge_num = store.num_edges
+    for src, dst in edge_pairs:
+        degree[src] += 1
+        degree[dst] += 1
+        theta_src = degree[src] / (degree[src] + degree[dst])
+        mask_src = replica_masks[src]
+        mask_dst = replica_masks[dst]
+        max_load = max(partition_load)
+        min_load = min(partition_load)
+        balance_scale = balance / (epsilon + max_load - min_load)
+
+        # Partitions holding neither endpoint only differ in load, so the least loaded one stands for all of them
+        chosen_partition = partition_load.index(min_load)
+        best_score = -1.0
+        either = mask_src | mask_dst
+        members = candidates.get(either)
+        if members is None:
+            members = candidates[either] = tuple(part_id for part_id in range(num_partitions) if either & bits[part_id])
+        for part_id in (chosen_partition, *members):
+            score = balance_scale * (max_load - partition_load[part_id])
+            if mask_src & bits[part_id]:
+                score += 2 - theta_src
+            if mask_dst & bits[part_id]:
+                score += 1 + theta_src
+            if score > best_score:
+                chosen_partition, best_score = part_id, score
+
+        # Assign edge to the chosen partition
+        bit = bits[chosen_partition]
+        replica_masks[src] = mask_src | bit
+        replica_masks[dst] |= bit
+        if partition_load[chosen_partition] == 0:
+            store.first_edge[chosen_partition] = edge_num
+        partition_load[chosen_partition] += 1
+        edge_num += 1
+
+        # Update master assignment
+        if vertex_to_master[src] < 0:
+            vertex_to_master[src] = chosen_partition
+        if vertex_to_master[dst] < 0:
+            vertex_to_master[dst] = chosen_partition
+
+        yield chosen_partition
+
+    store.edges[:] = partition_load
+    store.num_edges = edge_num
+
+class HdrfStream:
+    # Sequential HDRF placement fed with batches of edges; partial_degrees counts the edges of each vertex placed so far
+    def __init__(self, num_vertices, num_partitions, balance=HDRF_LAMBDA, allocator=IN_MEMORY):
+        self.store = ReplicaStore(num_vertices, num_partitions, allocator)
+        self.partial_degrees = allocator.zeros(num_vertices, np.uint32)
+        self.balance = balance
+
+    def consume(self, batch, src, dst):
+        # The generator has to run to its end to write the loads back to the store
+        pairs = zip(memoryview(src), memoryview(dst))
+        return np.fromiter(hdrf_vertex_cut(pairs, self.store, self.partial_degrees, self.balance), dtype=self.store.masters.dtype)
+
+    def partitions(self):
+        return self.store.to_partitions()
+
+def _coordinated_range(path, offset, length, index, num_partitions, num_edges, sync_interval, shared_names, log_capacity, lock):
+    # One worker of the parallel greedy: place a slice of the file against a local copy of the placement state. Every
+    # sync_interval edges it appends the replica bits it added to a shared ring log and its load deltas to the shared
+    # loads under the lock, then replays the records logged since its last sync outside the lock. A worker that fell
+    # more than a ring behind ORs in the shared masks instead, which hold every bit logged so far
+    memories = [shared_memory.SharedMemory(name=name) for name in shared_names]
+    try:
+        store = ReplicaStore(len(index), num_partitions)
+        shared_masks = np.ndarray(len(index), dtype=store.masks.dtype, buffer=memories[0].buf)
+        counters = np.ndarray(num_partitions + 1, dtype=np.int64, buffer=memories[1].buf)  # loads, then records logged
+        log_vertices = np.ndarray(log_capacity, dtype=np.int32, buffer=memories[2].buf)
+        log_bits = np.ndarray(log_capacity, dtype=store.masks.dtype, buffer=memories[3].buf)
+        own_loads = np.zeros(num_partitions, dtype=np.int64)
+        replayed = 0
+        edge_num = offset // EDGE_BYTES
+
+        for batch in iter_edge_batches(path, sync_interval, offset, length, progress=offset == 0):
+            dense = index.lookup(batch)
+            touched = sorted_unique(dense).astype(np.int32)
+            masks_before = store.masks[touched]
+            with lock:
+                store.edges[:] = counters[:num_partitions]
+            loads_before = store.edges.copy()
+            store.num_edges = edge_num
+            dense_values = iter(memoryview(dense.ravel()))
+            deque(greedy_vertex_cut(zip(dense_values, dense_values), store, num_edges), maxlen=0)
+            loads_delta = store.edges - loads_before
+            first_use = (loads_delta > 0) & (store.first_edge < 0)
+            store.first_edge[first_use] = edge_num
+            own_loads += loads_delta
+            edge_num += len(batch)
+
+            added = store.masks[touched] & ~masks_before
+            changed = np.flatnonzero(added)
+            vertices, bits = touched[changed], added[changed]
+            with lock:
+                counters[:num_partitions] += loads_delta
+                shared_masks[vertices] |= bits
+                # Only the last log_capacity records of a sync can stay in the ring
+                logged = int(counters[num_partitions])
+                slots = (logged + np.arange(len(vertices))[-log_capacity:]) % log_capacity
+                log_vertices[slots] = vertices[-log_capacity:]
+                log_bits[slots] = bits[-log_capacity:]
+                counters[num_partitions] = logged + len(vertices)
+
+            # The other workers' records up to logged are complete. They are read without the lock, then checked against
+            # the count, so a ring that wrapped over them during the copy is caught
+            if logged - replayed <= log_capacity:
+                slots = np.arange(replayed, logged) % log_capacity
+                vertices, bits = log_vertices[slots], log_bits[slots]
+                with lock:
+                    overwritten = int(counters[num_partitions]) - replayed > log_capacity
+                if not overwritten:
+                    np.bitwise_or.at(store.masks, vertices, bits)
+                    replayed = logged
+            if replayed < logged:
+                store.masks |= shared_masks
+            # This worker's own records follow, already in its store
+            replayed = logged + len(changed)
+
+        store.edges[:] = own_loads
+        del shared_masks, counters, log_vertices, log_bits
+        return store
+    finally:
+        for memory in memories:
+            memory.close()
+
+def heuristic_vertex_cut_partition_parallel(path, index, num_partitions, num_edges, workers, sync_interval):
+    # Coordinated greedy over K slices of the file; placement state is only exchanged every sync_interval edges,
+    # so the result depends on the interval and may replicate somewhat more than the sequential run. The log holds
+    # a few syncs of every worker, up to about one record per vertex, past which replaying it costs as much as
+    # OR-ing in all the masks
+    mask_type = mask_dtype(num_partitions)
+    log_capacity = max(min(4 * workers * sync_interval, len(index)), MIN_SYNC_LOG)
+    sizes = [len(index) * np.dtype(mask_type).itemsize, (num_partitions + 1) * 8, log_capacity * 4, log_capacity * np.dtype(mask_type).itemsize]
+    memories = [shared_memory.SharedMemory(create=True, size=max(size, 1)) for size in sizes]
+    try:
+        for memory in memories:
+            np.ndarray(memory.size, dtype=np.uint8, buffer=memory.buf)[:] = 0
+        store = ReplicaStore(len(index), num_partitions)
+        for partial_store in map_edge_ranges(path, _coordinated_range, workers, index=index, num_partitions=num_partitions, num_edges=num_edges,
+                                             sync_interval=sync_interval, shared_names=[memory.name for memory in memories],
+                                             log_capacity=log_capacity, lock=multiprocessing.Lock()):
+            store.merge(partial_store)
+        return store
+    finally:
+        for memory in memories:
+            memory.close()
+            memory.unlink()
+
+def make_stream(algorithm, num_partitions, degree_threshold, num_vertices, num_edges, vertex_degrees, vertex_masters=None,
+                hdrf_lambda=HDRF_LAMBDA, allocator=IN_MEMORY):
+    # vertex_masters, the vertex partitioner's placement, is needed by the edge-cut algorithms other than edge_cut and by
+    # ginger, and vertex_degrees by DEGREE_ALGORITHMS. The allocator holds the per-vertex state
+    if algorithm in EDGE_CUT_ALGORITHMS:
+        return EdgeCutStream(num_vertices, num_partitions, vertex_masters, allocator)
+    if algorithm == "random_vertex_cut":
+        return PlacementStream(num_vertices, num_partitions, partial(round_robin_parts, num_partitions=num_partitions), allocator=allocator)
+    if algorithm == "heuristic_vertex_cut":
+        return GreedyStream(num_vertices, num_partitions, num_edges, allocator)
+    if algorithm == "hybrid_vertex_cut":
+        place_batch = partial(hybrid_parts, num_partitions=num_partitions, vertex_degrees=vertex_degrees, degree_threshold=degree_threshold)
+        return PlacementStream(num_vertices, num_partitions, place_batch, allocator=allocator)
+    if algorithm == "ginger_vertex_cut":
+        place_batch = partial(ginger_parts, num_partitions=num_partitions, vertex_degrees=vertex_degrees, degree_threshold=degree_threshold,
+                              vertex_parts=vertex_masters)
+        return PlacementStream(num_vertices, num_partitions, place_batch, allocator=allocator)
+    if algorithm == "dbh_vertex_cut":
+        place_batch = partial(dbh_parts, num_partitions=num_partitions, vertex_degrees=vertex_degrees)
+        return PlacementStream(num_vertices, num_partitions, place_batch, allocator=allocator)
+    if algorithm == "hdrf_vertex_cut":
+        return HdrfStream(num_vertices, num_partitions, hdrf_lambda, allocator)
+    raise ValueError(f"unknown algorithm {algorithm}")
+
+class PartitionView:
+    # One partition of a PartitionResult; each member is computed on first access, as raw vertex IDs and (src, dst) rows
+    def __init__(self, result, part_id):
+        self.result = result
+        self.part_id = part_id
+
+    @cached_property
+    def vertices(self):
+        return self.result.vertex_ids[self.result.store.vertices_of(self.part_id)]
+
+    @cached_property
+    def master_vertices(self):
+        return self.result.vertex_ids[np.flatnonzero(self.result.masters == self.part_id)]
+
+    @cached_property
+    def mirror_vertices(self):
+        return np.setdiff1d(self.vertices, self.master_vertices, assume_unique=True)
+
+    @cached_property
+    def edge_ids(self):
+        # Indices of the partition's edges in the input
+        return np.flatnonzero(self.result.edge_mask(self.part_id))
+
+    @cached_property
+    def edges(self):
+        return self.result.edges[self.edge_ids]
+
+    @cached_property
+    def replicated_edge_ids(self):
+        return np.flatnonzero(self.result.edge_mask(self.part_id, replicated=True))
+
+    @cached_property
+    def replicated_edges(self):
+        return self.result.edges[self.replicated_edge_ids]
+
+class PartitionResult:
+    # Array-backed result of partition(): per-vertex masters and replica masks indexed by dense vertex, the vertex IDs
+    # behind the dense indices and, when kept, the partition of every edge in input order
+    def __init__(self, algorithm, store, index, edges=None, edge_partitions=None, replicated_edge_counts=None):
+        self.algorithm = algorithm
+        self.store = store
+        self.index = index
+        self.edges = edges
+        self.edge_partitions = edge_partitions
+        self.replicated_edge_counts = replicated_edge_counts
+        self._views = {}
+
+    @property
+    def num_partitions(self):
+        return self.store.num_partitions
+
+    @property
+    def num_vertices(self):
+        return self.store.num_vertices
+
+    @property
+    def num_edges(self):
+        return int(self.store.edges.sum() + (self.replicated_edge_counts.sum() // 2 if self.replicated_edge_counts is not None else 0))
+
+    @property
+    def vertex_ids(self):
+        return self.index.ids
+
+    @property
+    def masters(self):
+        return self.store.masters
+
+    @property
+    def replica_masks(self):
+        return self.store.masks
+
+    def part_ids(self):
+        # Partitions in output order: vertex order for edge-cut, order of first placed edge for vertex-cut
+        if self.algorithm in EDGE_CUT_ALGORITHMS:
+            return list(range(min(self.num_partitions, self.num_vertices)))
+        return self.store.partition_order().tolist()
+
+    def partition(self, part_id):
+        if not 0 <= part_id < self.num_partitions:
+            raise ValueError(f"partition {part_id} is out of range for {self.num_partitions} partitions")
+        if part_id not in self._views:
+            self._views[part_id] = PartitionView(self, part_id)
+        return self._views[part_id]
+
+    def __iter__(self):
+        return (self.partition(part_id) for part_id in self.part_ids())
+
+    @cached_property
+    def _endpoint_parts(self):
+        # Partitions of the (src, dst) endpoints of each edge, for edge-cut
+        return self.masters[self.index.lookup(self.edges)]
+
+    def edge_mask(self, part_id, replicated=False):
+        if self.edges is None:
+            raise ValueError("edges were not kept with this result")
+        if self.algorithm in EDGE_CUT_ALGORITHMS:
+            src_part, dst_part = self._endpoint_parts[:, 0], self._endpoint_parts[:, 1]
+            if replicated:
+                return (src_part != dst_part) & ((src_part == part_id) | (dst_part == part_id))
+            return (src_part == part_id) & (dst_part == part_id)
+        if self.edge_partitions is None:
+            raise ValueError("edge assignment was not kept with this result")
+        if replicated:
+            return np.zeros(len(self.edges), dtype=bool)
+        return self.edge_partitions == part_id
+
+    def edge_loads(self):
+        # Edges per partition, cut edges counting on both sides for edge-cut
+        if self.replicated_edge_counts is None:
+            return self.store.edges
+        return self.store.edges + self.replicated_edge_counts
+
+    def stats(self):
+        # Balance is the largest partition over the mean partition
+        edge_loads = self.edge_loads()
+        replicas = self.store.replica_counts()
+        stats = {
+            "algorithm": self.algorithm,
+            "num_partitions": self.num_partitions,
+            "num_vertices": self.num_vertices,
+            "num_edges": self.num_edges,
+            "replication_factor": float(self.store.replication_factor()),
+            "edge_balance": float(edge_loads.max() / edge_loads.mean()) if edge_loads.any() else 0.0,
+            "vertex_balance": float(replicas.max() / replicas.mean()) if replicas.any() else 0.0,
+            "partition_edges": edge_loads.tolist(),
+            "partition_vertices": replicas.tolist(),
+        }
+        if self.replicated_edge_counts is not None:
+            stats["cut_edges"] = int(self.replicated_edge_counts.sum() // 2)
+        return stats
+
+    def to_partitions(self):
+        # Count-form partitions, in the shape the save_*_partitions functions expect
+        partitions = self.store.to_partitions(self.part_ids())
+        if self.replicated_edge_counts is not None:
+            for part_id, data in partitions.items():
+                data["replicated_edges"] = int(self.replicated_edge_counts[part_id])
+        return partitions
+
+    def to_detailed_partitions(self):
+        # Partitions as sets of vertices and lists of edges, filled in the same order as a plain loop over the edges so the
+        # detailed and mermaid outputs print alike
+        if self.edges is None:
+            raise ValueError("edges were not kept with this result")
+        if self.algorithm in EDGE_CUT_ALGORITHMS:
+            return self._detailed_edge_cut()
+        if self.edge_partitions is None:
+            raise ValueError("edge assignment was not kept with this result")
+        partitions = {}
+        vertex_to_master = set()
+        for src, dst, chosen_partition in zip(self.edges[:, 0].tolist(), self.edges[:, 1].tolist(), self.edge_partitions.tolist()):
+            if chosen_partition not in partitions:
+                partitions[chosen_partition] = {"master_vertices": set(), "vertices": set(), "edges": []}
+            data = partitions[chosen_partition]
+            data["edges"].append((src, dst))
+            data["vertices"].update([src, dst])
+            if src not in vertex_to_master:
+                vertex_to_master.add(src)
+                data["master_vertices"].add(src)
+            if dst not in vertex_to_master:
+                vertex_to_master.add(dst)
+                data["master_vertices"].add(dst)
+        return partitions
+
+    def _detailed_edge_cut(self):
+        partitions = {part_id: {"master_vertices": set(), "vertices": set(), "replicated_edges": [], "edges": []} for part_id in self.part_ids()}
+        for vertex, part_id in zip(self.vertex_ids.tolist(), self.masters.tolist()):
+            partitions[part_id]["master_vertices"].add(vertex)
+        endpoint_parts = self._endpoint_parts
+        for src, dst, src_part, dst_part in zip(self.edges[:, 0].tolist(), self.edges[:, 1].tolist(), endpoint_parts[:, 0].tolist(), endpoint_parts[:, 1].tolist()):
+            if src_part == dst_part:
+                partitions[src_part]["edges"].append((src, dst))
+            else:
+                # Replicate edge across partitions
+                partitions[src_part]["replicated_edges"].append((src, dst))
+                partitions[dst_part]["replicated_edges"].append((src, dst))
+            partitions[src_part]["vertices"].update([src, dst])
+            partitions[dst_part]["vertices"].update([src, dst])
+        return partitions
+
+def _partition_stream(edges, algorithm, stream, index, keep_assignment, batch_size, progress, shards, checkpoint=None, path=None,
+                      read_ahead=0, allocator=IN_MEMORY):
+    # Single-process pass: place batch after batch, recording each edge's partition when asked. With a Checkpointer the
+    # pass starts from its last checkpoint, if resuming, and snapshots itself between batches. Given the path of edges
+    # and read_ahead > 0, a background thread reads that many batches ahead instead of faulting in the mmap
+    edge_partitions = allocator.zeros(len(edges), stream.store.masters.dtype) if keep_assignment else None
+    edge_num = 0
+    if checkpoint is not None:
+        edge_num = checkpoint.restore(stream, edge_partitions, shards)
+    batches = prefetch_edge_batches(path if path is not None else edges, batch_size, edge_num * EDGE_BYTES, depth=read_ahead, progress=progress)
+    for batch in batches:
+        src = index.lookup(batch[:, 0])
+        dst = index.lookup(batch[:, 1])
+        parts = stream.consume(batch, src, dst)
+        if shards is not None:
+            # Edge-cut also copies each cut edge to its destination's partition
+            shards.write(batch, parts, stream.store.masters[dst] if algorithm in EDGE_CUT_ALGORITHMS else None)
+        if edge_partitions is not None:
+            edge_partitions[edge_num:edge_num + len(batch)] = parts
+        edge_num += len(batch)
+        if checkpoint is not None:
+            checkpoint.update(stream, edge_num, edge_partitions, shards)
+    if checkpoint is not None:
+        checkpoint.finish()
+    replicated_edge_counts = stream.replicated_counts if algorithm in EDGE_CUT_ALGORITHMS else None
+    return PartitionResult(algorithm, stream.store, index, edges, edge_partitions, replicated_edge_counts)
+
+def partition(source, algorithm, num_partitions, degree_threshold=100, workers=1, sync_interval=SYNC_INTERVAL,
+              keep_assignment=True, batch_size=BATCH_SIZE, use_cache=True, progress=False, dedup=False, memory_budget=MEMORY_BUDGET,
+              shards=None, routing_file=None, state_file=None, checkpoint_file=None, checkpoint_edges=0, checkpoint_seconds=0,
+              resume=False, hdrf_lambda=HDRF_LAMBDA, read_ahead=0, spill_dir=None):
+    # Partition a graph given as a path to a binary edge file, a buffer of packed edges (mmap, bytes) or an (N, 2) array
+    # of edges. The vertex index and degrees of a file are cached beside it; worker processes only apply to files.
+    # keep_assignment=False drops the per-edge partition array, which costs a byte or two per edge.
+    # dedup=True drops repeated edges first, a file through an external sort bounded by memory_budget bytes.
+    # shards, a ShardWriter, receives every edge with its partition during the pass; it makes the pass single-process.
+    # routing_file, when given, receives the routing table of the result, and state_file the placement state that
+    # partition_delta() continues from.
+    # checkpoint_file receives a snapshot of the pass every checkpoint_edges edges or checkpoint_seconds seconds, and
+    # resume=True continues from it with the same result as an uninterrupted run; both make the pass single-process.
+    # ldg_edge_cut and fennel_edge_cut first place the vertices in one pass over adjacency lists sorted out of core within
+    # memory_budget, then cut edges like edge_cut.
+    # hdrf_vertex_cut weighs partition balance by hdrf_lambda; it is sequential, so it ignores workers.
+    # ginger_vertex_cut first places the low-degree vertices in one pass over their in-neighbor lists, read from an
+    # in-edge file sorted out of core and cached beside a graph file.
+    # read_ahead > 0 reads a file that many batches ahead of the placement in a background thread, with access hints to
+    # the kernel, and times how long each side waits for the other.
+    # spill_dir bounds the per-vertex state (index, degrees, replica store) and per-edge assignment by memory_budget too:
+    # arrays past it go to memory-mapped scratch files in spill_dir. It makes the pass single-process
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"unknown algorithm {algorithm}")
+    is_path = isinstance(source, (str, os.PathLike))
+    # Each run counts its own state against the budget
+    allocator = StateAllocator(memory_budget, spill_dir)
+    if spill_dir is not None:
+        workers = 1
+    if dedup:
+        with phase("dedup"):
+            source = unique_edge_file(source, memory_budget) if is_path else unique_edges(edge_array(source))
+    edges = edge_array(source)
+    use_cache = use_cache and is_path
+    with phase("index"):
+        index = load_vertex_index(source if is_path else edges, batch_size, use_cache, allocator, memory_budget)
+    vertex_degrees = None
+    if algorithm in DEGREE_ALGORITHMS:
+        with phase("degrees"):
+            vertex_degrees = load_degrees(source if is_path else edges, index, workers if is_path else 1, batch_size, use_cache, allocator)["degree"]
+    vertex_masters = None
+    if algorithm in VERTEX_PARTITIONER_OF:
+        with phase("vertex_partition"):
+            vertex_masters = vertex_partition(source if is_path else edges, index, num_partitions, VERTEX_PARTITIONER_OF[algorithm], memory_budget=memory_budget)
+    elif algorithm == "ginger_vertex_cut":
+        with phase("vertex_partition"):
+            vertex_masters = ginger_vertex_partition(source if is_path else edges, index, num_partitions, vertex_degrees, degree_threshold, memory_budget)
+
+    checkpoint = None
+    if checkpoint_file is not None:
+        stat = os.stat(source) if is_path else None
+        run = {"algorithm": algorithm, "num_partitions": num_partitions, "degree_threshold": degree_threshold,
+               "hdrf_lambda": hdrf_lambda if algorithm == "hdrf_vertex_cut" else None, "num_edges": len(edges),
+               "graph": {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns} if stat else None}
+        checkpoint = Checkpointer(checkpoint_file, run, checkpoint_edges, checkpoint_seconds, resume)
+
+    with phase("placement"):
+        if is_path and workers > 1 and algorithm in SHARDED_ALGORITHMS and shards is None and checkpoint is None:
+            # Sharded runs merge per-range stores and keep no per-edge assignment
+            if algorithm == "heuristic_vertex_cut":
+                store = heuristic_vertex_cut_partition_parallel(source, index, num_partitions, len(edges), workers, sync_interval)
+            else:
+                stream = make_stream(algorithm, num_partitions, degree_threshold, len(index), len(edges), vertex_degrees, vertex_masters)
+                store = place_edges_sharded(source, index, num_partitions, stream.place_batch, workers, batch_size, read_ahead)
+            result = PartitionResult(algorithm, store, index, edges)
+        else:
+            stream = make_stream(algorithm, num_partitions, degree_threshold, len(index), len(edges), vertex_degrees, vertex_masters, hdrf_lambda,
+                                 allocator)
+            result = _partition_stream(edges, algorithm, stream, index, keep_assignment, batch_size, progress, shards, checkpoint,
+                                       source if is_path else None, read_ahead, allocator)
+            if algorithm == "hdrf_vertex_cut":
+                # After the whole pass the partial degrees are the degrees, which a delta run continues from
+                vertex_degrees = stream.partial_degrees
+    with phase("save_state"):
+        if routing_file is not None:
+            save_routing_table(result, routing_file)
+        if state_file is not None:
+            save_state(state_file, result, degree_threshold if algorithm in HYBRID_ALGORITHMS else None, vertex_degrees,
+                       hdrf_lambda if algorithm == "hdrf_vertex_cut" else None)
+    record_result(result)
+    return result
+
+def partition_delta(state_file, source, keep_assignment=True, batch_size=BATCH_SIZE, progress=False, shards=None, routing_file=None,
+                    output_state=None, read_ahead=0):
+    # Place the edges of source (appended to the graph of a saved state) with the policy of the saved run, and save the
+    # grown state to output_state, by default over state_file. Work is proportional to the new edges plus a few passes
+    # over per-vertex arrays. The result's edges and assignment cover the new edges only.
+    # Random vertex-cut continues the round-robin, so the result matches a run over the whole graph. Heuristic continues
+    # the greedy against the saved replicas and loads, with the mean load of the grown graph. Hybrid refreshes the degrees
+    # first, so new edges see the vertices that crossed the threshold as high-degree; placed edges are not moved. DBH
+    # hashes by the refreshed degrees too, and HDRF continues with the partial degrees of the saved run. read_ahead is as
+    # in partition()
+    with phase("load_state"):
+        state = load_state(state_file)
+    algorithm = state["algorithm"]
+    if algorithm in EDGE_CUT_ALGORITHMS:
+        raise ValueError("edge-cut masters follow the rank of every vertex ID, so appended vertices need a full run")
+    if algorithm == "ginger_vertex_cut":
+        raise ValueError("ginger places a vertex from its whole in-neighbor list, so appended edges need a full run")
+    edges = edge_array(source)
+    with phase("index"):
+        index, old_to_new = merge_vertex_index(state["index"], build_vertex_index(edges, batch_size))
+        store = extend_store(state["store"], len(index), old_to_new)
+    num_partitions = store.num_partitions
+
+    vertex_degrees = None
+    degree_threshold = state["degree_threshold"]
+    hdrf_lambda = state["hdrf_lambda"]
+    if algorithm in DEGREE_ALGORITHMS:
+        with phase("degrees"):
+            old_degrees = np.zeros(len(index), dtype=np.uint32)
+            old_degrees[old_to_new] = state["vertex_degrees"]
+            vertex_degrees = old_degrees.copy()
+            for batch in iter_edge_batches(edges, batch_size):
+                np.add.at(vertex_degrees, index.lookup(batch.ravel()), 1)
+        if algorithm == "hybrid_vertex_cut":
+            crossed = np.count_nonzero((old_degrees <= degree_threshold) & (vertex_degrees > degree_threshold))
+            print(f"{crossed} vertices crossed the degree threshold {degree_threshold}")
+
+    stream = make_stream(algorithm, num_partitions, degree_threshold, len(index), store.num_edges + len(edges), vertex_degrees,
+                         hdrf_lambda=hdrf_lambda if hdrf_lambda is not None else HDRF_LAMBDA)
+    stream.store = store
+    if algorithm == "hdrf_vertex_cut":
+        stream.partial_degrees[old_to_new] = state["vertex_degrees"]
+        vertex_degrees = stream.partial_degrees
+    with phase("placement"):
+        result = _partition_stream(edges, algorithm, stream, index, keep_assignment, batch_size, progress, shards,
+                                   path=source if isinstance(source, (str, os.PathLike)) else None, read_ahead=read_ahead)
+    with phase("save_state"):
+        if routing_file is not None:
+            save_routing_table(result, routing_file)
+        save_state(output_state or state_file, result, degree_threshold, vertex_degrees, hdrf_lambda)
+    record_result(result)
+    return result
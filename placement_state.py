@@ -0,0 +1,154 @@
+import json
+import os
+import threading
+import time
+import numpy as np
+
+from vertex_index import VertexIndex
+from replica_store import ReplicaStore
+
+STATE_VERSION = 1
+
+def save_state(state_file, result, degree_threshold=None, vertex_degrees=None, hdrf_lambda=None):
+    # Everything a later run needs to keep placing edges with the same policy: the vertex index, replica masks, masters,
+    # partition loads and, for hybrid, DBH and HDRF, the degree of every vertex
+    store = result.store
+    index = result.index
+    meta = {"version": STATE_VERSION, "algorithm": result.algorithm, "num_partitions": store.num_partitions,
+            "num_edges": store.num_edges, "vertex_base": index.base, "degree_threshold": degree_threshold,
+            "hdrf_lambda": hdrf_lambda}
+    arrays = {"vertex_ids": index.ids, "masks": store.masks, "masters": store.masters, "edges": store.edges, "first_edge": store.first_edge}
+    if index.direct is not None:
+        arrays["vertex_direct"] = index.direct
+    if vertex_degrees is not None:
+        arrays["degree"] = vertex_degrees
+    if result.replicated_edge_counts is not None:
+        arrays["replicated_edges"] = result.replicated_edge_counts
+    _write_arrays(state_file, meta, arrays)
+
+def _write_arrays(file, meta, arrays):
+    # Uncompressed npz through a temporary file, so a crash mid-write leaves the previous file intact
+    os.makedirs(os.path.dirname(file) or ".", exist_ok=True)
+    tmp_file = f"{file}.tmp"
+    with open(tmp_file, "wb") as f:
+        np.savez(f, meta=np.array(json.dumps(meta)), **arrays)
+    os.replace(tmp_file, file)
+
+def _read_arrays(file, what):
+    with np.load(file) as data:
+        meta = json.loads(str(data["meta"]))
+        if meta.get("version") != STATE_VERSION:
+            raise ValueError(f"{file}: not a version {STATE_VERSION} {what}")
+        return meta, {name: data[name] for name in data.files if name != "meta"}
+
+def _restore_store(store, meta, arrays):
+    store.masks[:] = arrays["masks"]
+    store.masters[:] = arrays["masters"]
+    store.edges[:] = arrays["edges"]
+    store.first_edge[:] = arrays["first_edge"]
+    store.num_edges = meta["num_edges"]
+    return store
+
+def load_state(state_file):
+    meta, arrays = _read_arrays(state_file, "placement state")
+    store = _restore_store(ReplicaStore(len(arrays["vertex_ids"]), meta["num_partitions"]), meta, arrays)
+    return {
+        "algorithm": meta["algorithm"],
+        "degree_threshold": meta["degree_threshold"],
+        "hdrf_lambda": meta.get("hdrf_lambda"),
+        "index": VertexIndex(arrays["vertex_ids"], arrays.get("vertex_direct"), meta["vertex_base"]),
+        "store": store,
+        "vertex_degrees": arrays.get("degree"),
+        "replicated_edge_counts": arrays.get("replicated_edges"),
+    }
+
+def extend_store(store, num_vertices, old_to_new):
+    # The store re-indexed for a grown vertex index, old dense vertex i becoming old_to_new[i]
+    extended = ReplicaStore(num_vertices, store.num_partitions)
+    extended.masks[old_to_new] = store.masks
+    extended.masters[old_to_new] = store.masters
+    extended.edges[:] = store.edges
+    extended.first_edge[:] = store.first_edge
+    extended.num_edges = store.num_edges
+    return extended
+
+class Checkpointer:
+    # Periodic snapshots of a single-process pass, taken at batch boundaries every every_edges edges or every_seconds
+    # seconds. The hot loop only pays for copying the per-vertex arrays; a background thread writes them. run describes
+    # the run (algorithm, partitions, graph), and a checkpoint of a different run is refused on resume
+    def __init__(self, checkpoint_file, run, every_edges=0, every_seconds=0, resume=False):
+        self.checkpoint_file = checkpoint_file
+        self.run = run
+        self.every_edges = every_edges
+        self.every_seconds = every_seconds
+        self.resume = resume
+        self.last_edge = 0
+        self.last_time = time.time()
+        self.writer = None
+
+    def restore(self, stream, edge_partitions=None, shards=None):
+        # Load the last checkpoint into the stream and return the number of edges it covers, 0 to start over
+        edge_num = 0
+        if self.resume and os.path.exists(self.checkpoint_file):
+            meta, arrays = _read_arrays(self.checkpoint_file, "checkpoint")
+            if meta["run"] != self.run:
+                raise ValueError(f"{self.checkpoint_file}: checkpoint of a different run {meta['run']}")
+            if edge_partitions is not None and "edge_partitions" not in arrays:
+                raise ValueError(f"{self.checkpoint_file}: checkpoint has no per-edge assignment")
+            if shards is not None and "shard_edges" not in arrays:
+                raise ValueError(f"{self.checkpoint_file}: checkpoint has no shard sizes")
+            _restore_store(stream.store, meta, arrays)
+            if "replicated_edges" in arrays:
+                stream.replicated_counts[:] = arrays["replicated_edges"]
+            if "partial_degrees" in arrays:
+                stream.partial_degrees[:] = arrays["partial_degrees"]
+            edge_num = meta["edge_offset"]
+            if edge_partitions is not None:
+                edge_partitions[:edge_num] = arrays["edge_partitions"]
+            if shards is not None:
+                shards.truncate(arrays["shard_edges"])
+            print(f"Resuming from checkpoint at edge {edge_num}")
+        elif shards is not None:
+            shards.truncate(np.zeros(shards.num_partitions, dtype=np.int64))
+        self.last_edge = edge_num
+        self.last_time = time.time()
+        return edge_num
+
+    def update(self, stream, edge_num, edge_partitions=None, shards=None):
+        # Checkpoint if one is due after edge_num edges
+        due = self.every_edges and edge_num - self.last_edge >= self.every_edges
+        due = due or (self.every_seconds and time.time() - self.last_time >= self.every_seconds)
+        if due:
+            self.save(stream, edge_num, edge_partitions, shards)
+
+    def save(self, stream, edge_num, edge_partitions=None, shards=None):
+        self.wait()
+        store = stream.store
+        meta = {"version": STATE_VERSION, "run": self.run, "edge_offset": edge_num, "num_edges": store.num_edges}
+        arrays = {"masks": store.masks.copy(), "masters": store.masters.copy(), "edges": store.edges.copy(),
+                  "first_edge": store.first_edge.copy()}
+        if getattr(stream, "replicated_counts", None) is not None:
+            arrays["replicated_edges"] = stream.replicated_counts.copy()
+        if getattr(stream, "partial_degrees", None) is not None:
+            arrays["partial_degrees"] = stream.partial_degrees.copy()
+        if edge_partitions is not None:
+            arrays["edge_partitions"] = edge_partitions[:edge_num].copy()
+        if shards is not None:
+            # Shard bytes past these sizes are dropped on resume
+            shards.flush()
+            arrays["shard_edges"] = shards.edges.copy()
+        self.writer = threading.Thread(target=_write_arrays, args=(self.checkpoint_file, meta, arrays))
+        self.writer.start()
+        self.last_edge = edge_num
+        self.last_time = time.time()
+
+    def wait(self):
+        if self.writer is not None:
+            self.writer.join()
+            self.writer = None
+
+    def finish(self):
+        # The pass completed, so there is nothing left to resume
+        self.wait()
+        if os.path.exists(self.checkpoint_file):
+            os.remove(self.checkpoint_file)
@@ -0,0 +1,120 @@
+import os
+import queue
+import threading
+import time
+import numpy as np
+
+from utils import native_edge_file, iter_edge_batches, EDGE_BYTES, BATCH_SIZE
+from instrumentation import ProgressReporter, METRICS
+
+READ_AHEAD = 2  # batches read ahead of the one being placed
+BOUND_SHARE = 0.05  # share of the pass one side must spend waiting for the other to call the pass bound by it
+HINT_BATCHES = 2  # batches past the one being read that the kernel is asked to fetch
+
+def _advise(fd, offset, length, advice):
+    # posix_fadvise is a hint, so platforms without it (macOS, Windows) just read without one
+    if hasattr(os, "posix_fadvise") and length > 0:
+        os.posix_fadvise(fd, offset, length, advice)
+
+class ReadAhead:
+    # Background thread reading a byte range of a binary edge file into a ring of depth + 1 batch buffers while the
+    # consumer works on the previous batch. The file is read sequentially with read(2), the kernel being told the access
+    # is sequential and asked to fetch the next few batches up front, so disk and CPU work at the same time. A batch is
+    # only valid until the next one is taken. Each side's waiting is timed: the consumer waiting for reads means the
+    # pass is I/O-bound, the reader waiting for a free buffer means it is CPU-bound
+    def __init__(self, path, batch_size=BATCH_SIZE, offset=0, length=None, depth=READ_AHEAD):
+        self.path = native_edge_file(path)
+        size = os.path.getsize(self.path)
+        if size % EDGE_BYTES:
+            raise ValueError(f"{self.path}: size {size} is not a multiple of {EDGE_BYTES} bytes")
+        if length is None:
+            length = size - offset
+        if offset % EDGE_BYTES or length % EDGE_BYTES or offset < 0 or length < 0 or offset + length > size:
+            raise ValueError(f"byte range ({offset}, {length}) is not whole edges within {size} bytes")
+        self.start, self.stop = offset, offset + length
+        self.batch_size = batch_size
+        self.free = queue.Queue()
+        for _ in range(max(depth, 1) + 1):
+            self.free.put(np.empty((batch_size, 2), dtype=np.int32))
+        self.filled = queue.Queue()
+        self.stopped = False
+        self.read_wait = 0.0  # seconds the consumer waited for a batch
+        self.place_wait = 0.0  # seconds the reader waited for a free buffer
+        self.thread = None
+
+    def _read(self):
+        step = self.batch_size * EDGE_BYTES
+        try:
+            with open(self.path, "rb", buffering=0) as f:
+                fd = f.fileno()
+                _advise(fd, self.start, self.stop - self.start, getattr(os, "POSIX_FADV_SEQUENTIAL", 0))
+                f.seek(self.start)
+                for batch_start in range(self.start, self.stop, step):
+                    hint_start = min(batch_start + step, self.stop)
+                    _advise(fd, hint_start, min(hint_start + HINT_BATCHES * step, self.stop) - hint_start, getattr(os, "POSIX_FADV_WILLNEED", 0))
+                    wait_start = time.perf_counter()
+                    buffer = self.free.get()
+                    self.place_wait += time.perf_counter() - wait_start
+                    if self.stopped:
+                        return
+                    length = min(step, self.stop - batch_start)
+                    view = memoryview(buffer.reshape(-1).view(np.uint8))[:length]
+                    filled = 0
+                    while filled < length:
+                        count = f.readinto(view[filled:])
+                        if not count:
+                            raise EOFError(f"{self.path}: file ended at byte {batch_start + filled}")
+                        filled += count
+                    self.filled.put((buffer, length // EDGE_BYTES))
+            self.filled.put(None)
+        except BaseException as error:
+            self.filled.put(error)
+
+    def __iter__(self):
+        self.thread = threading.Thread(target=self._read, daemon=True)
+        self.thread.start()
+        try:
+            while True:
+                wait_start = time.perf_counter()
+                item = self.filled.get()
+                self.read_wait += time.perf_counter() - wait_start
+                if item is None:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                buffer, count = item
+                yield buffer[:count]
+                self.free.put(buffer)
+        finally:
+            # Also reached when the consumer stops early: wake the reader so it exits
+            self.stopped = True
+            self.free.put(None)
+            self.thread.join()
+            METRICS.add_time("read_wait", self.read_wait)
+            METRICS.add_time("place_wait", self.place_wait)
+
+def _bound_label(read_wait, place_wait, elapsed):
+    # " (I/O-bound)" or " (CPU-bound)" when the longer wait is a noticeable share of the pass, else nothing
+    if max(read_wait, place_wait) <= BOUND_SHARE * elapsed:
+        return ""
+    return " (I/O-bound)" if read_wait > place_wait else " (CPU-bound)"
+
+def prefetch_edge_batches(source, batch_size=BATCH_SIZE, offset=0, length=None, depth=READ_AHEAD, progress=False):
+    # iter_edge_batches with the file read ahead in a background thread; depth=0, or a source that is not a path, reads
+    # batches straight from the mmap. Batches are copies in reused buffers, valid until the next one is taken
+    if depth <= 0 or not isinstance(source, (str, os.PathLike)):
+        yield from iter_edge_batches(source, batch_size, offset, length, progress=progress)
+        return
+    reader = ReadAhead(source, batch_size, offset, length, depth)
+    reporter = ProgressReporter((reader.stop - reader.start) // EDGE_BYTES) if progress else None
+    start_time = time.perf_counter()
+    edges = 0
+    for batch in reader:
+        yield batch
+        edges += len(batch)
+        if reporter is not None:
+            reporter.update(edges)
+    if progress:
+        print(f"Read ahead {edges} edges: placement waited {reader.read_wait:.2f} seconds for reads, reader waited "
+              f"{reader.place_wait:.2f} seconds for placement{_bound_label(reader.read_wait, reader.place_wait, time.perf_counter() - start_time)}")
+
@@ -0,0 +1,125 @@
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+
+from utils import iter_edge_batches, BATCH_SIZE
+from vertex_index import load_vertex_index, load_degrees
+from vertex_partitioning import iter_adjacency
+from dedup import iter_sorted_edges, unpack_keys, MEMORY_BUDGET
+
+ORDERS = ["degree", "bfs"]
+
+def degree_order(vertex_degrees):
+    # Dense vertices by decreasing degree, ties by ID, so hubs and their state share the first cache lines
+    return np.argsort(-vertex_degrees.astype(np.int64), kind="stable")
+
+def bfs_order(offsets, neighbors, vertex_degrees, batch_size=BATCH_SIZE):
+    # Level-synchronous BFS over the symmetric adjacency (neighbors[offsets[v]:offsets[v + 1]]), each component from its
+    # highest-degree vertex: a level lists the new neighbors of the previous one in the order of the vertex that found
+    # them first, so neighbors get nearby IDs. Levels are gathered about batch_size neighbors at a time
+    num_vertices = len(vertex_degrees)
+    order = np.empty(num_vertices, dtype=np.int64)
+    visited = np.zeros(num_vertices, dtype=bool)
+    seeds = degree_order(vertex_degrees)
+    placed = seed_num = 0
+    while placed < num_vertices:
+        while visited[seeds[seed_num]]:
+            seed_num += 1
+        frontier = seeds[seed_num:seed_num + 1]
+        visited[frontier] = True
+        while len(frontier):
+            order[placed:placed + len(frontier)] = frontier
+            placed += len(frontier)
+            starts = offsets[frontier]
+            ends = np.cumsum(offsets[frontier + 1] - starts)
+            next_frontier = []
+            first = 0
+            while first < len(frontier):
+                # Frontier vertices whose neighbors fit the batch, at least one
+                last = max(int(np.searchsorted(ends, (ends[first - 1] if first else 0) + batch_size, side="right")), first + 1)
+                counts = offsets[frontier[first:last] + 1] - starts[first:last]
+                positions = np.repeat(starts[first:last] - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+                found = neighbors[positions]
+                found = found[~visited[found]]
+                _, first_seen = np.unique(found, return_index=True)
+                found = found[np.sort(first_seen)]
+                visited[found] = True
+                next_frontier.append(found)
+                first = last
+            frontier = np.concatenate(next_frontier).astype(np.int64)
+    return order
+
+def _symmetric_adjacency(path, index, vertex_degrees, memory_budget, tmp_dir):
+    # CSR of every edge under both endpoints, neighbors spilled to a file in tmp_dir and mmap-ed back
+    offsets = np.zeros(len(index) + 1, dtype=np.int64)
+    np.cumsum(vertex_degrees, out=offsets[1:])
+    neighbors_file = os.path.join(tmp_dir, "neighbors.bin")
+    with open(neighbors_file, "wb") as f:
+        for _, _, neighbors in iter_adjacency(path, index, True, memory_budget, tmp_dir):
+            f.write(neighbors.astype(np.int32, copy=False).tobytes())
+    if offsets[-1] == 0:
+        return offsets, np.empty(0, dtype=np.int32)
+    return offsets, np.memmap(neighbors_file, dtype=np.int32, mode="r")
+
+def permutation_file_name(output_file):
+    return os.path.splitext(output_file)[0] + ".perm.npz"
+
+def load_permutation(permutation_file):
+    # (old_ids, base): new ID base + i was old ID old_ids[i]
+    with np.load(permutation_file) as permutation:
+        return permutation["old_ids"], int(permutation["base"])
+
+def to_old_ids(new_ids, old_ids, base):
+    return old_ids[np.asarray(new_ids) - base]
+
+def reorder_graph(input_file, output_file, method="bfs", memory_budget=MEMORY_BUDGET, dedup=False):
+    # Relabel the vertices of a graph in the given order, keeping the smallest ID as the first new ID, and write its edges
+    # sorted by (new src, new dst) to output_file, with dedup=True once each. The old ID of each new ID is saved to
+    # permutation_file_name(output_file). Returns the number of edges written
+    start_time = time.time()
+    index = load_vertex_index(input_file)
+    vertex_degrees = load_degrees(input_file, index)["degree"]
+    output_dir = os.path.dirname(os.path.abspath(output_file))
+    with tempfile.TemporaryDirectory(dir=output_dir) as tmp_dir:
+        if method == "degree":
+            order = degree_order(vertex_degrees)
+        elif method == "bfs":
+            offsets, neighbors = _symmetric_adjacency(input_file, index, vertex_degrees, memory_budget, tmp_dir)
+            order = bfs_order(offsets, neighbors, vertex_degrees)
+            del neighbors
+        else:
+            raise ValueError(f"unknown order {method}")
+        print(f"Ordered {len(index)} vertices by {method} in {time.time() - start_time} seconds")
+
+        base = int(index.ids[0]) if len(index) else 0
+        new_ids = np.empty(len(index), dtype=np.int32)
+        new_ids[order] = base + np.arange(len(index), dtype=np.int32)
+        relabeled_file = os.path.join(tmp_dir, "relabeled.graph")
+        with open(relabeled_file, "wb") as f:
+            for batch in iter_edge_batches(input_file):
+                f.write(new_ids[index.lookup(batch)].tobytes())
+        num_edges = 0
+        tmp_file = f"{output_file}.tmp"
+        with open(tmp_file, "wb") as f:
+            for keys, _ in iter_sorted_edges(relabeled_file, memory_budget, tmp_dir, unique=dedup):
+                f.write(unpack_keys(keys).tobytes())
+                num_edges += len(keys)
+        os.replace(tmp_file, output_file)
+    np.savez(permutation_file_name(output_file), old_ids=index.ids[order], base=base)
+    print(f"Reordered {num_edges} edges of {input_file} to {output_file} in {time.time() - start_time} seconds")
+    return num_edges
+
+def main():
+    parser = argparse.ArgumentParser(description="Relabel the vertices of a graph for locality and rewrite it sorted by source")
+    parser.add_argument("-i", "--input_file", type=str, required=True)
+    parser.add_argument("-o", "--output_file", type=str, required=True)
+    parser.add_argument("-or", "--order", type=str, choices=ORDERS, help="degree: by decreasing degree, bfs: breadth-first from the hubs", default="bfs")
+    parser.add_argument("-mb", "--memory_budget", type=int, help="Memory in MB for sorting edges out of core", default=MEMORY_BUDGET >> 20)
+    parser.add_argument("-dd", "--dedup", action="store_true", help="Drop repeated edges")
+    args = parser.parse_args()
+    reorder_graph(args.input_file, args.output_file, args.order, args.memory_budget << 20, args.dedup)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import numpy as np
+
+from utils import partition_dtype
+from memory_plan import IN_MEMORY
+
+MAX_PARTITIONS = 64
+
+def mask_dtype(num_partitions):
+    # Smallest unsigned type with one bit per partition
+    if num_partitions > MAX_PARTITIONS:
+        raise ValueError(f"at most {MAX_PARTITIONS} partitions are supported, got {num_partitions}")
+    for dtype in (np.uint8, np.uint16, np.uint32, np.uint64):
+        if num_partitions <= np.iinfo(dtype).bits:
+            return dtype
+
+class ReplicaStore:
+    # Per-vertex replica bitmask (bit p set = replica on partition p) and master partition, indexed by dense vertex ID;
+    # the allocator may put both in memory-mapped scratch files
+    def __init__(self, num_vertices, num_partitions, allocator=IN_MEMORY):
+        self.num_partitions = num_partitions
+        self.masks = allocator.zeros(num_vertices, mask_dtype(num_partitions))
+        self.masters = allocator.full(num_vertices, -1, partition_dtype(num_partitions))
+        self.bits = np.left_shift(np.ones(num_partitions, dtype=self.masks.dtype), np.arange(num_partitions, dtype=self.masks.dtype))
+        self.edges = np.zeros(num_partitions, dtype=np.int64)
+        # Global index of the first edge placed on each partition; partitions are listed in this order
+        self.first_edge = np.full(num_partitions, -1, dtype=np.int64)
+        self.num_edges = 0
+
+    @property
+    def num_vertices(self):
+        return len(self.masks)
+
+    def add_replicas(self, vertices, parts):
+        np.bitwise_or.at(self.masks, vertices, self.bits[parts])
+
+    def assign_masters(self, vertices, parts):
+        # The first occurrence of an unassigned vertex (in the given order) becomes its master
+        unassigned = self.masters[vertices] < 0
+        vertices = vertices[unassigned]
+        unique_vertices, first = np.unique(vertices, return_index=True)
+        self.masters[unique_vertices] = parts[unassigned][first]
+
+    def place_edges(self, src, dst, parts):
+        # Place a batch of edges in file order; both endpoints get a replica on the edge's partition
+        endpoints = np.column_stack((src, dst)).ravel()
+        endpoint_parts = np.repeat(parts, 2)
+        self.add_replicas(endpoints, endpoint_parts)
+        self.assign_masters(endpoints, endpoint_parts)
+        self.count_edges(parts)
+
+    def count_edges(self, parts):
+        self.edges += np.bincount(parts, minlength=self.num_partitions)
+        new_parts, first = np.unique(parts, return_index=True)
+        new = self.first_edge[new_parts] < 0
+        self.first_edge[new_parts[new]] = self.num_edges + first[new]
+        self.num_edges += len(parts)
+
+    def merge(self, other):
+        # Fold in the store of a later edge range: a vertex keeps the master from the earliest range it appears in
+        self.masks |= other.masks
+        unassigned = self.masters < 0
+        self.masters[unassigned] = other.masters[unassigned]
+        self.edges += other.edges
+        new = (self.first_edge < 0) & (other.first_edge >= 0)
+        self.first_edge[new] = other.first_edge[new]
+        self.num_edges = max(self.num_edges, other.num_edges)
+
+    def replica_counts(self):
+        return np.array([np.count_nonzero(self.masks & bit) for bit in self.bits], dtype=np.int64)
+
+    def master_counts(self):
+        return np.bincount(self.masters[self.masters >= 0], minlength=self.num_partitions).astype(np.int64)
+
+    def mirror_counts(self):
+        return self.replica_counts() - self.master_counts()
+
+    def replication_factor(self):
+        present = np.count_nonzero(self.masks)
+        return float(self.replica_counts().sum()) / present if present else 0.0
+
+    def partition_order(self):
+        used = np.flatnonzero(self.first_edge >= 0)
+        return used[np.argsort(self.first_edge[used], kind="stable")]
+
+    def vertices_of(self, part_id):
+        return np.flatnonzero(self.masks & self.bits[part_id])
+
+    def to_partitions(self, part_ids=None):
+        # Count-form partitions, in the shape the save_*_partitions functions expect
+        if part_ids is None:
+            part_ids = self.partition_order()
+        masters = self.master_counts()
+        replicas = self.replica_counts()
+        partitions = {}
+        for part_id in part_ids:
+            partitions[int(part_id)] = {
+                "master_vertices": int(masters[part_id]),
+                "vertices": int(replicas[part_id]),
+                "mirror_vertices": int(replicas[part_id] - masters[part_id]),
+                "edges": int(self.edges[part_id]),
+            }
+        return partitions
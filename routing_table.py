@@ -0,0 +1,110 @@
+import mmap
+import os
+import struct
+import numpy as np
+
+from vertex_index import VertexIndex
+from replica_store import mask_dtype
+from utils import partition_dtype
+
+# <magic, version, num_vertices, num_partitions, id base, direct-index length>, then 8-byte aligned sections:
+# sorted vertex IDs (int32), master partitions (int8/int16), replica masks (uint8..uint64), direct index (int32)
+ROUTING_MAGIC = b"GPRT"
+ROUTING_VERSION = 1
+ROUTING_HEADER = struct.Struct("<4sIqqqq")
+
+def _aligned(offset):
+    return (offset + 7) & ~7
+
+def _sections(num_vertices, num_partitions, direct_length):
+    # (name, dtype, length, offset) of each array in the file
+    sections = []
+    offset = ROUTING_HEADER.size
+    for name, dtype, length in (("vertex_ids", np.dtype(np.int32), num_vertices),
+                                ("masters", np.dtype(partition_dtype(num_partitions)), num_vertices),
+                                ("masks", np.dtype(mask_dtype(num_partitions)), num_vertices),
+                                ("direct", np.dtype(np.int32), direct_length)):
+        offset = _aligned(offset)
+        sections.append((name, dtype, length, offset))
+        offset += dtype.itemsize * length
+    return sections
+
+class RoutingTable:
+    # Master partition and replica bitmask of every vertex, looked up by raw vertex ID in batches
+    def __init__(self, index, masters, masks, num_partitions):
+        self.index = index
+        self.masters = masters
+        self.masks = masks
+        self.num_partitions = num_partitions
+
+    def __len__(self):
+        return len(self.masters)
+
+    def dense(self, vertex_ids):
+        # Dense index of each vertex ID, -1 for IDs that are not in the graph
+        vertex_ids = np.asarray(vertex_ids, dtype=np.int64)
+        index = self.index
+        if index.direct is not None:
+            offsets = vertex_ids - index.base
+            inside = (offsets >= 0) & (offsets < len(index.direct))
+            return np.where(inside, index.direct[np.where(inside, offsets, 0)], -1)
+        dense = np.searchsorted(index.ids, vertex_ids)
+        found = dense < len(index.ids)
+        found[found] = index.ids[dense[found]] == vertex_ids[found]
+        return np.where(found, dense, -1)
+
+    def lookup_master(self, vertex_ids):
+        # Partition holding each vertex's master, -1 for unknown vertices
+        dense = self.dense(vertex_ids)
+        return np.where(dense >= 0, self.masters[np.maximum(dense, 0)], -1).astype(self.masters.dtype)
+
+    def lookup_replicas(self, vertex_ids):
+        # Replica bitmask of each vertex (bit p set = a copy on partition p), 0 for unknown vertices
+        dense = self.dense(vertex_ids)
+        return np.where(dense >= 0, self.masks[np.maximum(dense, 0)], 0).astype(self.masks.dtype)
+
+    def lookup_mirrors(self, vertex_ids):
+        # Replica bitmask without the master's bit
+        masters, replicas = self.lookup(vertex_ids)
+        master_bits = np.left_shift(np.ones_like(replicas), np.maximum(masters, 0).astype(replicas.dtype))
+        return np.where(masters >= 0, replicas & ~master_bits, replicas)
+
+    def lookup(self, vertex_ids):
+        # Masters and replica bitmasks together, resolving the IDs once
+        dense = self.dense(vertex_ids)
+        known = dense >= 0
+        dense = np.maximum(dense, 0)
+        return np.where(known, self.masters[dense], -1).astype(self.masters.dtype), np.where(known, self.masks[dense], 0).astype(self.masks.dtype)
+
+    def replica_partitions(self, vertex_id):
+        # Partitions holding a copy of one vertex
+        mask = int(self.lookup_replicas([vertex_id])[0])
+        return [part_id for part_id in range(self.num_partitions) if mask >> part_id & 1]
+
+def save_routing_table(result, output_file):
+    # Write the master and replica arrays of a PartitionResult, with its vertex index, as one mmap-able file
+    index = result.index
+    direct = index.direct if index.direct is not None else np.empty(0, dtype=np.int32)
+    sections = _sections(len(index), result.num_partitions, len(direct))
+    arrays = {"vertex_ids": index.ids, "masters": result.masters, "masks": result.replica_masks, "direct": direct}
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    tmp_file = f"{output_file}.tmp"
+    with open(tmp_file, "wb") as f:
+        f.write(ROUTING_HEADER.pack(ROUTING_MAGIC, ROUTING_VERSION, len(index), result.num_partitions, index.base, len(direct)))
+        for name, dtype, length, offset in sections:
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(np.ascontiguousarray(arrays[name], dtype=dtype).tobytes())
+    os.replace(tmp_file, output_file)
+
+def load_routing_table(path):
+    # Map a routing table read-only; arrays are views of the mapping, so loading costs no reads up front
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, num_vertices, num_partitions, base, direct_length = ROUTING_HEADER.unpack_from(buffer)
+    if magic != ROUTING_MAGIC or version != ROUTING_VERSION:
+        raise ValueError(f"{path}: not a version {ROUTING_VERSION} routing table")
+    arrays = {}
+    for name, dtype, length, offset in _sections(num_vertices, num_partitions, direct_length):
+        arrays[name] = np.frombuffer(buffer, dtype=dtype, count=length, offset=offset)
+    direct = arrays["direct"] if direct_length else None
+    return RoutingTable(VertexIndex(arrays["vertex_ids"], direct, base), arrays["masters"], arrays["masks"], num_partitions)
@@ -0,0 +1,101 @@
+import multiprocessing
+import os
+import time
+
+from utils import parse_args, get_output_file_name, save_huge_edge_cut_partitions, save_huge_vertex_cut_partitions, count_edges
+from vertex_index import load_vertex_index, load_degrees
+from partitioning import ALGORITHMS, EDGE_CUT_ALGORITHMS, DEGREE_ALGORITHMS, HYBRID_ALGORITHMS, VERTEX_PARTITIONER_OF, HDRF_LAMBDA, make_stream
+from dedup import unique_edge_file
+from vertex_partitioning import vertex_partition, ginger_vertex_partition
+from prefetch import prefetch_edge_batches
+
+# Relative cost of one configuration, used to spread the matrix over processes
+ALGORITHM_COST = {"edge_cut": 1, "random_vertex_cut": 1, "heuristic_vertex_cut": 50, "hybrid_vertex_cut": 1, "ldg_edge_cut": 1,
+                  "fennel_edge_cut": 1, "hdrf_vertex_cut": 60, "dbh_vertex_cut": 1, "ginger_vertex_cut": 1}
+
+def run_configs(path, configs, index, vertex_degrees, vertex_masters, hdrf_lambda=HDRF_LAMBDA, read_ahead=0):
+    # Stream every edge batch once through the partitioners of all configurations
+    num_edges = count_edges(path)
+    streams = [make_stream(algorithm, num_partitions, degree_threshold, len(index), num_edges, vertex_degrees,
+                           vertex_masters.get((algorithm, num_partitions, degree_threshold)), hdrf_lambda)
+               for algorithm, num_partitions, degree_threshold in configs]
+    for batch in prefetch_edge_batches(path, depth=read_ahead, progress=True):
+        src = index.lookup(batch[:, 0])
+        dst = index.lookup(batch[:, 1])
+        for stream in streams:
+            stream.consume(batch, src, dst)
+    return [stream.partitions() for stream in streams]
+
+_worker_state = {}
+
+def _init_worker(state):
+    _worker_state.update(state)
+
+def _run_group(args):
+    group, group_masters = args
+    return run_configs(configs=group, vertex_masters=group_masters, **_worker_state)
+
+def split_configs(configs, num_groups):
+    # Greedy balance of configurations over processes by estimated cost, heaviest first
+    groups = [[] for _ in range(num_groups)]
+    costs = [0] * num_groups
+    for config in sorted(configs, key=lambda config: -ALGORITHM_COST[config[0]]):
+        group = costs.index(min(costs))
+        groups[group].append(config)
+        costs[group] += ALGORITHM_COST[config[0]]
+    return [group for group in groups if group]
+
+def run_matrix(path, configs, workers=1, hdrf_lambda=HDRF_LAMBDA, read_ahead=0):
+    # Partition results of every (algorithm, num_partitions, degree_threshold) configuration, in the order given; each pass
+    # reads read_ahead batches ahead in a background thread when above 0
+    index = load_vertex_index(path)
+    vertex_degrees = None
+    if any(algorithm in DEGREE_ALGORITHMS for algorithm, _, _ in configs):
+        vertex_degrees = load_degrees(path, index, workers)["degree"]
+    # Vertex placements of the streaming edge-cuts and of ginger come first, one pass over the sorted adjacency lists each
+    vertex_masters = {}
+    for config in configs:
+        algorithm, num_partitions, degree_threshold = config
+        if algorithm in VERTEX_PARTITIONER_OF and config not in vertex_masters:
+            vertex_masters[config] = vertex_partition(path, index, num_partitions, VERTEX_PARTITIONER_OF[algorithm])
+        elif algorithm == "ginger_vertex_cut" and config not in vertex_masters:
+            vertex_masters[config] = ginger_vertex_partition(path, index, num_partitions, vertex_degrees, degree_threshold)
+
+    groups = split_configs(configs, max(1, min(workers, len(configs))))
+    if len(groups) <= 1:
+        results = [run_configs(path, group, index, vertex_degrees, vertex_masters, hdrf_lambda, read_ahead) for group in groups]
+    else:
+        # Each process makes its own pass. The index and degrees are inherited on fork through the pool's initializer;
+        # each task carries only the vertex placements of its own group
+        state = {"path": path, "index": index, "vertex_degrees": vertex_degrees, "hdrf_lambda": hdrf_lambda, "read_ahead": read_ahead}
+        tasks = [(group, {config: vertex_masters[config] for config in group if config in vertex_masters}) for group in groups]
+        with multiprocessing.Pool(len(groups), initializer=_init_worker, initargs=(state,)) as pool:
+            results = pool.map(_run_group, tasks)
+
+    partitions = {}
+    for group, group_results in zip(groups, results):
+        partitions.update(zip(group, group_results))
+    return [partitions[config] for config in configs]
+
+def main():
+    args = parse_args()
+    start = time.time()
+    configs = []
+    for algorithm in args.algorithms or ALGORITHMS:
+        for num_partitions in args.partition_counts or [args.num_partitions]:
+            thresholds = (args.thresholds or [args.degree_threshold]) if algorithm in HYBRID_ALGORITHMS else [None]
+            configs.extend((algorithm, num_partitions, degree_threshold) for degree_threshold in thresholds)
+
+    input_file = unique_edge_file(args.input_file, args.memory_budget << 20) if args.dedup else args.input_file
+    results = run_matrix(input_file, configs, args.workers, args.hdrf_lambda, args.read_ahead)
+    print(f"Partitioned {len(configs)} configurations in {time.time() - start} seconds")
+
+    for (algorithm, num_partitions, degree_threshold), partitions in zip(configs, results):
+        output_file = os.path.join(args.output_dir, get_output_file_name(algorithm, args.input_file, num_partitions, threshold=degree_threshold))
+        if algorithm in EDGE_CUT_ALGORITHMS:
+            save_huge_edge_cut_partitions(partitions, output_file)
+        else:
+            save_huge_vertex_cut_partitions(partitions, output_file)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import os
+import numpy as np
+
+from utils import EDGE_BYTES
+from dedup import iter_sorted_edges, unpack_keys, MEMORY_BUDGET
+
+SHARD_BUFFER = 64 << 20  # bytes of write buffers over all partitions
+MIN_BUFFER_EDGES = 1 << 12
+
+def shard_file_name(shard_dir, part_id):
+    return os.path.join(shard_dir, f"part_{part_id}.graph")
+
+def csr_file_name(shard_dir, part_id):
+    return os.path.join(shard_dir, f"part_{part_id}.csr.npz")
+
+class ShardWriter:
+    # Appends placed edges to one binary <int32 src, int32 dst> file per partition, through a fixed write buffer per
+    # partition; edges keep their input order within a shard
+    # resume=True keeps existing shard files for a resumed run, which truncates them to its checkpoint's sizes
+    def __init__(self, shard_dir, num_partitions, buffer_bytes=SHARD_BUFFER, csr=False, memory_budget=MEMORY_BUDGET, resume=False):
+        os.makedirs(shard_dir, exist_ok=True)
+        self.shard_dir = shard_dir
+        self.num_partitions = num_partitions
+        self.csr = csr
+        self.memory_budget = memory_budget
+        buffer_edges = max(buffer_bytes // (EDGE_BYTES * num_partitions), MIN_BUFFER_EDGES)
+        self.buffers = np.empty((num_partitions, buffer_edges, 2), dtype=np.int32)
+        self.fill = [0] * num_partitions
+        self.edges = np.zeros(num_partitions, dtype=np.int64)
+        self.files = [open(shard_file_name(shard_dir, part_id), "ab" if resume else "wb") for part_id in range(num_partitions)]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, batch, parts, replica_parts=None):
+        # Edge i goes to parts[i]; for edge-cut, replica_parts[i] is the partition its replicated copy goes to when it
+        # differs from parts[i]
+        rows = np.arange(len(batch))
+        if replica_parts is not None:
+            cut = np.flatnonzero(replica_parts != parts)
+            rows = np.concatenate((rows, cut))
+            parts = np.concatenate((parts, replica_parts[cut]))
+        order = np.lexsort((rows, parts))
+        rows = rows[order]
+        bounds = np.searchsorted(parts[order], np.arange(self.num_partitions + 1))
+        for part_id in np.flatnonzero(np.diff(bounds)):
+            self._append(part_id, batch[rows[bounds[part_id]:bounds[part_id + 1]]])
+
+    def _append(self, part_id, edges):
+        buffer = self.buffers[part_id]
+        self.edges[part_id] += len(edges)
+        while len(edges):
+            fill = self.fill[part_id]
+            take = min(len(edges), len(buffer) - fill)
+            buffer[fill:fill + take] = edges[:take]
+            self.fill[part_id] = fill + take
+            edges = edges[take:]
+            if self.fill[part_id] == len(buffer):
+                self._flush(part_id)
+
+    def _flush(self, part_id):
+        self.files[part_id].write(self.buffers[part_id, :self.fill[part_id]])
+        self.fill[part_id] = 0
+
+    def flush(self):
+        # Push every buffered edge to its file, so the files hold exactly self.edges edges each
+        for part_id, f in enumerate(self.files):
+            self._flush(part_id)
+            f.flush()
+
+    def truncate(self, edges):
+        # Cut each shard back to edges[part_id] edges, dropping anything buffered
+        self.fill = [0] * self.num_partitions
+        self.edges = np.array(edges, dtype=np.int64)
+        for part_id, f in enumerate(self.files):
+            f.flush()
+            f.truncate(int(self.edges[part_id]) * EDGE_BYTES)
+
+    def close(self):
+        if self.files is None:
+            return
+        for part_id, f in enumerate(self.files):
+            self._flush(part_id)
+            f.close()
+        self.files = None
+        self.buffers = None
+        if self.csr:
+            for part_id in range(self.num_partitions):
+                write_csr(shard_file_name(self.shard_dir, part_id), csr_file_name(self.shard_dir, part_id), self.memory_budget)
+
+def write_csr(shard_file, csr_file, memory_budget=MEMORY_BUDGET):
+    # Sort the shard by (src, dst) out of core and index it: edges of sources[i] are rows offsets[i]:offsets[i + 1]
+    tmp_file = f"{shard_file}.tmp"
+    sources, counts = [np.empty(0, dtype=np.int32)], [np.empty(0, dtype=np.int64)]
+    with open(tmp_file, "wb") as f:
+        for keys, _ in iter_sorted_edges(shard_file, memory_budget, os.path.dirname(shard_file)):
+            edges = unpack_keys(keys)
+            f.write(edges.tobytes())
+            block_sources, block_counts = np.unique(edges[:, 0], return_counts=True)
+            sources.append(block_sources)
+            counts.append(block_counts)
+    os.replace(tmp_file, shard_file)
+
+    # Blocks are in order, but a source may be split across two of them
+    sources = np.concatenate(sources)
+    counts = np.concatenate(counts).astype(np.int64)
+    offsets = np.zeros(1, dtype=np.int64)
+    if len(sources):
+        starts = np.flatnonzero(np.concatenate(([True], sources[1:] != sources[:-1])))
+        sources = sources[starts]
+        offsets = np.concatenate((offsets, np.cumsum(np.add.reduceat(counts, starts))))
+    np.savez(csr_file, sources=sources, offsets=offsets)
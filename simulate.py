@@ -0,0 +1,202 @@
+import argparse
+import json
+import os
+import time
+import numpy as np
+
+from utils import iter_edge_batches, graph_cache_dir, get_partition_file_name, BATCH_SIZE
+from partitioning import partition, ALGORITHMS, EDGE_CUT_ALGORITHMS, HYBRID_ALGORITHMS, HDRF_LAMBDA
+from dedup import MEMORY_BUDGET
+
+WORKLOADS = ["pagerank", "sssp"]
+MESSAGE_BYTES = 16  # vertex ID and an 8-byte value per message
+EDGE_RATE = 1e8  # edges one partition processes per second
+BANDWIDTH = 1.25e9  # bytes per second in and out of one partition (10 GbE)
+BARRIER_SECONDS = 1e-3  # synchronization at the end of every superstep
+
+def _edge_batches(result, batch_size):
+    # (dense src, dense dst, partition) of every edge, in file order. Edge-cut edges live with their source's master;
+    # vertex-cut needs the per-edge assignment kept by partition()
+    if result.edges is None:
+        raise ValueError("edges were not kept with this result")
+    if result.algorithm not in EDGE_CUT_ALGORITHMS and result.edge_partitions is None:
+        raise ValueError("edge assignment was not kept with this result")
+    edge_num = 0
+    for batch in iter_edge_batches(result.edges, batch_size):
+        src = result.index.lookup(batch[:, 0])
+        dst = result.index.lookup(batch[:, 1])
+        if result.algorithm in EDGE_CUT_ALGORITHMS:
+            parts = result.masters[src]
+        else:
+            parts = result.edge_partitions[edge_num:edge_num + len(batch)]
+        edge_num += len(batch)
+        yield src, dst, parts
+
+def _mirror_messages(masks, masters, bits, vertices=None):
+    # Messages between each vertex's master and the other partitions set in its mask, counted per mirror partition and
+    # per master partition, over the given vertices or all of them
+    if vertices is not None:
+        masks, masters = masks[vertices], masters[vertices]
+    num_partitions = len(bits)
+    at_mirror = np.zeros(num_partitions, dtype=np.int64)
+    at_master = np.zeros(num_partitions, dtype=np.int64)
+    for part_id, bit in enumerate(bits):
+        mirrors = ((masks & bit) != 0) & (masters != part_id)
+        at_mirror[part_id] = np.count_nonzero(mirrors)
+        at_master += np.bincount(masters[mirrors], minlength=num_partitions)
+    return at_mirror, at_master
+
+def _out_masks(result, batch_size):
+    # Partitions holding out-edges of each vertex, i.e. the replicas that need its value to scatter along them
+    bits = result.store.bits
+    out_masks = np.zeros(result.num_vertices, dtype=bits.dtype)
+    for src, _, parts in _edge_batches(result, batch_size):
+        np.bitwise_or.at(out_masks, src, bits[parts])
+    return out_masks
+
+def _superstep(result, active, batch_size):
+    # One pass over the edges leaving active vertices (None = all): the edges each partition processes, the partitions
+    # that accumulate a partial value for each destination, and the destinations reached
+    bits = result.store.bits
+    compute_edges = np.zeros(result.num_partitions, dtype=np.int64)
+    in_masks = np.zeros(result.num_vertices, dtype=bits.dtype)
+    for src, dst, parts in _edge_batches(result, batch_size):
+        if active is not None:
+            keep = active[src]
+            dst, parts = dst[keep], parts[keep]
+        compute_edges += np.bincount(parts, minlength=result.num_partitions)
+        np.bitwise_or.at(in_masks, dst, bits[parts])
+    return compute_edges, in_masks
+
+def _superstep_report(superstep, result, compute_edges, in_masks, updated, out_masks, message_bytes, edge_rate, bandwidth):
+    # Gather: every partition holding edges into a vertex, other than its master's, sends one partial value to the master.
+    # Scatter: the master of every updated vertex sends the new value to the other partitions holding its out-edges
+    masters = result.masters
+    bits = result.store.bits
+    gather_sent, gather_received = _mirror_messages(in_masks, masters, bits)
+    scatter_received, scatter_sent = _mirror_messages(out_masks, masters, bits, updated)
+    bytes_sent = (gather_sent + scatter_sent) * message_bytes
+    bytes_received = (gather_received + scatter_received) * message_bytes
+    seconds = compute_edges / edge_rate + np.maximum(bytes_sent, bytes_received) / bandwidth
+    critical = int(np.argmax(seconds))
+    return {
+        "superstep": superstep,
+        "active_edges": int(compute_edges.sum()),
+        "updated_vertices": int(len(updated)),
+        "compute_edges": compute_edges.tolist(),
+        "gather_messages": gather_sent.tolist(),
+        "scatter_messages": scatter_sent.tolist(),
+        "bytes_sent": bytes_sent.tolist(),
+        "bytes_received": bytes_received.tolist(),
+        "partition_seconds": seconds.tolist(),
+        "critical_partition": critical,
+        "seconds": float(seconds[critical]) + BARRIER_SECONDS,
+    }
+
+def simulate(result, workload="pagerank", supersteps=10, source=None, message_bytes=MESSAGE_BYTES, edge_rate=EDGE_RATE,
+             bandwidth=BANDWIDTH, batch_size=BATCH_SIZE):
+    # Modeled BSP run of a GAS-style workload over a PartitionResult with its edges (and, for vertex-cut, per-edge
+    # assignment). Every superstep streams the edges once, so only per-vertex masks are held. pagerank keeps every vertex
+    # active for the given number of supersteps; its supersteps are alike, so the pass is made once. sssp is a
+    # breadth-first search from the raw vertex ID source (by default the vertex with the most out-edges) that stops when
+    # no vertex is reached or after supersteps. A partition's time is its edges at edge_rate plus the larger of its bytes
+    # in and out at bandwidth; the slowest partition of a superstep is on the critical path
+    if workload not in WORKLOADS:
+        raise ValueError(f"unknown workload {workload}")
+    start_time = time.time()
+    out_masks = _out_masks(result, batch_size)
+    steps = []
+    if workload == "pagerank":
+        compute_edges, in_masks = _superstep(result, None, batch_size)
+        updated = np.flatnonzero(in_masks)
+        step = _superstep_report(0, result, compute_edges, in_masks, updated, out_masks, message_bytes, edge_rate, bandwidth)
+        steps = [dict(step, superstep=superstep) for superstep in range(supersteps)]
+    else:
+        if source is None:
+            out_degree = np.zeros(result.num_vertices, dtype=np.int64)
+            for src, _, _ in _edge_batches(result, batch_size):
+                np.add.at(out_degree, src, 1)
+            start = int(np.argmax(out_degree))
+        else:
+            start = int(result.index.lookup(np.array([source]))[0])
+        visited = np.zeros(result.num_vertices, dtype=bool)
+        visited[start] = True
+        active = visited.copy()
+        for superstep in range(supersteps):
+            compute_edges, in_masks = _superstep(result, active, batch_size)
+            reached = np.flatnonzero(in_masks)
+            updated = reached[~visited[reached]]
+            steps.append(_superstep_report(superstep, result, compute_edges, in_masks, updated, out_masks, message_bytes, edge_rate, bandwidth))
+            if not len(updated):
+                break
+            visited[updated] = True
+            active[:] = False
+            active[updated] = True
+
+    critical = np.bincount([step["critical_partition"] for step in steps], minlength=result.num_partitions)
+    report = {
+        "algorithm": result.algorithm,
+        "workload": workload,
+        "num_partitions": result.num_partitions,
+        "replication_factor": float(result.store.replication_factor()),
+        "message_bytes": message_bytes,
+        "edge_rate": edge_rate,
+        "bandwidth": bandwidth,
+        "supersteps": steps,
+        "modeled_seconds": sum(step["seconds"] for step in steps),
+        "compute_seconds": sum(max(step["compute_edges"]) / edge_rate for step in steps),
+        "total_bytes": sum(sum(step["bytes_sent"]) for step in steps),
+        "critical_partitions": critical.tolist(),
+    }
+    print(f"Simulated {len(steps)} {workload} supersteps of {result.algorithm} in {time.time() - start_time} seconds")
+    return report
+
+def summary(reports):
+    lines = [f"{'algorithm':>22} {'workload':>9} {'steps':>6} {'replication':>12} {'modeled_s':>10} {'compute_s':>10} {'GB':>9} {'critical':>9}"]
+    for report in reports:
+        lines.append(f"{report['algorithm']:>22} {report['workload']:>9} {len(report['supersteps']):>6} {report['replication_factor']:>12.4f} "
+                     f"{report['modeled_seconds']:>10.4f} {report['compute_seconds']:>10.4f} {report['total_bytes'] / 1e9:>9.4f} "
+                     f"{int(np.argmax(report['critical_partitions'])):>9}")
+    return "\n".join(lines) + "\n"
+
+def main():
+    parser = argparse.ArgumentParser(description="Model the supersteps of BSP workloads over partitionings of a graph and compare their runtime")
+    parser.add_argument("-i", "--input_file", type=str, required=True)
+    parser.add_argument("-a", "--algorithms", type=str, nargs="+", choices=ALGORITHMS,
+                        default=["edge_cut", "random_vertex_cut", "heuristic_vertex_cut", "hybrid_vertex_cut"])
+    parser.add_argument("-n", "--num_partitions", type=int, default=4)
+    parser.add_argument("-t", "--degree_threshold", type=int, help="Degree threshold of hybrid partitioning", default=100)
+    parser.add_argument("-hl", "--hdrf_lambda", type=float, help="Weight of partition balance in HDRF", default=HDRF_LAMBDA)
+    parser.add_argument("-wl", "--workloads", type=str, nargs="+", choices=WORKLOADS, default=WORKLOADS)
+    parser.add_argument("-ss", "--supersteps", type=int, help="PageRank iterations, and the most SSSP supersteps", default=10)
+    parser.add_argument("-s", "--source", type=int, help="SSSP source vertex ID (default: the vertex with the most out-edges)")
+    parser.add_argument("-by", "--message_bytes", type=int, default=MESSAGE_BYTES)
+    parser.add_argument("-er", "--edge_rate", type=float, help="Edges per second of one partition", default=EDGE_RATE)
+    parser.add_argument("-bw", "--bandwidth", type=float, help="Network bytes per second of one partition", default=BANDWIDTH)
+    parser.add_argument("-mb", "--memory_budget", type=int, help="Memory in MB for per-vertex state and per-edge assignment with -dk", default=MEMORY_BUDGET >> 20)
+    parser.add_argument("-dk", "--disk", action="store_true", help="Spill the per-edge assignment and per-vertex state past -mb to scratch files")
+    parser.add_argument("-od", "--output_dir", type=str, help="Output directory", default="output")
+    args = parser.parse_args()
+
+    options = {}
+    if args.disk:
+        options = {"memory_budget": args.memory_budget << 20, "spill_dir": os.path.join(graph_cache_dir(args.input_file), "scratch")}
+    reports = []
+    for algorithm in args.algorithms:
+        threshold = args.degree_threshold if algorithm in HYBRID_ALGORITHMS else 100
+        result = partition(args.input_file, algorithm, args.num_partitions, threshold, progress=True, hdrf_lambda=args.hdrf_lambda, **options)
+        for workload in args.workloads:
+            reports.append(simulate(result, workload, args.supersteps, args.source, args.message_bytes, args.edge_rate, args.bandwidth))
+
+    text = summary(reports)
+    print(text, end="")
+    output_file = os.path.join(args.output_dir, get_partition_file_name("simulation", args.input_file, args.num_partitions, ".json"))
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    with open(output_file, "w") as f:
+        json.dump(reports, f, indent=2)
+    with open(os.path.join(args.output_dir, get_partition_file_name("simulation", args.input_file, args.num_partitions, ".txt")), "w") as f:
+        f.write(text)
+    print(f"Simulation saved to {output_file}")
+
+if __name__ == "__main__":
+    main()
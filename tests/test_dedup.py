@@ -0,0 +1,27 @@
+import numpy as np
+
+from dedup import dedup_edge_file, iter_sorted_unique, unique_edges, unpack_keys
+from utils import edge_array, save_graph
+
+def test_external_dedup_matches_np_unique(tmp_path):
+    # A one-byte budget sorts runs of the 1 << 16 edge floor, so the 200000 edges take four runs and a merge
+    rng = np.random.default_rng(0)
+    edges = rng.integers(-300, 300, size=(200000, 2), dtype=np.int32)
+    graph_file = str(tmp_path / "g.graph")
+    save_graph(edges, graph_file)
+    expected = np.unique(edges, axis=0)
+
+    blocks = list(iter_sorted_unique(graph_file, memory_budget=1, tmp_dir=str(tmp_path)))
+    assert len(blocks) > 1
+    assert np.array_equal(np.concatenate([unpack_keys(keys) for keys, _ in blocks]), expected)
+
+    sorted_file = str(tmp_path / "sorted.graph")
+    assert dedup_edge_file(graph_file, sorted_file, sort=True, memory_budget=1, tmp_dir=str(tmp_path)) == len(expected)
+    assert np.array_equal(edge_array(sorted_file), expected)
+
+    # In file order, each distinct edge at its first occurrence
+    _, first = np.unique(edges, axis=0, return_index=True)
+    unique_file = str(tmp_path / "unique.graph")
+    assert dedup_edge_file(graph_file, unique_file, memory_budget=1, tmp_dir=str(tmp_path)) == len(expected)
+    assert np.array_equal(edge_array(unique_file), edges[np.sort(first)])
+    assert np.array_equal(unique_edges(edges), edges[np.sort(first)])
@@ -0,0 +1,26 @@
+import numpy as np
+
+from edge_formats import encode_block, decode_block, save_vgraph, iter_vgraph_batches, decode_vgraph_file, count_vgraph_edges
+from utils import edge_array
+
+def sorted_edges(num_edges, seed=0):
+    # Edges sorted by (src, dst) with repeats, negative IDs and gaps past 32 bits of varint
+    rng = np.random.default_rng(seed)
+    edges = rng.integers(-(1 << 31), (1 << 31) - 1, size=(num_edges, 2), dtype=np.int64).astype(np.int32)
+    edges[: num_edges // 2] = rng.integers(-50, 50, size=(num_edges // 2, 2), dtype=np.int32)
+    return edges[np.lexsort((edges[:, 1], edges[:, 0]))]
+
+def test_block_round_trip():
+    edges = sorted_edges(5000)
+    assert np.array_equal(decode_block(encode_block(edges), len(edges)), edges)
+
+def test_vgraph_round_trip(tmp_path):
+    edges = sorted_edges(10000)
+    vgraph_file = str(tmp_path / "g.vgraph")
+    assert save_vgraph(np.array_split(edges, 7), vgraph_file, block_edges=1000) == len(edges)
+    assert count_vgraph_edges(vgraph_file) == len(edges)
+    assert np.array_equal(np.concatenate(list(iter_vgraph_batches(vgraph_file))), edges)
+    for workers in (1, 3):
+        output_file = str(tmp_path / f"g{workers}.graph")
+        assert decode_vgraph_file(vgraph_file, output_file, workers) == len(edges)
+        assert np.array_equal(edge_array(output_file), edges)
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from benchmark.generators import iter_rmat_batches
+from memory_plan import StateAllocator, estimate_vertices, plan_memory
+from partitioning import partition
+from utils import save_graph_batches
+
+@pytest.fixture
+def graph_file(tmp_path):
+    path = str(tmp_path / "g.graph")
+    save_graph_batches(iter_rmat_batches(12, batch_size=10000), path)
+    return path
+
+def test_allocator_spills_past_the_budget(tmp_path):
+    allocator = StateAllocator(1000, str(tmp_path / "scratch"))
+    small = allocator.zeros(100, np.int64)
+    large = allocator.full(100, -1, np.int32)
+    assert not isinstance(small, np.memmap) and isinstance(large, np.memmap)
+    assert (allocator.used, allocator.spilled) == (800, 400)
+    assert (large == -1).all()
+    # Scratch files are unlinked once mapped
+    assert not list((tmp_path / "scratch").iterdir())
+    allocator.release(small)
+    allocator.release(large)
+    assert (allocator.used, allocator.spilled) == (0, 0)
+    assert not isinstance(allocator.zeros(100, np.int64), np.memmap)
+
+@pytest.mark.parametrize("algorithm", ["heuristic_vertex_cut", "hdrf_vertex_cut", "hybrid_vertex_cut", "edge_cut"])
+def test_spilled_state_matches_in_memory_run(tmp_path, graph_file, algorithm):
+    in_memory = partition(graph_file, algorithm, 4, 30, use_cache=False)
+    spilled = partition(graph_file, algorithm, 4, 30, use_cache=False, memory_budget=0, spill_dir=str(tmp_path / "scratch"))
+    assert isinstance(spilled.store.masks, np.memmap)
+    assert np.array_equal(spilled.edge_partitions, in_memory.edge_partitions)
+    assert np.array_equal(spilled.masters, in_memory.masters)
+    assert np.array_equal(spilled.replica_masks, in_memory.replica_masks)
+
+def test_plan_picks_the_representation_within_budget(graph_file):
+    num_vertices, _ = estimate_vertices(graph_file)
+    assert num_vertices == len(np.unique(np.fromfile(graph_file, dtype=np.int32)))
+    plans = {budget: plan_memory(graph_file, "hybrid_vertex_cut", 8, budget) for budget in (1 << 40, 8 << 20, 1 << 10)}
+    assert [plan["representation"] for plan in plans.values()] == ["memory", "mmap", "disk"]
+    assert plans[8 << 20]["mmap_bytes"] <= 8 << 20 < plans[8 << 20]["memory_bytes"]
@@ -0,0 +1,16 @@
+import numpy as np
+import pytest
+
+from benchmark.generators import iter_rmat_batches
+from partitioning import partition
+from utils import save_graph_batches
+
+@pytest.mark.parametrize("algorithm", ["random_vertex_cut", "hybrid_vertex_cut", "dbh_vertex_cut", "ginger_vertex_cut"])
+def test_workers_match_single_process(tmp_path, algorithm):
+    graph_file = str(tmp_path / "g.graph")
+    save_graph_batches(iter_rmat_batches(12, batch_size=10000), graph_file)
+    single = partition(graph_file, algorithm, 4, 30, batch_size=10000)
+    sharded = partition(graph_file, algorithm, 4, 30, workers=3, batch_size=10000)
+    assert np.array_equal(sharded.masters, single.masters)
+    assert np.array_equal(sharded.replica_masks, single.replica_masks)
+    assert np.array_equal(sharded.store.edges, single.store.edges)
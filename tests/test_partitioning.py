@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from benchmark.generators import iter_rmat_batches
+from partitioning import partition
+
+def rmat_edges(scale, seed=0):
+    return np.concatenate(list(iter_rmat_batches(scale, seed=seed)))
+
+@pytest.mark.parametrize("degree_threshold", [30, 100])
+def test_ginger_replicates_no_more_than_hybrid(degree_threshold):
+    edges = rmat_edges(12)
+    hybrid = partition(edges, "hybrid_vertex_cut", 8, degree_threshold)
+    ginger = partition(edges, "ginger_vertex_cut", 8, degree_threshold)
+    assert ginger.store.replication_factor() <= hybrid.store.replication_factor()
+
+def hdrf_reference(edges, num_partitions, balance=1.0, epsilon=1.0):
+    # HDRF as published, one edge at a time over every partition; ties go to the least loaded partition, then the lowest ID
+    degree, replicas, masters = {}, {}, {}
+    loads = [0] * num_partitions
+    parts = []
+    for src, dst in edges.tolist():
+        degree[src] = degree.get(src, 0) + 1
+        degree[dst] = degree.get(dst, 0) + 1
+        theta_src = degree[src] / (degree[src] + degree[dst])
+        max_load, min_load = max(loads), min(loads)
+        least = loads.index(min_load)
+        best_part, best_score = None, None
+        for part_id in [least] + [p for p in range(num_partitions) if p != least]:
+            # Same float operations as the implementation, so exact ties break alike
+            score = balance / (epsilon + max_load - min_load) * (max_load - loads[part_id])
+            if part_id in replicas.get(src, ()):
+                score += 2 - theta_src
+            if part_id in replicas.get(dst, ()):
+                score += 1 + theta_src
+            if best_score is None or score > best_score:
+                best_part, best_score = part_id, score
+        for vertex in (src, dst):
+            replicas.setdefault(vertex, set()).add(best_part)
+            masters.setdefault(vertex, best_part)
+        loads[best_part] += 1
+        parts.append(best_part)
+    return np.array(parts), masters
+
+@pytest.mark.parametrize("hdrf_lambda", [0.5, 1.0, 4.0])
+def test_hdrf_matches_reference(hdrf_lambda):
+    edges = rmat_edges(9)
+    result = partition(edges, "hdrf_vertex_cut", 5, hdrf_lambda=hdrf_lambda)
+    parts, masters = hdrf_reference(edges, 5, hdrf_lambda)
+    assert np.array_equal(result.edge_partitions, parts)
+    assert result.masters.tolist() == [masters[vertex] for vertex in result.vertex_ids.tolist()]
+
+def test_dbh_hashes_the_lower_degree_endpoint():
+    edges = rmat_edges(10)
+    result = partition(edges, "dbh_vertex_cut", 6)
+    ids, degrees = np.unique(edges, return_counts=True)
+    src_degree = degrees[np.searchsorted(ids, edges[:, 0])]
+    dst_degree = degrees[np.searchsorted(ids, edges[:, 1])]
+    hashed = np.where(dst_degree < src_degree, edges[:, 1], edges[:, 0])
+    assert np.array_equal(result.edge_partitions, (hashed - 1) % 6)
+
+def test_ginger_keeps_a_vertex_with_its_in_edges_and_out_edges_to_hubs():
+    # An edge goes with its low-degree destination, or, into a high-degree one, with its source, so every vertex's
+    # in-edges and out-edges to high-degree vertices share one partition; high-degree vertices hash by ID
+    edges = rmat_edges(11)
+    result = partition(edges, "ginger_vertex_cut", 8, 30)
+    ids, degrees = np.unique(edges, return_counts=True)
+    to_high = degrees[np.searchsorted(ids, edges[:, 1])] > 30
+    owner = np.where(to_high, edges[:, 0], edges[:, 1])
+    order = np.argsort(owner, kind="stable")
+    starts = np.flatnonzero(np.concatenate(([True], owner[order][1:] != owner[order][:-1])))
+    first_part = np.repeat(result.edge_partitions[order][starts], np.diff(np.append(starts, len(order))))
+    assert np.array_equal(result.edge_partitions[order], first_part)
+    high_owner = degrees[np.searchsorted(ids, owner)] > 30
+    assert np.array_equal(result.edge_partitions[high_owner], (owner[high_owner] - 1) % 8)
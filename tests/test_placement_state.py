@@ -0,0 +1,92 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+import p_way_edge_cut
+import p_way_random_vertex_cut
+from partitioning import partition, partition_delta
+from placement_state import Checkpointer
+from shard_writer import shard_file_name
+from utils import save_graph, EDGE_BYTES
+
+class Interrupted(Exception):
+    pass
+
+def power_law_edges(num_edges, seed=0):
+    rng = np.random.default_rng(seed)
+    return (rng.zipf(1.8, size=(num_edges, 2)) % 3000).astype(np.int32)
+
+@pytest.mark.parametrize("algorithm", ["heuristic_vertex_cut", "hdrf_vertex_cut", "edge_cut"])
+def test_resume_matches_uninterrupted_run(tmp_path, monkeypatch, algorithm):
+    graph_file = str(tmp_path / "g.graph")
+    save_graph(power_law_edges(30000), graph_file)
+    checkpoint_file = str(tmp_path / "g.ckpt")
+    expected = partition(graph_file, algorithm, 4, batch_size=1000)
+
+    update = Checkpointer.update
+    def interrupted_update(self, stream, edge_num, *args):
+        # Stop the pass a few batches after its first checkpoint
+        update(self, stream, edge_num, *args)
+        if self.last_edge and edge_num >= self.last_edge + 3000:
+            self.wait()
+            raise Interrupted()
+    monkeypatch.setattr(Checkpointer, "update", interrupted_update)
+    with pytest.raises(Interrupted):
+        partition(graph_file, algorithm, 4, batch_size=1000, checkpoint_file=checkpoint_file, checkpoint_edges=10000)
+    monkeypatch.setattr(Checkpointer, "update", update)
+
+    resumed = partition(graph_file, algorithm, 4, batch_size=1000, checkpoint_file=checkpoint_file, checkpoint_edges=10000, resume=True)
+    assert np.array_equal(resumed.edge_partitions, expected.edge_partitions)
+    assert np.array_equal(resumed.masters, expected.masters)
+    assert np.array_equal(resumed.replica_masks, expected.replica_masks)
+
+@pytest.mark.parametrize("algorithm", ["random_vertex_cut", "hdrf_vertex_cut"])
+def test_delta_matches_full_run(tmp_path, algorithm):
+    edges = power_law_edges(30000)
+    # The appended edges bring new vertices too
+    edges[20000:] += 5000 * (np.arange(10000) % 2).astype(np.int32)[:, None]
+    graph_file, delta_file = str(tmp_path / "g.graph"), str(tmp_path / "delta.graph")
+    save_graph(edges[:20000], graph_file)
+    save_graph(edges[20000:], delta_file)
+    state_file = str(tmp_path / "g.state")
+    full = partition(edges, algorithm, 4)
+    partition(graph_file, algorithm, 4, state_file=state_file)
+    delta = partition_delta(state_file, delta_file)
+    assert np.array_equal(delta.vertex_ids, full.vertex_ids)
+    assert np.array_equal(delta.edge_partitions, full.edge_partitions[20000:])
+    assert np.array_equal(delta.replica_masks, full.replica_masks)
+    assert np.array_equal(delta.masters, full.masters)
+
+def shard_edge_counts(shard_dir, num_partitions):
+    return [os.path.getsize(shard_file_name(shard_dir, part_id)) // EDGE_BYTES for part_id in range(num_partitions)]
+
+def count_file_edges(output_file):
+    # Every partition's block of the count file is its name, masters, vertices and edges
+    with open(output_file) as f:
+        return [int(line) for line in f.read().split("\n")[3::4] if line]
+
+def run_script(monkeypatch, script, *argv):
+    monkeypatch.setattr(sys, "argv", [script.__file__, *argv])
+    script.main()
+
+def test_delta_run_appends_to_shards(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    edges = power_law_edges(25000)
+    save_graph(edges[:20000], "g.graph")
+    save_graph(edges[20000:], "delta.graph")
+    run_script(monkeypatch, p_way_random_vertex_cut, "-i", "g.graph", "-n", "4", "-hu", "-ss", "-sh")
+    run_script(monkeypatch, p_way_random_vertex_cut, "-i", "g.graph", "-n", "4", "-hu", "-sh", "-dl", "delta.graph")
+    counts = count_file_edges("output/random_vertex_cut_output/g_4part.txt")
+    assert sum(counts) == len(edges)
+    assert shard_edge_counts("output/random_vertex_cut_output/g_4part_shards", 4) == counts
+
+def test_delta_run_refuses_edge_cut_before_opening_shards(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    save_graph(power_law_edges(20000), "g.graph")
+    save_graph(power_law_edges(1000, seed=1), "delta.graph")
+    run_script(monkeypatch, p_way_edge_cut, "-i", "g.graph", "-n", "4", "-hu", "-ss", "-sh")
+    counts = shard_edge_counts("output/edge_cut_output/g_4part_shards", 4)
+    with pytest.raises(SystemExit):
+        run_script(monkeypatch, p_way_edge_cut, "-i", "g.graph", "-n", "4", "-hu", "-sh", "-dl", "delta.graph")
+    assert shard_edge_counts("output/edge_cut_output/g_4part_shards", 4) == counts
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from benchmark.generators import iter_rmat_batches
+from partitioning import partition
+from prefetch import prefetch_edge_batches, _bound_label
+from utils import edge_array, save_graph_batches, EDGE_BYTES
+
+@pytest.fixture
+def graph_file(tmp_path):
+    path = str(tmp_path / "g.graph")
+    save_graph_batches(iter_rmat_batches(12, batch_size=10000), path)
+    return path
+
+@pytest.mark.parametrize("depth", [1, 3])
+def test_read_ahead_yields_the_file_range(graph_file, depth):
+    # Batches live in reused buffers, so each is copied before the next is taken
+    edges = edge_array(graph_file)
+    offset, length = 1000 * EDGE_BYTES, 50001 * EDGE_BYTES
+    batches = [batch.copy() for batch in prefetch_edge_batches(graph_file, 4096, offset, length, depth)]
+    assert all(len(batch) == 4096 for batch in batches[:-1])
+    assert np.array_equal(np.concatenate(batches), edges[1000:51001])
+
+def test_read_ahead_stops_early(graph_file):
+    batches = prefetch_edge_batches(graph_file, 1000, depth=2)
+    first = next(batches).copy()
+    batches.close()
+    assert np.array_equal(first, edge_array(graph_file)[:1000])
+
+@pytest.mark.parametrize("algorithm", ["random_vertex_cut", "heuristic_vertex_cut", "hdrf_vertex_cut", "edge_cut"])
+def test_read_ahead_matches_plain_reads(graph_file, algorithm):
+    plain = partition(graph_file, algorithm, 4, batch_size=5000, read_ahead=0)
+    ahead = partition(graph_file, algorithm, 4, batch_size=5000, read_ahead=2)
+    assert np.array_equal(ahead.edge_partitions, plain.edge_partitions)
+    assert np.array_equal(ahead.masters, plain.masters)
+    assert np.array_equal(ahead.replica_masks, plain.replica_masks)
+
+def test_read_ahead_matches_plain_reads_over_workers(graph_file):
+    plain = partition(graph_file, "hybrid_vertex_cut", 4, 30, workers=3, batch_size=5000, read_ahead=0)
+    ahead = partition(graph_file, "hybrid_vertex_cut", 4, 30, workers=3, batch_size=5000, read_ahead=2)
+    assert np.array_equal(ahead.masters, plain.masters)
+    assert np.array_equal(ahead.replica_masks, plain.replica_masks)
+
+def test_bound_label_needs_a_noticeable_wait():
+    assert _bound_label(0.0, 0.0, 10.0) == ""
+    assert _bound_label(0.3, 0.1, 10.0) == ""
+    assert _bound_label(2.0, 0.1, 10.0) == " (I/O-bound)"
+    assert _bound_label(0.1, 2.0, 10.0) == " (CPU-bound)"
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from partitioning import partition
+from routing_table import save_routing_table, load_routing_table
+
+@pytest.mark.parametrize("spread", [1, 1000])
+def test_routing_table_round_trip(tmp_path, spread):
+    # spread 1 keeps the direct index, 1000 leaves the IDs too sparse for it
+    rng = np.random.default_rng(0)
+    edges = rng.integers(0, 2000, size=(20000, 2), dtype=np.int32) * spread
+    result = partition(edges, "heuristic_vertex_cut", 8)
+    routing_file = str(tmp_path / "routing.gprt")
+    save_routing_table(result, routing_file)
+    table = load_routing_table(routing_file)
+    assert (table.index.direct is None) == (spread > 1)
+    assert len(table) == result.num_vertices
+    masters, masks = table.lookup(result.vertex_ids)
+    assert np.array_equal(masters, result.masters)
+    assert np.array_equal(masks, result.replica_masks)
+    vertex_id = int(result.vertex_ids[5])
+    assert table.replica_partitions(vertex_id) == [p for p in range(8) if int(result.replica_masks[5]) >> p & 1]
+
+def test_routing_table_unknown_vertices(tmp_path):
+    edges = np.array([[0, 1], [1, 2], [2, 0], [5, 6]], dtype=np.int32)
+    routing_file = str(tmp_path / "routing.gprt")
+    save_routing_table(partition(edges, "random_vertex_cut", 2), routing_file)
+    masters, masks = load_routing_table(routing_file).lookup([3, -1, 1 << 40, 6])
+    assert masters.tolist()[:3] == [-1, -1, -1] and masters[3] >= 0
+    assert masks.tolist()[:3] == [0, 0, 0] and masks[3] != 0
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from benchmark.generators import iter_rmat_batches
+from partitioning import partition
+from shard_writer import ShardWriter, shard_file_name, csr_file_name
+from utils import edge_array, save_graph_batches
+
+@pytest.fixture
+def graph_file(tmp_path):
+    path = str(tmp_path / "g.graph")
+    save_graph_batches(iter_rmat_batches(11, batch_size=5000), path)
+    return path
+
+@pytest.mark.parametrize("algorithm", ["random_vertex_cut", "heuristic_vertex_cut"])
+def test_vertex_cut_shards_hold_each_partition_in_order(tmp_path, graph_file, algorithm):
+    # A small buffer makes the writer flush many times during the pass
+    with ShardWriter(str(tmp_path / "shards"), 4, buffer_bytes=1 << 12) as shards:
+        result = partition(graph_file, algorithm, 4, batch_size=5000, shards=shards)
+    edges = edge_array(graph_file)
+    for part_id in range(4):
+        shard = edge_array(shard_file_name(str(tmp_path / "shards"), part_id))
+        assert np.array_equal(shard, edges[result.edge_partitions == part_id])
+
+def test_edge_cut_shards_copy_cut_edges_to_both_ends(tmp_path, graph_file):
+    with ShardWriter(str(tmp_path / "shards"), 4) as shards:
+        result = partition(graph_file, "edge_cut", 4, shards=shards)
+    edges = edge_array(graph_file)
+    src_parts = result.masters[result.index.lookup(edges[:, 0])]
+    dst_parts = result.masters[result.index.lookup(edges[:, 1])]
+    for part_id in range(4):
+        shard = edge_array(shard_file_name(str(tmp_path / "shards"), part_id))
+        assert np.array_equal(shard, edges[(src_parts == part_id) | (dst_parts == part_id)])
+
+def test_csr_shards(tmp_path, graph_file):
+    shard_dir = str(tmp_path / "shards")
+    with ShardWriter(shard_dir, 4, csr=True, memory_budget=1) as shards:
+        result = partition(graph_file, "random_vertex_cut", 4, shards=shards)
+    edges = edge_array(graph_file)
+    for part_id in range(4):
+        part_edges = edges[result.edge_partitions == part_id]
+        shard = edge_array(shard_file_name(shard_dir, part_id))
+        assert np.array_equal(shard, part_edges[np.lexsort((part_edges[:, 1], part_edges[:, 0]))])
+        csr = np.load(csr_file_name(shard_dir, part_id))
+        sources, counts = np.unique(part_edges[:, 0], return_counts=True)
+        assert np.array_equal(csr["sources"], sources)
+        assert np.array_equal(csr["offsets"], np.concatenate(([0], np.cumsum(counts))))
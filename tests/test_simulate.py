@@ -0,0 +1,40 @@
+import numpy as np
+
+from benchmark.generators import iter_rmat_batches
+from partitioning import partition
+from simulate import simulate, MESSAGE_BYTES
+
+PATH_EDGES = np.array([[1, 2], [2, 3], [3, 4]], dtype=np.int32)
+
+def test_pagerank_on_a_path():
+    # Hash edge-cut deals the path's vertices to partitions 0, 1, 0, 1, so every edge sits with its source's master and
+    # sends its destination one partial value; no vertex has out-edges elsewhere, so nothing is scattered
+    report = simulate(partition(PATH_EDGES, "edge_cut", 2), "pagerank", supersteps=3)
+    assert len(report["supersteps"]) == 3
+    step = report["supersteps"][0]
+    assert step["compute_edges"] == [2, 1]
+    assert step["gather_messages"] == [2, 1]
+    assert step["scatter_messages"] == [0, 0]
+    assert step["bytes_received"] == [MESSAGE_BYTES, 2 * MESSAGE_BYTES]
+    assert report["total_bytes"] == 3 * 3 * MESSAGE_BYTES
+
+def test_sssp_walks_the_path():
+    report = simulate(partition(PATH_EDGES, "edge_cut", 2), "sssp", supersteps=10, source=1)
+    assert [step["updated_vertices"] for step in report["supersteps"]] == [1, 1, 1, 0]
+    assert [step["active_edges"] for step in report["supersteps"]] == [1, 1, 1, 0]
+
+def test_one_partition_sends_nothing():
+    edges = np.concatenate(list(iter_rmat_batches(10)))
+    for workload in ("pagerank", "sssp"):
+        report = simulate(partition(edges, "random_vertex_cut", 1), workload, supersteps=4)
+        assert report["total_bytes"] == 0
+        assert report["critical_partitions"] == [len(report["supersteps"])]
+
+def test_pagerank_processes_every_edge_once_per_superstep():
+    edges = np.concatenate(list(iter_rmat_batches(10)))
+    result = partition(edges, "hdrf_vertex_cut", 4)
+    step = simulate(result, "pagerank", supersteps=2)["supersteps"][0]
+    assert step["compute_edges"] == np.bincount(result.edge_partitions, minlength=4).tolist()
+    # Partial values come from the mirrors holding a vertex's in-edges, so there are at most as many as mirrors
+    mirrors = sum(bin(int(mask)).count("1") - 1 for mask in result.replica_masks)
+    assert sum(step["gather_messages"]) <= mirrors
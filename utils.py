@@ -1,35 +1,214 @@
-import struct
 import argparse
 import time
 import mmap
 import os
+import json
+import numpy as np
+
+from instrumentation import ProgressReporter
+from edge_formats import is_native_edge_file, decode_edge_file, iter_edge_file_batches
+
+EDGE_BYTES = 8  # <4 bytes source, 4 bytes destination>
+BATCH_SIZE = 1 << 22  # edges per batch
+DECODE_WORKERS = os.cpu_count() or 1  # processes decoding a text or vgraph file into its native copy
+
+def partition_dtype(num_partitions):
+    # Smallest signed type holding a partition ID or -1
+    return np.int8 if num_partitions <= 127 else np.int16
+
+def sorted_unique(values):
+    # Sorted distinct values of an array; a sort and a neighbor compare, far faster than np.unique on large arrays
+    values = np.sort(values, axis=None)
+    keep = np.ones(len(values), dtype=bool)
+    keep[1:] = values[1:] != values[:-1]
+    return values[keep]
 
 def save_graph(edges, file_path):
-    with open(file_path, "wb") as f:
-        for src, dst in edges:
-            f.write(struct.pack("ii", src, dst))
+    # One bulk write of <int32 src, int32 dst> pairs, from an (N, 2) array or an iterable of (src, dst) tuples
+    if not isinstance(edges, np.ndarray):
+        edges = np.array(list(edges), dtype=np.int32)
+    np.ascontiguousarray(edges, dtype=np.int32).reshape(-1, 2).tofile(file_path)
+
+def save_graph_batches(batches, file_path):
+    # save_graph for graphs produced batch by batch, written through a temporary file; returns the number of edges
+    num_edges = 0
+    tmp_file = f"{file_path}.tmp"
+    with open(tmp_file, "wb") as f:
+        for batch in batches:
+            np.ascontiguousarray(batch, dtype=np.int32).tofile(f)
+            num_edges += len(batch)
+    os.replace(tmp_file, file_path)
+    return num_edges
 
 def load_graph(file_path):
-    edges = []
-    with open(file_path, "rb") as f:
-        while True:
-            data = f.read(8)
-            if not data:
-                break
-            src, dst = struct.unpack("ii", data)
-            edges.append((src, dst))
+    # Text, compressed and vgraph files are decoded on the fly, with no native copy
+    if is_native_edge_file(file_path):
+        edges = list(iter_edges(file_path))
+    else:
+        edges = [edge for batch in iter_edge_file_batches(file_path, DECODE_WORKERS) for edge in zip(batch[:, 0].tolist(), batch[:, 1].tolist())]
     print(f"Loaded {len(edges)} edges from {file_path}")
     return edges
 
+def native_edge_file(file_path):
+    # Native binary file behind a path: the file itself, or for text, gzip, zlib and vgraph files (see edge_formats) a
+    # native copy decoded once into the graph's cache directory, rebuilt when the file changes
+    if is_native_edge_file(file_path):
+        return file_path
+    output_file = os.path.join(graph_cache_dir(file_path), "edges.graph")
+    meta = _read_cache_meta(file_path)
+    if meta is not None and "native_edges" in meta["values"] and os.path.exists(output_file):
+        return output_file
+
+    start_time = time.time()
+    os.makedirs(graph_cache_dir(file_path), exist_ok=True)
+    tmp_file = f"{output_file}.tmp"
+    num_edges = decode_edge_file(file_path, tmp_file, DECODE_WORKERS)
+    os.replace(tmp_file, output_file)
+    save_cached_arrays(file_path, {}, {"native_edges": num_edges})
+    print(f"Decoded {num_edges} edges of {file_path} in {time.time() - start_time} seconds")
+    return output_file
+
+def map_edge_file(file_path):
+    # Read-only mmap of a binary edge file, None for an empty file
+    file_path = native_edge_file(file_path)
+    size = os.path.getsize(file_path)
+    if size % EDGE_BYTES:
+        raise ValueError(f"{file_path}: size {size} is not a multiple of {EDGE_BYTES} bytes")
+    if size == 0:
+        return None
+    with open(file_path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def _edge_buffer(source):
+    # Edge sources are file paths, buffers of packed edges (mmap, bytes) or (N, 2) arrays / lists of edges
+    if isinstance(source, (str, os.PathLike)):
+        return map_edge_file(source)
+    if isinstance(source, (np.ndarray, list, tuple)):
+        return np.ascontiguousarray(source, dtype=np.int32).reshape(-1, 2).view(np.uint8).ravel()
+    if len(source) % EDGE_BYTES:
+        raise ValueError(f"buffer size {len(source)} is not a multiple of {EDGE_BYTES} bytes")
+    return source
+
+def _edge_range(buffer, offset, length):
+    size = len(buffer) if buffer is not None else 0
+    if length is None:
+        length = size - offset
+    if offset % EDGE_BYTES or length % EDGE_BYTES:
+        raise ValueError(f"byte range ({offset}, {length}) is not aligned to {EDGE_BYTES} bytes")
+    if offset < 0 or length < 0 or offset + length > size:
+        raise ValueError(f"byte range ({offset}, {length}) is out of bounds for {size} bytes")
+    return offset, offset + length
+
+def count_edges(source):
+    if isinstance(source, (str, os.PathLike)):
+        source = native_edge_file(source)
+        size = os.path.getsize(source)
+        if size % EDGE_BYTES:
+            raise ValueError(f"{source}: size {size} is not a multiple of {EDGE_BYTES} bytes")
+        return size // EDGE_BYTES
+    return len(_edge_buffer(source)) // EDGE_BYTES
+
+def split_edge_ranges(source, num_ranges):
+    # Split the edge file into up to num_ranges contiguous (offset, length) byte ranges of whole edges
+    num_edges = count_edges(source)
+    bounds = [num_edges * i // num_ranges for i in range(num_ranges + 1)]
+    return [(start * EDGE_BYTES, (stop - start) * EDGE_BYTES) for start, stop in zip(bounds, bounds[1:]) if stop > start]
+
+def edge_array(source, offset=0, length=None):
+    # Zero-copy (N, 2) int32 view over the whole file or a byte range of it
+    buffer = _edge_buffer(source)
+    start, stop = _edge_range(buffer, offset, length)
+    if start == stop:
+        return np.empty((0, 2), dtype=np.int32)
+    return np.frombuffer(buffer, dtype=np.int32, count=(stop - start) // 4, offset=start).reshape(-1, 2)
+
+def iter_edge_batches(source, batch_size=BATCH_SIZE, offset=0, length=None, as_memoryview=False, progress=False):
+    # Yield zero-copy batches of edges: (n, 2) int32 arrays, or flat memoryview.cast("i") of src, dst pairs
+    buffer = _edge_buffer(source)
+    start, stop = _edge_range(buffer, offset, length)
+    step = batch_size * EDGE_BYTES
+    # The byte range gives the total up front, so progress lines can show an ETA
+    reporter = ProgressReporter((stop - start) // EDGE_BYTES) if progress else None
+    for batch_start in range(start, stop, step):
+        batch_stop = min(batch_start + step, stop)
+        if as_memoryview:
+            yield memoryview(buffer)[batch_start:batch_stop].cast("i")
+        else:
+            yield np.frombuffer(buffer, dtype=np.int32, count=(batch_stop - batch_start) // 4, offset=batch_start).reshape(-1, 2)
+        if reporter is not None:
+            reporter.update((batch_stop - start) // EDGE_BYTES)
+
+def iter_edges(source, batch_size=BATCH_SIZE, offset=0, length=None, progress=False):
+    # Edge-by-edge (src, dst) tuples for algorithms that cannot work on whole batches
+    for batch in iter_edge_batches(source, batch_size, offset, length, as_memoryview=True, progress=progress):
+        values = iter(batch)
+        yield from zip(values, values)
+
+def graph_cache_dir(file_path):
+    return f"{file_path}.cache"
+
+def _graph_stamp(file_path):
+    stat = os.stat(file_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def _read_cache_meta(file_path):
+    meta_file = os.path.join(graph_cache_dir(file_path), "meta.json")
+    try:
+        with open(meta_file) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("graph") != _graph_stamp(file_path):
+        return None
+    return meta
+
+def load_cached_arrays(file_path, names):
+    # Arrays cached beside the graph, mmap-ed read-only; None when missing or the graph changed since
+    meta = _read_cache_meta(file_path)
+    if meta is None or any(name not in meta["arrays"] for name in names):
+        return None
+    cache_dir = graph_cache_dir(file_path)
+    arrays = {}
+    for name in names:
+        array_file = os.path.join(cache_dir, f"{name}.npy")
+        if not os.path.exists(array_file):
+            return None
+        arrays[name] = np.load(array_file, mmap_mode="r")
+    return arrays, meta["values"]
+
+def save_cached_arrays(file_path, arrays, values=None):
+    # Cache is keyed by the graph file's size and mtime; a stale cache is dropped on the first write
+    cache_dir = graph_cache_dir(file_path)
+    meta = _read_cache_meta(file_path) or {"graph": _graph_stamp(file_path), "arrays": [], "values": {}}
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        for name, array in arrays.items():
+            tmp_file = os.path.join(cache_dir, f"{name}.tmp.npy")
+            np.save(tmp_file, array)
+            os.replace(tmp_file, os.path.join(cache_dir, f"{name}.npy"))
+            if name not in meta["arrays"]:
+                meta["arrays"].append(name)
+        meta["values"].update(values or {})
+        tmp_file = os.path.join(cache_dir, "meta.json.tmp")
+        with open(tmp_file, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_file, os.path.join(cache_dir, "meta.json"))
+    except OSError as e:
+        print(f"Cannot write cache for {file_path}: {e}")
+
+def count_of(value):
+    # Partition entries are either collections (in-memory mode) or plain counts (array-backed stores)
+    return value if isinstance(value, (int, np.integer)) else len(value)
+
 def save_edge_cut_partitions(partitions, output_file):
     if not os.path.exists(os.path.dirname(output_file)):
         os.makedirs(os.path.dirname(output_file))
     with open(output_file, "w") as f:
         for part_id, data in partitions.items():
-            num_master = len(data["master_vertices"])
-            num_total_vertices = len(data["vertices"])
-            num_rep_edges = len(data["replicated_edges"])
-            num_edges = len(data["edges"]) + num_rep_edges
+            num_master = count_of(data["master_vertices"])
+            num_total_vertices = count_of(data["vertices"])
+            num_rep_edges = count_of(data["replicated_edges"])
+            num_edges = count_of(data["edges"]) + num_rep_edges
 
             f.write(f"Partition {part_id}\n")
             f.write(f"{num_master}\n")
@@ -42,10 +221,10 @@ def save_huge_edge_cut_partitions(partitions, output_file):
         os.makedirs(os.path.dirname(output_file))
     with open(output_file, "w") as f:
         for part_id, data in partitions.items():
-            num_master = len(data["master_vertices"])
-            num_total_vertices = len(data["vertices"])
-            num_rep_edges = data["replicated_edges"]
-            num_edges = data["edges"] + num_rep_edges
+            num_master = count_of(data["master_vertices"])
+            num_total_vertices = count_of(data["vertices"])
+            num_rep_edges = count_of(data["replicated_edges"])
+            num_edges = count_of(data["edges"]) + num_rep_edges
 
             f.write(f"Partition {part_id}\n")
             f.write(f"{num_master}\n")
@@ -73,23 +252,28 @@ def save_vertex_cut_partitions(partitions, output_file):
         os.makedirs(os.path.dirname(output_file))
     with open(output_file, "w") as f:
         for part_id, data in partitions.items():
-            num_master = len(data["master_vertices"])
-            num_total_vertices = len(data["vertices"])
-            num_edges = len(data["edges"])
+            num_master = count_of(data["master_vertices"])
+            num_total_vertices = count_of(data["vertices"])
+            num_edges = count_of(data["edges"])
 
             f.write(f"Partition {part_id}\n")
             f.write(f"{num_master}\n")
             f.write(f"{num_total_vertices}\n")
             f.write(f"{num_edges}\n")
 
+def replication_factor(partitions):
+    # Replicas per vertex of vertex-cut partitions, every vertex having exactly one master
+    masters = sum(count_of(data["master_vertices"]) for data in partitions.values())
+    return sum(count_of(data["vertices"]) for data in partitions.values()) / masters if masters else 0.0
+
 def save_huge_vertex_cut_partitions(partitions, output_file):
     if not os.path.exists(os.path.dirname(output_file)):
         os.makedirs(os.path.dirname(output_file))
     with open(output_file, "w") as f:
         for part_id, data in partitions.items():
-            num_master = len(data["master_vertices"])
-            num_total_vertices = len(data["vertices"])
-            num_edges = data["edges"]
+            num_master = count_of(data["master_vertices"])
+            num_total_vertices = count_of(data["vertices"])
+            num_edges = count_of(data["edges"])
 
             f.write(f"Partition {part_id}\n")
             f.write(f"{num_master}\n")
@@ -141,12 +325,76 @@ def parse_args():
     parser.add_argument("-i", "--input_file", type=str, help="Input file", default="small-5.graph")
     parser.add_argument("-n", "--num_partitions", type=int, help="Number of partitions", default=4)
     parser.add_argument("-t", "--degree_threshold", type=int, help="Degree threshold for hybrid partitioning", default=100)
+    parser.add_argument("-gi", "--ginger", action="store_true", help="Place low-degree vertices with the Ginger heuristic in hybrid partitioning")
+    parser.add_argument("-hl", "--hdrf_lambda", type=float, help="Weight of partition balance against replication in HDRF", default=1.0)
+    parser.add_argument("-ts", "--thresholds", type=int, nargs="+", help="Degree thresholds to sweep in one hybrid partitioning pass")
+    parser.add_argument("-ns", "--partition_counts", type=int, nargs="+", help="Numbers of partitions to sweep in one hybrid partitioning pass")
+    parser.add_argument("-a", "--algorithms", type=str, nargs="+", help="Algorithms to run together in run_matrix.py")
     parser.add_argument("-d", "--print_detail", action="store_true", help="Print detailed output")
     parser.add_argument("-b", "--print_both", action="store_true", help="Print both detailed and non-detailed output")
     parser.add_argument("-m", "--draw_mermaid", action="store_true", help="Draw Mermaid graph")
     parser.add_argument("-hu", "--huge_graph", action="store_true", help="Use mmap for huge graph")
+    parser.add_argument("-vp", "--vertex_partitioner", type=str, choices=["hash", "ldg", "fennel"], help="Vertex placement of p_way_edge_cut.py", default="hash")
+    parser.add_argument("-w", "--workers", type=int, help="Number of worker processes for huge graph", default=1)
+    parser.add_argument("-ra", "--read_ahead", type=int, help="Batches a background thread reads ahead of the placement of a huge graph (0 = off)", default=2)
+    parser.add_argument("-dd", "--dedup", action="store_true", help="Drop repeated edges before partitioning")
+    parser.add_argument("-mb", "--memory_budget", type=int, help="Memory in MB for sorting edges out of core, and for the whole run with -rp auto or disk", default=1024)
+    parser.add_argument("-rp", "--representation", type=str, choices=["auto", "memory", "mmap", "disk"],
+                        help="Edge and vertex state representation; auto picks one from the graph's estimated footprint and -mb (default: mmap with -hu, else memory)")
+    parser.add_argument("-sh", "--write_shards", action="store_true", help="Write the edges of each partition to a binary shard file")
+    parser.add_argument("-csr", "--shard_csr", action="store_true", help="Sort shards by source and write a CSR offset index for each")
+    parser.add_argument("-rt", "--routing_table", action="store_true", help="Write the master/replica routing table of the vertices")
+    parser.add_argument("-ss", "--save_state", action="store_true", help="Save the placement state for placing appended edges later")
+    parser.add_argument("-dl", "--delta", type=str, help="Place only the edges of this appended edge file, continuing from the saved state")
+    parser.add_argument("-ce", "--checkpoint_edges", type=int, help="Checkpoint the partitioner every this many edges (0 = off)", default=0)
+    parser.add_argument("-cs", "--checkpoint_seconds", type=float, help="Checkpoint the partitioner every this many seconds (0 = off)", default=0)
+    parser.add_argument("-re", "--resume", action="store_true", help="Continue from the last checkpoint of an interrupted run")
+    parser.add_argument("-mt", "--metrics", action="store_true", help="Write a JSON report of phase timings, throughput, memory and partition quality")
+    parser.add_argument("-pf", "--profile", action="store_true", help="Sample the Python stack during the run and add the hottest functions to the report")
+    parser.add_argument("-si", "--sync_interval", type=int, help="Edges between state exchanges of parallel heuristic workers", default=1000000)
     return parser.parse_args()
 
+def build_partition_options(args, method, threshold=None):
+    # (representation, options) of a p_way script run: the representation to use and the partition() options of the
+    # shared flags, with shard, routing, state and checkpoint files named after method (and threshold). A -dl run appends
+    # to the shards of the run it continues
+    # Imported here, since these modules import utils
+    from memory_plan import choose_representation
+    from shard_writer import ShardWriter
+    from partitioning import DELTA_ALGORITHMS
+
+    if args.delta and method not in DELTA_ALGORITHMS:
+        # Refused before the shard writer opens any output
+        raise SystemExit(f"error: -dl/--delta cannot continue {method}, which needs a full run")
+
+    def output_path(suffix):
+        return os.path.join(args.output_dir, get_partition_file_name(method, args.input_file, args.num_partitions, suffix, threshold=threshold))
+
+    options = {"dedup": args.dedup, "memory_budget": args.memory_budget << 20, "read_ahead": args.read_ahead}
+    # -rp picks in-memory, mmap or disk-backed state; without it -hu decides
+    representation, planned = choose_representation(args, method)
+    options.update(planned)
+    if args.write_shards:
+        options["shards"] = ShardWriter(output_path("_shards"), args.num_partitions, csr=args.shard_csr, memory_budget=args.memory_budget << 20,
+                                       resume=args.resume or args.delta is not None)
+    if args.routing_table:
+        options["routing_file"] = output_path(".routing")
+    if args.save_state:
+        options["state_file"] = output_path(".state.npz")
+    if args.checkpoint_edges or args.checkpoint_seconds or args.resume:
+        options["checkpoint_file"] = output_path(".checkpoint.npz")
+        options["checkpoint_edges"] = args.checkpoint_edges
+        options["checkpoint_seconds"] = args.checkpoint_seconds
+        options["resume"] = args.resume
+    return representation, options
+
+def partition_delta_from_args(args, method, options, threshold=None):
+    # Place only the appended edges of -dl, continuing from the state saved by an earlier -ss run of the same method
+    from partitioning import partition_delta
+    state_file = os.path.join(args.output_dir, get_partition_file_name(method, args.input_file, args.num_partitions, ".state.npz", threshold=threshold))
+    return partition_delta(state_file, args.delta, keep_assignment=False, progress=True, shards=options.get("shards"),
+                           routing_file=options.get("routing_file"), read_ahead=args.read_ahead)
+
 def get_output_file_name(method, input_file, num_partitions, detailed=False, threshold=None):
     input_file = input_file.split("/")[-1]
     if not os.path.exists(f"output/{method}_output"):
@@ -156,6 +404,21 @@ def get_output_file_name(method, input_file, num_partitions, detailed=False, thr
     else:
         return f"{method}_output/{input_file.split('.')[0]}_{num_partitions}part{'_detailed' if detailed else ''}.txt"
 
+def get_summary_file_name(method, input_file, name):
+    input_file = input_file.split("/")[-1]
+    if not os.path.exists(f"output/{method}_output"):
+        os.makedirs(f"output/{method}_output")
+    return f"{method}_output/{input_file.split('.')[0]}_{name}.txt"
+
+def get_partition_file_name(method, input_file, num_partitions, suffix, threshold=None):
+    input_file = input_file.split("/")[-1]
+    if not os.path.exists(f"output/{method}_output"):
+        os.makedirs(f"output/{method}_output")
+    if threshold:
+        return f"{method}_output/{input_file.split('.')[0]}_{num_partitions}part_threshold_{threshold}{suffix}"
+    else:
+        return f"{method}_output/{input_file.split('.')[0]}_{num_partitions}part{suffix}"
+
 def get_mermaid_file_name(method, input_file, num_partitions, threshold=None):
     input_file = input_file.split("/")[-1]
     if not os.path.exists(f"output/{method}_output"):
@@ -0,0 +1,189 @@
+import os
+import tempfile
+import time
+import numpy as np
+
+from utils import iter_edge_batches, count_edges, graph_cache_dir, load_cached_arrays, save_cached_arrays, sorted_unique, BATCH_SIZE
+from parallel_placement import map_edge_ranges
+from memory_plan import IN_MEMORY
+from dedup import iter_sorted_unique, unpack_keys, MEMORY_BUDGET
+
+DIRECT_DENSITY = 0.25  # keep a direct-index array when at least this fraction of the ID span is used
+BITMAP_SPAN_PER_ENDPOINT = 8  # build with a presence bitmap while the ID span is at most this many bytes per endpoint
+SPARSE_ID_BYTES = 16  # a batch's unique ID, its copy in the concatenation and the final sort's temporaries
+
+class VertexIndex:
+    # Dense 0..V-1 relabeling of the vertex IDs of a graph: sorted IDs, plus id - base -> dense for near-contiguous IDs
+    def __init__(self, ids, direct=None, base=0):
+        self.ids = ids
+        self.direct = direct
+        self.base = base
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def num_vertices(self):
+        return len(self.ids)
+
+    def lookup(self, vertex_ids):
+        # Dense indices of vertex IDs, raising ValueError for an ID that is not in the index
+        vertex_ids = np.asarray(vertex_ids)
+        if vertex_ids.size == 0:
+            return np.empty(vertex_ids.shape, dtype=np.int32)
+        if self.direct is not None:
+            # Within the span id - base cannot overflow, whatever the dtype
+            if int(vertex_ids.min()) < self.base or int(vertex_ids.max()) - self.base >= len(self.direct):
+                self._missing(vertex_ids)
+            dense = self.direct[vertex_ids - self.base]
+            if dense.min() < 0:
+                self._missing(vertex_ids)
+            return dense
+        dense = np.searchsorted(self.ids, vertex_ids).astype(np.int32)
+        if dense.max() >= len(self.ids) or not np.array_equal(self.ids[dense], vertex_ids):
+            self._missing(vertex_ids)
+        return dense
+
+    def _missing(self, vertex_ids):
+        missing = vertex_ids[~np.isin(vertex_ids, self.ids)]
+        raise ValueError(f"{len(np.unique(missing))} vertex IDs are not in the index, e.g. {missing[0]}")
+
+    def vertex_ids(self, dense):
+        return self.ids[dense]
+
+def _id_range(path, batch_size):
+    base, top = 0, -1
+    for batch in iter_edge_batches(path, batch_size):
+        lo, hi = int(batch.min()), int(batch.max())
+        base = lo if top < base else min(base, lo)
+        top = max(top, hi)
+    return base, top
+
+def _sparse_ids(path, batch_size, memory_budget):
+    # Sorted unique IDs from the unique IDs of each batch, merged by one sort at the end, or out of core once those pass
+    # the budget
+    chunks = []
+    pending = 0
+    batches = iter_edge_batches(path, batch_size)
+    for batch in batches:
+        chunks.append(sorted_unique(batch))
+        pending += len(chunks[-1])
+        if pending * SPARSE_ID_BYTES > memory_budget:
+            return _external_sparse_ids(path, chunks, batches, memory_budget)
+    return sorted_unique(np.concatenate(chunks)) if chunks else np.empty(0, dtype=np.int32)
+
+def _external_sparse_ids(path, chunks, batches, memory_budget):
+    # The unique IDs of the batches read so far and of the rest go to a scratch file as (id, id) edges, sorted and
+    # deduplicated with dedup's external sort
+    tmp_dir = None
+    if isinstance(path, (str, os.PathLike)):
+        tmp_dir = graph_cache_dir(path)
+        os.makedirs(tmp_dir, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as run_dir:
+        spill_file = os.path.join(run_dir, "ids.graph")
+        with open(spill_file, "wb") as f:
+            for chunk in chunks:
+                f.write(np.repeat(chunk, 2).tobytes())
+            for batch in batches:
+                f.write(np.repeat(sorted_unique(batch), 2).tobytes())
+        return np.concatenate([unpack_keys(keys)[:, 0] for keys, _ in iter_sorted_unique(spill_file, memory_budget, run_dir)])
+
+def build_vertex_index(path, batch_size=BATCH_SIZE, allocator=IN_MEMORY, memory_budget=MEMORY_BUDGET):
+    # The presence bitmap and the direct array come from the allocator; sparse IDs are sorted within memory_budget bytes
+    base, top = _id_range(path, batch_size)
+    span = top - base + 1
+    if span <= max(BITMAP_SPAN_PER_ENDPOINT * 2 * count_edges(path), 1 << 20):
+        seen = allocator.zeros(span, bool)
+        for batch in iter_edge_batches(path, batch_size):
+            seen[batch.ravel() - base] = True
+        ids = (np.flatnonzero(seen) + base).astype(np.int32)
+        allocator.release(seen)
+        del seen
+    else:
+        ids = _sparse_ids(path, batch_size, memory_budget)
+    return _index_of(ids, allocator)
+
+def _index_of(ids, allocator=IN_MEMORY):
+    # Index over sorted unique IDs, with a direct array when they fill enough of their span
+    if len(ids) == 0:
+        return VertexIndex(ids)
+    base = int(ids[0])
+    span = int(ids[-1]) - base + 1
+    direct = None
+    if len(ids) >= DIRECT_DENSITY * span:
+        direct = allocator.full(span, -1, np.int32)
+        direct[ids - base] = np.arange(len(ids), dtype=np.int32)
+    return VertexIndex(ids, direct, base)
+
+def merge_vertex_index(index, other):
+    # Index over the vertices of both, and the new dense index of each vertex of the first
+    merged = _index_of(np.union1d(index.ids, other.ids).astype(np.int32))
+    return merged, merged.lookup(index.ids)
+
+def load_vertex_index(path, batch_size=BATCH_SIZE, use_cache=True, allocator=IN_MEMORY, memory_budget=MEMORY_BUDGET):
+    # Load the index cached beside the graph through mmap, building and caching it on first use
+    if use_cache:
+        cached = load_cached_arrays(path, ["vertex_ids"])
+        if cached is not None and cached[1]["vertex_direct"]:
+            cached = load_cached_arrays(path, ["vertex_ids", "vertex_direct"])
+        if cached is not None:
+            arrays, values = cached
+            return VertexIndex(arrays["vertex_ids"], arrays.get("vertex_direct"), values["vertex_base"])
+
+    start_time = time.time()
+    index = build_vertex_index(path, batch_size, allocator, memory_budget)
+    print(f"Indexed {len(index)} vertices in {time.time() - start_time} seconds")
+    if use_cache:
+        arrays = {"vertex_ids": index.ids}
+        if index.direct is not None:
+            arrays["vertex_direct"] = index.direct
+        save_cached_arrays(path, arrays, {"vertex_base": index.base, "vertex_direct": index.direct is not None})
+    return index
+
+def _count_degrees(path, offset, length, index, batch_size, allocator):
+    out_degree = allocator.zeros(len(index), np.int64)
+    in_degree = allocator.zeros(len(index), np.int64)
+    for batch in iter_edge_batches(path, batch_size, offset, length):
+        # Scatter-adds cost O(batch), where a bincount per batch would cost O(V)
+        np.add.at(out_degree, index.lookup(batch[:, 0]), 1)
+        np.add.at(in_degree, index.lookup(batch[:, 1]), 1)
+    return out_degree, in_degree
+
+def load_degrees(path, index, workers=1, batch_size=BATCH_SIZE, use_cache=True, allocator=IN_MEMORY):
+    # In, out and total degree per dense vertex, cached beside the graph like the index itself; the counters and degrees
+    # come from the allocator
+    names = ["in_degree", "out_degree", "degree"]
+    if use_cache:
+        cached = load_cached_arrays(path, names)
+        if cached is not None:
+            return cached[0]
+
+    start_time = time.time()
+    out_degree = in_degree = None
+    for partial_out, partial_in in map_edge_ranges(path, _count_degrees, workers, index=index, batch_size=batch_size, allocator=allocator):
+        if out_degree is None:
+            out_degree, in_degree = partial_out, partial_in
+        else:
+            out_degree += partial_out
+            in_degree += partial_in
+            allocator.release(partial_out)
+            allocator.release(partial_in)
+    if out_degree is None:
+        out_degree, in_degree = allocator.zeros(len(index), np.int64), allocator.zeros(len(index), np.int64)
+    degrees = {name: allocator.zeros(len(index), np.uint32) for name in names}
+    np.copyto(degrees["in_degree"], in_degree, casting="unsafe")
+    np.copyto(degrees["out_degree"], out_degree, casting="unsafe")
+    np.add(in_degree, out_degree, out=degrees["degree"], casting="unsafe")
+    allocator.release(out_degree)
+    allocator.release(in_degree)
+    del out_degree, in_degree
+    print(f"Counted degrees of {len(index)} vertices in {time.time() - start_time} seconds")
+    if use_cache:
+        save_cached_arrays(path, degrees)
+    return degrees
+
+def iter_dense_edges(path, index, batch_size=BATCH_SIZE, offset=0, length=None, progress=False):
+    # Edge-by-edge (src, dst) pairs relabeled to dense vertex indices
+    for batch in iter_edge_batches(path, batch_size, offset, length, progress=progress):
+        values = iter(memoryview(index.lookup(batch).ravel()))
+        yield from zip(values, values)
@@ -0,0 +1,186 @@
+import os
+import tempfile
+import time
+import numpy as np
+
+from utils import count_edges, edge_array, iter_edge_batches, graph_cache_dir, load_cached_arrays, save_cached_arrays, partition_dtype
+from dedup import iter_sorted_edges, unpack_keys, MEMORY_BUDGET
+
+VERTEX_PARTITIONERS = ["ldg", "fennel"]
+BALANCE_SLACK = 1.1  # a partition takes at most this many times the mean number of vertices
+FENNEL_GAMMA = 1.5
+
+def _adjacency(edges, index):
+    # Dense (vertices, offsets, neighbors) of edges sorted by source: vertices[i]'s neighbors are neighbors[offsets[i]:offsets[i + 1]]
+    src = index.lookup(edges[:, 0])
+    starts = np.flatnonzero(np.concatenate(([True], src[1:] != src[:-1])))
+    return src[starts], np.append(starts, len(src)), index.lookup(edges[:, 1])
+
+def _adjacency_blocks(edge_blocks, index):
+    # Adjacency of blocks of edges sorted by source; the last source of a block may continue in the next one, so it is
+    # carried over
+    carry = np.empty((0, 2), dtype=np.int32)
+    for block in edge_blocks:
+        if not len(block):
+            continue
+        edges = np.concatenate((carry, block))
+        cut = np.searchsorted(edges[:, 0], edges[-1, 0])
+        carry = edges[cut:]
+        if cut:
+            yield _adjacency(edges[:cut], index)
+    if len(carry):
+        yield _adjacency(carry, index)
+
+def _iter_sorted_adjacency(source, index, memory_budget, tmp_dir):
+    return _adjacency_blocks((unpack_keys(keys) for keys, _ in iter_sorted_edges(source, memory_budget, tmp_dir)), index)
+
+def iter_adjacency(source, index, symmetric=True, memory_budget=MEMORY_BUDGET, tmp_dir=None):
+    # Adjacency lists in vertex order, built by an external sort of the edges by (src, dst). symmetric=True lists every
+    # edge under both endpoints, so a vertex sees its in-neighbors too; a file is doubled into a temporary file first
+    is_path = isinstance(source, (str, os.PathLike))
+    if not symmetric:
+        yield from _iter_sorted_adjacency(source, index, memory_budget, tmp_dir)
+        return
+    if not is_path:
+        edges = edge_array(source)
+        yield from _iter_sorted_adjacency(np.concatenate((edges, edges[:, ::-1])), index, memory_budget, tmp_dir)
+        return
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as both_dir:
+        both_file = os.path.join(both_dir, "both.graph")
+        with open(both_file, "wb") as f:
+            for batch in iter_edge_batches(source):
+                f.write(batch.tobytes())
+                f.write(np.ascontiguousarray(batch[:, ::-1]).tobytes())
+        yield from _iter_sorted_adjacency(both_file, index, memory_budget, both_dir)
+
+def in_edge_file(path, memory_budget=MEMORY_BUDGET):
+    # Every edge reversed and sorted by (dst, src), i.e. the in-neighbor lists of the vertices in order, kept in the
+    # graph's cache directory like unique.graph; rebuilt when the graph changes
+    cache_dir = graph_cache_dir(path)
+    output_file = os.path.join(cache_dir, "in_edges.graph")
+    cached = load_cached_arrays(path, [])
+    if cached is not None and "in_edges" in cached[1] and os.path.exists(output_file):
+        return output_file
+
+    start_time = time.time()
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_file = f"{output_file}.tmp"
+    with tempfile.TemporaryDirectory(dir=cache_dir) as reverse_dir:
+        reversed_file = os.path.join(reverse_dir, "reversed.graph")
+        with open(reversed_file, "wb") as f:
+            for batch in iter_edge_batches(path):
+                f.write(np.ascontiguousarray(batch[:, ::-1]).tobytes())
+        with open(tmp_file, "wb") as f:
+            for keys, _ in iter_sorted_edges(reversed_file, memory_budget, reverse_dir):
+                f.write(unpack_keys(keys).tobytes())
+    os.replace(tmp_file, output_file)
+    num_edges = count_edges(output_file)
+    save_cached_arrays(path, {}, {"in_edges": num_edges})
+    print(f"Sorted {num_edges} edges by destination in {time.time() - start_time} seconds")
+    return output_file
+
+def iter_in_adjacency(source, index, memory_budget=MEMORY_BUDGET):
+    # In-neighbor lists in vertex order, as (vertices, offsets, neighbors) blocks; a file's are read from its in-edge file
+    if isinstance(source, (str, os.PathLike)):
+        return _adjacency_blocks(iter_edge_batches(in_edge_file(source, memory_budget)), index)
+    return _iter_sorted_adjacency(np.ascontiguousarray(edge_array(source)[:, ::-1]), index, memory_budget, None)
+
+def ldg_choice(counts, loads, capacity):
+    # Linear Deterministic Greedy: neighbors already there, weighted by the room left; ties go to the emptiest partition
+    score = counts * (1 - loads / capacity)
+    score[loads >= capacity] = -1
+    best = np.flatnonzero(score == score.max())
+    return best[np.argmin(loads[best])]
+
+def fennel_choice(counts, loads, capacity, alpha, gamma=FENNEL_GAMMA):
+    # Fennel: neighbors already there minus the marginal cost alpha * gamma * load^(gamma - 1) of growing the partition
+    score = counts - alpha * gamma * loads ** (gamma - 1)
+    score[loads >= capacity] = -np.inf
+    return int(np.argmax(score))
+
+def ginger_choice(counts, vertex_loads, edge_loads, edge_weight):
+    # PowerLyra's Ginger: in-neighbors already there minus the balance cost (|V_p| + |V| / |E| * |E_p|) / 2
+    score = counts - 0.5 * (vertex_loads + edge_weight * edge_loads)
+    return int(np.argmax(score))
+
+def stream_vertex_partition(adjacency, num_vertices, num_partitions, num_edges, method="ldg", slack=BALANCE_SLACK, gamma=FENNEL_GAMMA):
+    # One pass over (vertices, offsets, neighbors) blocks, placing each vertex where most of its already placed
+    # neighbors are, subject to the method's balance term and a hard cap of slack times the mean partition size.
+    # Returns the partition of every dense vertex, vertices that never came up going to the emptiest partitions
+    capacity = max(np.ceil(slack * num_vertices / num_partitions), 1)
+    loads = np.zeros(num_partitions, dtype=np.float64)
+    if method == "ldg":
+        choose = ldg_choice
+        options = {}
+    elif method == "fennel":
+        choose = fennel_choice
+        # alpha from the Fennel paper, which makes the balance cost comparable to the number of cut edges
+        options = {"alpha": np.sqrt(num_partitions) * num_edges / max(num_vertices, 1) ** gamma, "gamma": gamma}
+    else:
+        raise ValueError(f"unknown vertex partitioner {method}")
+
+    # Partition + 1 of each vertex, 0 until placed, so counting placed neighbors is one bincount
+    placed = np.zeros(num_vertices, dtype=np.int16 if num_partitions < (1 << 15) - 1 else np.int32)
+    start_time = time.time()
+    for vertices, offsets, neighbors in adjacency:
+        bounds = offsets.tolist()
+        for i, vertex in enumerate(vertices.tolist()):
+            counts = np.bincount(placed[neighbors[bounds[i]:bounds[i + 1]]], minlength=num_partitions + 1)[1:]
+            part_id = choose(counts, loads, capacity, **options)
+            placed[vertex] = part_id + 1
+            loads[part_id] += 1
+
+    unplaced = np.flatnonzero(placed == 0)
+    if len(unplaced):
+        order = np.argsort(loads, kind="stable")
+        placed[unplaced] = order[np.arange(len(unplaced)) % num_partitions] + 1
+    print(f"Placed {num_vertices} vertices with {method} in {time.time() - start_time} seconds")
+    return (placed - 1).astype(partition_dtype(num_partitions))
+
+def vertex_partition(source, index, num_partitions, method="ldg", symmetric=True, memory_budget=MEMORY_BUDGET):
+    # Partition of every dense vertex of a graph by a streaming vertex partitioner
+    is_path = isinstance(source, (str, os.PathLike))
+    tmp_dir = None
+    if is_path:
+        tmp_dir = graph_cache_dir(source)
+        os.makedirs(tmp_dir, exist_ok=True)
+    num_edges = len(edge_array(source))
+    adjacency = iter_adjacency(source, index, symmetric, memory_budget, tmp_dir)
+    return stream_vertex_partition(adjacency, len(index), num_partitions, num_edges, method)
+
+def ginger_vertex_partition(source, index, num_partitions, vertex_degrees, degree_threshold, memory_budget=MEMORY_BUDGET):
+    # Partition of every dense vertex for Ginger hybrid-cut. High-degree vertices hash by raw ID. Low-degree vertices are
+    # streamed with their in-neighbor lists and go where most in-neighbors are, less the Ginger balance cost, taking
+    # their in-edges and their out-edges to high-degree vertices with them
+    start_time = time.time()
+    num_edges = len(edge_array(source))
+    is_high_degree = vertex_degrees > degree_threshold
+    # Edges to high-degree vertices follow their source, so they count toward the source's partition
+    high_out_degree = np.zeros(len(index), dtype=np.int64)
+    for batch in iter_edge_batches(source):
+        to_high = is_high_degree[index.lookup(batch[:, 1])]
+        np.add.at(high_out_degree, index.lookup(batch[to_high, 0]), 1)
+
+    placed = np.zeros(len(index), dtype=np.int16 if num_partitions < (1 << 15) - 1 else np.int32)
+    high = np.flatnonzero(is_high_degree)
+    placed[high] = (index.ids[high] - 1) % num_partitions + 1
+    vertex_loads = np.bincount(placed[high] - 1, minlength=num_partitions).astype(np.float64)
+    edge_loads = np.bincount(placed[high] - 1, weights=high_out_degree[high], minlength=num_partitions)
+    edge_weight = len(index) / max(num_edges, 1)
+
+    for vertices, offsets, neighbors in iter_in_adjacency(source, index, memory_budget):
+        bounds = offsets.tolist()
+        for i in np.flatnonzero(~is_high_degree[vertices]).tolist():
+            vertex = int(vertices[i])
+            in_neighbors = neighbors[bounds[i]:bounds[i + 1]]
+            counts = np.bincount(placed[in_neighbors], minlength=num_partitions + 1)[1:]
+            part_id = ginger_choice(counts, vertex_loads, edge_loads, edge_weight)
+            placed[vertex] = part_id + 1
+            vertex_loads[part_id] += 1
+            edge_loads[part_id] += len(in_neighbors) + high_out_degree[vertex]
+
+    # Low-degree vertices without in-edges are placed by their out-edges to high-degree vertices alone, so they hash
+    unplaced = np.flatnonzero(placed == 0)
+    placed[unplaced] = (index.ids[unplaced] - 1) % num_partitions + 1
+    print(f"Placed {len(index) - len(high) - len(unplaced)} low-degree vertices with ginger in {time.time() - start_time} seconds")
+    return (placed - 1).astype(partition_dtype(num_partitions))